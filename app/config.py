@@ -9,11 +9,105 @@ class Settings:
     API_BASE_URL: str = "https://lol-stat-badges.onrender.com"
     DISCORD_WEBHOOK: str = os.getenv("DISCORD_WEBHOOK")
 
-    # Call counter for debugging (Yes, I know this isn't persistent, don't worry)
-    API_CALLS = 0
+    # Pixel density of the rank icon embedded in badges (1 = 28x28, 2 = 56x56 for HiDPI)
+    ICON_SCALE: int = int(os.getenv("ICON_SCALE", "1"))
+
+    # Riot API connection pooling (one pool per routing host)
+    RIOT_MAX_CONNECTIONS: int = int(os.getenv("RIOT_MAX_CONNECTIONS", "20"))
+    RIOT_MAX_KEEPALIVE_CONNECTIONS: int = int(
+        os.getenv("RIOT_MAX_KEEPALIVE_CONNECTIONS", "10")
+    )
+    RIOT_KEEPALIVE_EXPIRY: float = float(os.getenv("RIOT_KEEPALIVE_EXPIRY", "60"))
+    RIOT_CONNECT_TIMEOUT: float = float(os.getenv("RIOT_CONNECT_TIMEOUT", "3"))
+    RIOT_READ_TIMEOUT: float = float(os.getenv("RIOT_READ_TIMEOUT", "5"))
+    RIOT_HTTP2: bool = os.getenv("RIOT_HTTP2", "false").lower() == "true"
+
+    # Riot rate limiting. App limits are learnt from response headers, this is only the starting assumption
+    RIOT_APP_RATE_LIMIT: str = os.getenv("RIOT_APP_RATE_LIMIT", "20:1,100:120")
+    RIOT_RATE_LIMIT_MAX_WAIT: float = float(os.getenv("RIOT_RATE_LIMIT_MAX_WAIT", "2"))
+    RIOT_429_BACKOFF: float = float(os.getenv("RIOT_429_BACKOFF", "1"))
+
+    # Per routing host circuit breakers, opened by failed (network error or 5xx) & slow Riot calls
+    CIRCUIT_FAILURE_RATE: float = float(os.getenv("CIRCUIT_FAILURE_RATE", "0.5"))
+    CIRCUIT_SLOW_CALL_SECONDS: float = float(
+        os.getenv("CIRCUIT_SLOW_CALL_SECONDS", "2")
+    )
+    CIRCUIT_WINDOW: int = int(os.getenv("CIRCUIT_WINDOW", "20"))
+    CIRCUIT_MIN_CALLS: int = int(os.getenv("CIRCUIT_MIN_CALLS", "5"))
+    CIRCUIT_OPEN_SECONDS: float = float(os.getenv("CIRCUIT_OPEN_SECONDS", "30"))
+
+    # Persistent Riot ID -> PUUID store, PUUIDs never change so they're kept for a long time
+    PUUID_DB_PATH: str = os.getenv(
+        "PUUID_DB_PATH",
+        os.path.join(
+            os.path.dirname(os.path.dirname(__file__)), "data", "puuids.sqlite3"
+        ),
+    )
+    PUUID_TTL: int = int(os.getenv("PUUID_TTL", str(30 * 24 * 3600)))
+
+    # Caches shared by the workers of a node ('sqlite') or by several nodes ('redis'), 'memory' keeps them per worker
+    CACHE_BACKEND: str = os.getenv("CACHE_BACKEND", "memory").lower()
+    CACHE_DB_PATH: str = os.getenv(
+        "CACHE_DB_PATH",
+        os.path.join(
+            os.path.dirname(os.path.dirname(__file__)), "data", "cache.sqlite3"
+        ),
+    )
+    REDIS_URL: str = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+    # Rank data is fresh for `Constants.CACHE_TTL`, then served stale for up to this long while refreshed
+    RANK_CACHE_MAX_STALE: int = int(os.getenv("RANK_CACHE_MAX_STALE", str(24 * 3600)))
+    RANK_CACHE_MAX_ENTRIES: int = int(os.getenv("RANK_CACHE_MAX_ENTRIES", "50000"))
+
+    # Riot IDs account-v1 doesn't know & invalid regions are remembered for this many seconds
+    NEGATIVE_CACHE_TTL: int = int(os.getenv("NEGATIVE_CACHE_TTL", "300"))
+    NEGATIVE_CACHE_MAX_ENTRIES: int = int(
+        os.getenv("NEGATIVE_CACHE_MAX_ENTRIES", "10000")
+    )
+
+    # Background refresh of the most popular players' ranks, ahead of their cache entry going stale
+    REFRESH_INTERVAL: float = float(os.getenv("REFRESH_INTERVAL", "60"))
+    # 0 disables the refresher
+    REFRESH_TOP_K: int = int(os.getenv("REFRESH_TOP_K", "500"))
+    REFRESH_BUDGET_SHARE: float = float(os.getenv("REFRESH_BUDGET_SHARE", "0.2"))
+    REFRESH_AHEAD: float = float(os.getenv("REFRESH_AHEAD", "0.8"))
+    POPULARITY_HALF_LIFE: float = float(os.getenv("POPULARITY_HALF_LIFE", "3600"))
+    POPULARITY_MAX_KEYS: int = int(os.getenv("POPULARITY_MAX_KEYS", "20000"))
+
+    # POST /badge/batch limits
+    BATCH_MAX_BADGES: int = int(os.getenv("BATCH_MAX_BADGES", "50"))
+    BATCH_CONCURRENCY_PER_HOST: int = int(os.getenv("BATCH_CONCURRENCY_PER_HOST", "8"))
+
+    # Upper bound on the memory held by rendered badges
+    BADGE_CACHE_BYTES: int = int(os.getenv("BADGE_CACHE_BYTES", str(16 * 1024 * 1024)))
+
+    # PNG/WebP badges, rendered by a bounded thread pool. Past `RASTER_MAX_PENDING` renders in flight, requests get a 503
+    RASTER_WORKERS: int = int(os.getenv("RASTER_WORKERS", "2"))
+    RASTER_MAX_PENDING: int = int(os.getenv("RASTER_MAX_PENDING", "16"))
+    RASTER_MAX_SCALE: int = int(os.getenv("RASTER_MAX_SCALE", "4"))
+    RASTER_CACHE_BYTES: int = int(
+        os.getenv("RASTER_CACHE_BYTES", str(32 * 1024 * 1024))
+    )
+
+    # Badge calls are summarized to the Discord webhook once per interval, from a bounded queue
+    TELEMETRY_FLUSH_INTERVAL: float = float(os.getenv("TELEMETRY_FLUSH_INTERVAL", "60"))
+    TELEMETRY_QUEUE_SIZE: int = int(os.getenv("TELEMETRY_QUEUE_SIZE", "10000"))
+
+    # Per-stage timings of each badge request, sent back in a `Server-Timing` header
+    SERVER_TIMING: bool = os.getenv("SERVER_TIMING", "true").lower() == "true"
+
+    # cProfile 1 in N badge requests (0 disables sampling), and any request signed with the secret
+    PROFILE_SAMPLE_RATE: int = int(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+    PROFILE_SECRET: str = os.getenv("PROFILE_SECRET")
+    PROFILE_DIR: str = os.getenv(
+        "PROFILE_DIR",
+        os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "profiles"),
+    )
 
 
 class Constants:
+    ASSETS_DIR: str = os.path.join(os.path.dirname(__file__), "assets")
+
     RIOT_ENDPOINTS = {
         "AMERICAS": {
             "BR": "https://br1.api.riotgames.com",
@@ -1,24 +1,99 @@
 # Created by Ryan Polasky, 12/3/24
 # All rights reserved
 
-import uvicorn
+import asyncio
+import logging
+import os
 import time
-import json
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse, RedirectResponse
+from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse, Response
+from app.config import settings
 from app.routers import badge
-import logging
-from discord_webhook import DiscordWebhook
-from app.config import Settings
-import os
-import requests
-from requests.exceptions import RequestException
-
-app = FastAPI()
+from app.services.badge_generator import get_error_badge
+from app.services.badge_styles import STYLES
+from app.services.icon_pipeline import load_icon_registry
+from app.services.text_width import get_width_engine
+from app.services.raster import raster_pool
+from app.services.refresher import refresher
+from app.services.riot_api import rank_cache
+from app.services.riot_client import RiotClientPool, set_client_pool
+from app.services.telemetry import telemetry
+from app.utils.cache import get_cache_backend
+from app.utils.metrics import MetricsMiddleware, mark_process_dead, render_metrics
+from app.utils.profiling import ProfilingMiddleware, profiling_enabled
+from app.utils.puuid_store import get_puuid_store, set_puuid_store
 
 logger = logging.getLogger(__name__)
 
+
+async def warm_up(app: FastAPI):
+    """
+    Preloads the rank icons & font metrics off the event loop, then flags the app as ready.
+    Requests arriving before that still work, they just load what they need lazily.
+    """
+    started = time.perf_counter()
+    try:
+        await asyncio.to_thread(load_icon_registry)
+        for font_size in {style.font_size for style in STYLES.values()}:
+            await asyncio.to_thread(get_width_engine, font_size)
+        await asyncio.to_thread(get_error_badge)
+        await asyncio.to_thread(get_puuid_store)
+    except Exception as e:
+        logger.error(f"Warm-up failed, assets will be loaded lazily: {e}", exc_info=True)
+        return
+
+    app.state.ready = True
+    logger.info(f"Warm-up finished in {time.perf_counter() - started:.3f}s")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    app.state.ready = False
+
+    # Keep one pooled client per Riot routing host alive for the lifetime of the app
+    riot_clients = RiotClientPool()
+    set_client_pool(riot_clients)
+
+    # Nothing below blocks startup, uvicorn starts accepting traffic straight away
+    background = [
+        asyncio.create_task(warm_up(app)),
+        asyncio.create_task(telemetry.post("**Service Restarted**")),
+    ]
+    telemetry.start()
+    refresher.start()
+
+    yield
+
+    for task in background:
+        task.cancel()
+    await asyncio.gather(*background, return_exceptions=True)
+
+    await refresher.stop()
+    raster_pool.shutdown()
+    await telemetry.stop()
+    await rank_cache.aclose()
+    await riot_clients.aclose()
+    set_client_pool(None)
+    get_puuid_store().close()
+    set_puuid_store(None)
+    cache_backend = get_cache_backend()
+    if cache_backend is not None:
+        cache_backend.close()
+    mark_process_dead()
+
+
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(MetricsMiddleware, server_timing=settings.SERVER_TIMING)
+if profiling_enabled():
+    app.add_middleware(
+        ProfilingMiddleware,
+        sample_rate=settings.PROFILE_SAMPLE_RATE,
+        secret=settings.PROFILE_SECRET,
+        output_dir=settings.PROFILE_DIR,
+    )
+
 # Include router(s)
 app.include_router(badge.router, prefix="/badge", tags=["Badge"])
 
@@ -27,69 +102,24 @@ assets_path = os.path.join(os.path.dirname(__file__), "assets")
 app.mount("/assets", StaticFiles(directory=assets_path), name="assets")
 
 
-def send_discord_webhook_safe(content: str, max_retries: int = 3, base_delay: float = 1.0):
+@app.get("/ready")
+async def ready():
+    """
+    Readiness probe, returns 503 until the startup warm-up has finished.
     """
-    Safely send a Discord webhook with error handling and rate limiting protection.
+    if getattr(app.state, "ready", False):
+        return JSONResponse({"status": "ready"}, status_code=200)
+    return JSONResponse({"status": "warming up"}, status_code=503)
 
-    Args:
-        content: Message content to send
-        max_retries: Maximum number of retry attempts
-        base_delay: Base delay in seconds for exponential backoff
+
+@app.get("/metrics")
+async def metrics():
+    """
+    Prometheus metrics, in the text exposition format. With several workers, set `PROMETHEUS_MULTIPROC_DIR`
+    to an empty directory before starting them so that every worker reports the totals of all of them.
     """
-    if not Settings.DISCORD_WEBHOOK:
-        logger.warning("Discord webhook URL not configured, skipping notification")
-        return False
-
-    for attempt in range(max_retries):
-        try:
-            webhook = DiscordWebhook(url=Settings.DISCORD_WEBHOOK, content=content)
-            response = webhook.execute()
-
-            # Check if the response indicates success
-            if hasattr(response, 'status_code') and response.status_code == 200:
-                logger.info("Discord webhook sent successfully")
-                return True
-            elif hasattr(response, 'status_code') and response.status_code == 429:
-                # Rate limited - extract retry-after if available
-                retry_after = 60  # Default fallback
-                try:
-                    if hasattr(response, 'headers') and 'retry-after' in response.headers:
-                        retry_after = int(response.headers['retry-after'])
-                    elif hasattr(response, 'json'):
-                        json_data = response.json()
-                        retry_after = json_data.get('retry_after', 60)
-                except (ValueError, json.JSONDecodeError, AttributeError):
-                    pass
-
-                logger.warning(
-                    f"Discord webhook rate limited. Retry after {retry_after} seconds. Attempt {attempt + 1}/{max_retries}")
-
-                if attempt < max_retries - 1:  # Don't sleep on the last attempt
-                    time.sleep(retry_after)
-                continue
-            else:
-                logger.warning(
-                    f"Discord webhook returned unexpected status: {getattr(response, 'status_code', 'unknown')}")
-
-        except RequestException as e:
-            logger.error(f"Network error sending Discord webhook (attempt {attempt + 1}/{max_retries}): {e}")
-        except Exception as e:
-            logger.error(f"Unexpected error sending Discord webhook (attempt {attempt + 1}/{max_retries}): {e}")
-
-        # Exponential backoff for retries (except rate limiting, which uses retry-after)
-        if attempt < max_retries - 1:
-            delay = base_delay * (2 ** attempt)
-            logger.info(f"Retrying Discord webhook in {delay} seconds...")
-            time.sleep(delay)
-
-    logger.error(f"Failed to send Discord webhook after {max_retries} attempts")
-    return False
-
-
-try:
-    send_discord_webhook_safe("**Service Restarted**")
-except Exception as e:
-    logger.error(f"Critical error in Discord webhook setup: {e}")
+    body, content_type = render_metrics()
+    return Response(body, media_type=content_type)
 
 
 @app.get("/")
@@ -118,4 +148,6 @@ async def head_root():
 
 
 if __name__ == "__main__":
+    import uvicorn  # Only needed when run directly, keeps `import app.main` fast
+
     uvicorn.run(app, host="0.0.0.0", port=8000, log_level="info")
\ No newline at end of file
@@ -1,72 +1,529 @@
 # Created by Ryan Polasky, 12/3/24
 # All rights reserved
 
-from fastapi import APIRouter, HTTPException, Query, status
-from fastapi.responses import Response, PlainTextResponse
+from collections import defaultdict
+from typing import Literal
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, status
+from fastapi.responses import JSONResponse, Response, PlainTextResponse
+from pydantic import BaseModel, Field
+import asyncio
 import regex as re
 import logging
-from discord_webhook import DiscordWebhook
-from app.config import Settings, InvalidRegionException
-from app.services.riot_api import get_summoner_rank
-from app.services.badge_generator import generate_badge  # Assuming this function exists and works
+import math
+from app.config import settings, constants, InvalidRegionException
+from app.services.riot_api import (
+    QueueName,
+    calculate_region,
+    get_rank_by_puuid,
+    get_riot_id,
+    get_summoner_rank,
+    known_failure,
+    known_puuid_failure,
+    select_queue,
+)
+from app.utils.puuid_store import normalize_riot_id
+from app.services.riot_client import RiotClientPool, get_client_pool
+from app.services.refresher import popularity
+from app.services.telemetry import telemetry
+from app.services.badge_styles import DEFAULT_STYLE, StyleName
+from app.services.badge_generator import (
+    ENCODINGS,
+    badge_etag,
+    compose_badge_strip,
+    generate_badge,
+    generate_encoded_badge,
+    stats_text,
+)
+from app.services.raster import RasterPoolFull, generate_raster_badge
+from app.utils.metrics import BADGES
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
+# Riot PUUIDs are 78 characters of URL-safe base64
+PUUID_PATTERN = r"^[A-Za-z0-9_-]{1,100}$"
 
-@router.get("/{region}/{summoner}/{tag_line}", response_class=PlainTextResponse)
-async def get_badge(
-        region: str, summoner: str, tag_line: str, rank_name: bool = Query(False)
-):
-    """
-    Generates a badge for a summoner's rank.
-    """
-    # Init user validity bool
-    valid_user = True
-    error_message = ""
+# Badges may be cached as long as the rank behind them is fresh, then served stale while revalidated with their ETag
+BADGE_CACHE_CONTROL = (
+    f"public, max-age={constants.CACHE_TTL}, stale-while-revalidate={settings.RANK_CACHE_MAX_STALE}"
+)
 
-    # Handle spaces in usernames
-    safe_summoner = summoner.replace("%20", " ")
+ImageFormat = Literal["svg", "png", "webp"]
+MEDIA_TYPES = {"svg": "image/svg+xml", "png": "image/png", "webp": "image/webp"}
 
-    # Send a webhook to creator's Discord for sake of counting the API's users
-    Settings.API_CALLS += 1
-    webhook = DiscordWebhook(
-        url=Settings.DISCORD_WEBHOOK,  # Use Settings.DISCORD_WEBHOOK
-        content=f"Call #{Settings.API_CALLS}: {safe_summoner}#{tag_line} in region {region}",
-    )
-    # Execute webhook in a non-blocking way if possible, or consider a background task
-    # For simplicity, keeping it as is, but for high traffic, this could block.
-    _ = webhook.execute()
 
+def validate_riot_id(safe_summoner: str, tag_line: str) -> str:
+    """
+    Checks a Riot ID for values Riot would never accept, before any upstream call is made.
+    :param safe_summoner: The summoner name, with `%20` already replaced by spaces.
+    :param tag_line: The tag line.
+    :return: The reason the Riot ID is invalid, or an empty string if it's valid.
+    """
     # Check for summoner name being too long
     if len(safe_summoner) > 16:
-        valid_user = False
-        error_message = "Summoner name too long (max 16 characters)."
+        return "Summoner name too long (max 16 characters)."
 
     # Disallow only control characters and symbols
     pattern = r"^[^\p{C}\p{So}]*$"
-    if valid_user and not re.match(pattern, safe_summoner):
-        valid_user = False
-        error_message = "Summoner name contains invalid characters."
+    if not re.match(pattern, safe_summoner):
+        return "Summoner name contains invalid characters."
 
     # Check for tag line being too long
-    if valid_user and len(tag_line) > 5:
-        valid_user = False
-        error_message = "Tag line too long (max 5 characters)."
+    if len(tag_line) > 5:
+        return "Tag line too long (max 5 characters)."
 
     # Check for tag line being alphanumeric
-    if valid_user and not tag_line.isalnum():
-        valid_user = False
-        error_message = "Tag line contains non-alphanumeric characters."
+    if not tag_line.isalnum():
+        return "Tag line contains non-alphanumeric characters."
+
+    return ""
+
+
+def check_scale(image_format: str, scale: int):
+    """
+    SVGs are resolution independent, so `scale` is only accepted along with a raster format.
+    :raises HTTPException: 422 when `scale` is passed with an SVG.
+    """
+    if image_format == "svg" and scale != 1:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="scale only applies to format=png or format=webp.",
+        )
+
+
+async def render_image(rank_data: dict, rank_name: bool, style: str, image_format: str, scale: int) -> bytes:
+    """
+    Renders a badge as an SVG, or as a PNG/WebP in the raster pool.
+    :raises RasterPoolFull: When a raster badge isn't cached & the raster pool is saturated.
+    """
+    if image_format == "svg":
+        return generate_badge(rank_data, rank_name, style)
+    return await generate_raster_badge(rank_data, rank_name, image_format, scale, style)
+
+
+def overloaded_response(e: RasterPoolFull) -> Response:
+    """
+    Served when the raster pool can't take another render, telling the client when to come back.
+    """
+    logger.warning(str(e))
+    return PlainTextResponse(
+        "Too many image badges are being rendered, please retry shortly.",
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        headers={"Retry-After": str(e.retry_after)},
+    )
+
+
+async def image_response(
+        rank_data: dict, rank_name: bool, style: str, image_format: str, scale: int, headers: dict | None = None
+) -> Response:
+    """
+    Serves a badge without an ETag (error & fallback badges) in the requested format.
+    """
+    try:
+        body = await render_image(rank_data, rank_name, style, image_format, scale)
+    except RasterPoolFull as e:
+        return overloaded_response(e)
+    return Response(body, media_type=MEDIA_TYPES[image_format], headers=headers)
+
+
+async def invalid_badge_response(
+        safe_summoner: str,
+        tag_line: str,
+        region: str,
+        error_message: str,
+        style: str = DEFAULT_STYLE,
+        image_format: str = "svg",
+        scale: int = 1,
+) -> Response:
+    """
+    Error badge served when the Riot ID is malformed, or is known not to exist.
+    """
+    logger.warning(
+        f"Invalid user configuration for {safe_summoner}#{tag_line} in region {region}. Reason: {error_message}"
+    )
+
+    # Create mock data to call `generate_badge` with for an error badge
+    rank_data = {
+        "rank": "error",
+        "div": "n/a",
+        "summoner_name": safe_summoner,
+        "tag_line": tag_line,
+        "error_message": error_message  # Pass the specific error message for the badge
+    }
+
+    # Generate the error badge (pre-rendered, every error badge is the same) & return it
+    return await image_response(rank_data, True, style, image_format, scale, headers={"Cache-Control": "no-cache"})
+
+
+async def invalid_puuid_response(
+        puuid: str, platform: str, error_message: str, style: str, image_format: str, scale: int
+) -> Response:
+    """
+    Error badge served when a PUUID or platform is malformed, or is known not to exist.
+    """
+    logger.warning(f"Invalid PUUID {puuid} in region {platform}. Reason: {error_message}")
+    rank_data = {
+        "rank": "error",
+        "div": "n/a",
+        "summoner_name": "",
+        "tag_line": "",
+        "error_message": error_message,
+    }
+    return await image_response(rank_data, True, style, image_format, scale, headers={"Cache-Control": "no-cache"})
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """
+    Checks an `If-None-Match` header against an ETag, using the weak comparison RFC 9110 asks for.
+    Example: ('W/"abc", "def"', '"def"') -> True
+    """
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    return "*" in candidates or etag in (candidate.removeprefix("W/") for candidate in candidates)
+
+
+def negotiate_encoding(accept_encoding: str | None) -> str:
+    """
+    Picks the content coding to serve a badge with, from the codings it's precompressed with.
+    Example: 'gzip, deflate, br;q=0.9' -> 'gzip'
+    :return: One of `ENCODINGS`, or 'identity'.
+    """
+    if not accept_encoding:
+        return "identity"
+
+    weights = {}
+    for part in accept_encoding.lower().split(","):
+        coding, _, params = part.partition(";")
+        weight = 1.0
+        if params.strip().startswith("q="):
+            try:
+                weight = float(params.strip()[2:])
+            except ValueError:
+                weight = 0.0
+        weights[coding.strip()] = weight
 
-    # If the username passed the validity checks above,
-    if valid_user:
+    # Ties go to the coding listed first in `ENCODINGS`, i.e. the smallest one
+    best, best_weight = "identity", 0.0
+    for coding in ENCODINGS:
+        weight = weights.get(coding, weights.get("*", 0.0))
+        if weight > best_weight:
+            best, best_weight = coding, weight
+    return best
+
+
+async def badge_response(
+        rank_data: dict,
+        rank_name: bool,
+        style: str,
+        if_none_match: str | None,
+        accept_encoding: str | None,
+        image_format: str = "svg",
+        scale: int = 1,
+) -> Response:
+    """
+    Serves a badge with its ETag & caching headers, precompressed if the client accepts it. When the client
+    already holds it (usually GitHub's camo proxy revalidating), answers with a bodyless 304 without rendering it.
+    """
+    etag = badge_etag(rank_data, rank_name, style)
+    if image_format == "svg":
+        encoding = negotiate_encoding(accept_encoding)
+        headers = {"Cache-Control": BADGE_CACHE_CONTROL, "Vary": "Accept-Encoding"}
+    else:
+        encoding = "identity"  # PNG & WebP are compressed already
+        headers = {"Cache-Control": BADGE_CACHE_CONTROL}
+        etag = f'{etag[:-1]}-{image_format}@{scale}x"'
+    if encoding != "identity":  # Each representation needs its own strong ETag
+        etag = f'{etag[:-1]}-{encoding}"'
+
+    headers["ETag"] = etag
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    if image_format != "svg":
+        try:
+            raster = await generate_raster_badge(rank_data, rank_name, image_format, scale, style)
+        except RasterPoolFull as e:
+            return overloaded_response(e)
+        return Response(raster, media_type=MEDIA_TYPES[image_format], headers=headers)
+
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+    return Response(
+        generate_encoded_badge(rank_data, rank_name, encoding, style), media_type="image/svg+xml", headers=headers
+    )
+
+
+def badge_rank_data(rank_data: dict, queue: str, show_lp: bool, show_winrate: bool) -> dict:
+    """
+    Picks what a badge shows out of a player's rank data, which holds every queue, so that the badge options
+    never cost another Riot call.
+    """
+    rank_data = select_queue(rank_data, queue)
+    rank_data["stats"] = stats_text(rank_data, show_lp, show_winrate)
+    return rank_data
+
+
+async def fallback_response(
+        rank_data: dict, style: str = DEFAULT_STYLE, image_format: str = "svg", scale: int = 1
+) -> Response:
+    """
+    Fallback badge served when Riot can't be asked right now (rate limit budget exhausted, or the region's
+    circuit is open) & nothing was cached.
+    """
+    return await image_response(
+        rank_data, True, style, image_format, scale, headers={"Retry-After": str(math.ceil(rank_data["retry_after"]))}
+    )
+
+
+class BatchBadge(BaseModel):
+    region: str
+    summoner: str
+    tag_line: str
+    rank_name: bool = False
+    style: StyleName = DEFAULT_STYLE
+    queue: QueueName = "solo"
+    lp: bool = False
+    winrate: bool = False
+
+    @property
+    def key(self) -> str:
+        """The key of the badge in a JSON batch response, mirroring its GET URL."""
+        options = []
+        if self.rank_name:
+            options.append("rank_name=true")
+        if self.style != DEFAULT_STYLE:
+            options.append(f"style={self.style}")
+        if self.queue != "solo":
+            options.append(f"queue={self.queue}")
+        if self.lp:
+            options.append("lp=true")
+        if self.winrate:
+            options.append("winrate=true")
+        key = f"{self.region}/{self.summoner}/{self.tag_line}"
+        return f"{key}?{'&'.join(options)}" if options else key
+
+
+class BatchRequest(BaseModel):
+    badges: list[BatchBadge] = Field(min_length=1, max_length=settings.BATCH_MAX_BADGES)
+    format: Literal["json", "svg"] = "json"
+
+
+async def fetch_batch_ranks(
+        players: dict[tuple[str, str], tuple[str, str, str]], clients: RiotClientPool
+) -> dict[tuple[str, str], dict]:
+    """
+    Fetches the rank data of every unique player in a batch. Players are grouped by platform routing host,
+    and each host gets at most `BATCH_CONCURRENCY_PER_HOST` lookups in flight, so one slow platform
+    can't hold up the others.
+    :param players: Unique players, mapping their (region, normalized Riot ID) to (summoner, tag line, region).
+    :param clients: The pooled Riot API clients to use.
+    :return: The rank data of every player, by the same keys.
+    """
+    results = {}
+    groups = defaultdict(list)
+    for key, (safe_summoner, tag_line, region) in players.items():
+        try:
+            groups[calculate_region(region, False)].append(key)
+        except InvalidRegionException:
+            results[key] = {
+                "rank": "error",
+                "div": "n/a",
+                "summoner_name": safe_summoner,
+                "tag_line": tag_line,
+                "error_message": "Invalid region for rank lookup.",
+            }
+
+    async def fetch_group(keys: list[tuple[str, str]]):
+        semaphore = asyncio.Semaphore(settings.BATCH_CONCURRENCY_PER_HOST)
+
+        async def fetch(key: tuple[str, str]):
+            async with semaphore:
+                results[key] = await get_summoner_rank(*players[key], clients)
+
+        await asyncio.gather(*(fetch(key) for key in keys))
+
+    await asyncio.gather(*(fetch_group(keys) for keys in groups.values()))
+    return results
+
+
+@router.post("/batch")
+async def get_badge_batch(
+        batch: BatchRequest, clients: RiotClientPool = Depends(get_client_pool)
+):
+    """
+    Generates many badges in one request, e.g. for a team page. Identical players are only looked up once.
+    Returns a JSON map of SVGs keyed like the GET route (e.g. `NA1/Eggo/WFLE?rank_name=true&queue=flex`),
+    or, with `"format": "svg"`, a single SVG with every badge side by side.
+    """
+    players = {}
+    invalid = {}
+    for badge in batch.badges:
+        safe_summoner = badge.summoner.replace("%20", " ")
+        BADGES.labels("batch").inc()
+        telemetry.record(badge.region, f"{safe_summoner}#{badge.tag_line}")
+
+        error_message = validate_riot_id(safe_summoner, badge.tag_line) or await known_failure(
+            safe_summoner, badge.tag_line, badge.region
+        )
+        if error_message:
+            invalid[badge.key] = error_message
+            continue
+
+        # Options only change the rendering, so each player is only fetched once
+        player_key = (badge.region.upper(), normalize_riot_id(safe_summoner, badge.tag_line))
+        players.setdefault(player_key, (safe_summoner, badge.tag_line, badge.region))
+        popularity.record(safe_summoner, badge.tag_line, badge.region)
+
+    rank_by_player = await fetch_batch_ranks(players, clients)
+
+    svgs = []
+    for badge in batch.badges:
+        safe_summoner = badge.summoner.replace("%20", " ")
+        if badge.key in invalid:
+            rank_data = {"rank": "error", "div": "n/a", "error_message": invalid[badge.key]}
+        else:
+            player_key = (badge.region.upper(), normalize_riot_id(safe_summoner, badge.tag_line))
+            rank_data = rank_by_player[player_key]
+
+        # Errors don't fail the whole batch, the affected badges render as error badges instead
+        rank_data = {**rank_data, "summoner_name": safe_summoner, "tag_line": badge.tag_line}
+        rank_data = badge_rank_data(rank_data, badge.queue, badge.lp, badge.winrate)
+        svgs.append((badge.key, generate_badge(rank_data, badge.rank_name, badge.style)))
+
+    if batch.format == "svg":
+        return Response(compose_badge_strip([svg for _, svg in svgs]), media_type="image/svg+xml")
+    return JSONResponse({"badges": {key: svg.decode("utf-8") for key, svg in svgs}})
+
+
+@router.get("/by-puuid/{platform}/{puuid}", response_class=PlainTextResponse)
+async def get_badge_by_puuid(
+        platform: str,
+        puuid: str,
+        rank_name: bool = Query(False),
+        style: StyleName = Query(DEFAULT_STYLE),
+        queue: QueueName = Query("solo"),
+        lp: bool = Query(False),
+        winrate: bool = Query(False),
+        image_format: ImageFormat = Query("svg", alias="format"),
+        scale: int = Query(1, ge=1, le=settings.RASTER_MAX_SCALE),
+        if_none_match: str | None = Header(None),
+        accept_encoding: str | None = Header(None),
+        clients: RiotClientPool = Depends(get_client_pool),
+):
+    """
+    Generates a badge for a player's rank directly from their PUUID, skipping the Riot ID lookup, so a badge costs
+    one league-v4 call. The player's name is only needed when `rank_name` is false, and usually comes from the PUUID
+    store. The first badge of a PUUID the store hasn't seen costs one account-v1 call on top, after which the name
+    is stored too.
+    """
+    check_scale(image_format, scale)
+    BADGES.labels("by_puuid").inc()
+    telemetry.record(platform, f"puuid:{puuid[:12]}")
+
+    # Malformed PUUIDs & platforms, and PUUIDs recently found not to exist, never reach the Riot API
+    error_message = ""
+    if not re.match(PUUID_PATTERN, puuid):
+        error_message = "PUUID contains invalid characters."
+    else:
+        try:
+            calculate_region(platform, False)
+        except InvalidRegionException:
+            error_message = "Invalid region for rank lookup."
+    error_message = error_message or await known_puuid_failure(puuid, platform)
+    if error_message:
+        return await invalid_puuid_response(puuid, platform, error_message, style, image_format, scale)
+
+    try:
+        rank_data = await get_rank_by_puuid(puuid, platform, clients)
+
+        if rank_data.get("retry_after") is not None:
+            logger.warning(f"Serving fallback badge for PUUID {puuid}: {rank_data['error_message']}")
+            return await fallback_response(rank_data, style, image_format, scale)
+
+        if rank_data.get("rank") == "error":
+            return await invalid_puuid_response(
+                puuid, platform, rank_data.get("error_message", "Unknown error from Riot API."), style, image_format, scale
+            )
+
+        # Only pay for the name lookup when the badge actually shows the name
+        if not rank_name:
+            riot_id = await get_riot_id(puuid, platform, clients)
+            if riot_id:
+                rank_data["summoner_name"], rank_data["tag_line"] = riot_id
+            else:
+                logger.warning(f"Couldn't find the Riot ID of PUUID {puuid}, showing the rank name instead")
+                rank_name = True
+
+        rank_data = badge_rank_data(rank_data, queue, lp, winrate)
+        return await badge_response(rank_data, rank_name, style, if_none_match, accept_encoding, image_format, scale)
+
+    # If an actual HTTP exception is raised, allow it to raise
+    except HTTPException as e:
+        raise e
+
+    # If some other Pythonic exception is raised, package it into an HTTP exception
+    except Exception as e:
+        logger.error(f"An unexpected error occurred in badge generation: {e}", exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"An unexpected error occurred while generating the badge: {e}",
+        )
+
+
+@router.get("/{region}/{summoner}/{tag_line}", response_class=PlainTextResponse)
+async def get_badge(
+        region: str,
+        summoner: str,
+        tag_line: str,
+        rank_name: bool = Query(False),
+        style: StyleName = Query(DEFAULT_STYLE),
+        queue: QueueName = Query("solo"),
+        lp: bool = Query(False),
+        winrate: bool = Query(False),
+        image_format: ImageFormat = Query("svg", alias="format"),
+        scale: int = Query(1, ge=1, le=settings.RASTER_MAX_SCALE),
+        if_none_match: str | None = Header(None),
+        accept_encoding: str | None = Header(None),
+        clients: RiotClientPool = Depends(get_client_pool),
+):
+    """
+    Generates a badge for a summoner's rank in a queue (`solo`, `flex`, or `best` of the two), optionally with their
+    LP & win rate. Responses carry an ETag, and a matching `If-None-Match` gets a 304. With `format=png` or `webp`
+    the badge is rasterized instead, at `scale` times its size.
+    """
+    check_scale(image_format, scale)
+
+    # Handle spaces in usernames
+    safe_summoner = summoner.replace("%20", " ")
+
+    # Count the call for /metrics, and for the creator's Discord (summarized in the background, never blocking)
+    BADGES.labels("riot_id").inc()
+    telemetry.record(region, f"{safe_summoner}#{tag_line}")
+
+    # Malformed Riot IDs, and ones recently found not to exist, never reach the Riot API
+    error_message = validate_riot_id(safe_summoner, tag_line) or await known_failure(safe_summoner, tag_line, region)
+
+    # If the username passed the validity checks,
+    if not error_message:
+        popularity.record(safe_summoner, tag_line, region)
         try:
             # Fetch rank data from Riot API
             logger.info(
                 f"Trying to retrieve rank data for user {safe_summoner}#{tag_line} in region {region}..."
             )
-            rank_data = await get_summoner_rank(safe_summoner, tag_line, region)
+            rank_data = await get_summoner_rank(safe_summoner, tag_line, region, clients)
+
+            # If Riot can't be asked right now & nothing was cached, fail fast with a fallback badge
+            if rank_data and rank_data.get("retry_after") is not None:
+                logger.warning(f"Serving fallback badge for {safe_summoner}#{tag_line}: {rank_data['error_message']}")
+                return await fallback_response(rank_data, style, image_format, scale)
+
+            # A Riot ID or region that doesn't exist is the user's configuration, not a server error
+            if rank_data and rank_data.get("invalid"):
+                return await invalid_badge_response(
+                    safe_summoner, tag_line, region, rank_data["error_message"], style, image_format, scale
+                )
 
             # Check if get_summoner_rank returned an error dictionary
             if rank_data and rank_data.get("rank") == "error":
@@ -79,19 +536,18 @@ async def get_badge(
                 )
 
             logger.info(f"Rank data found: {rank_data}")
-            # Generate the badge as an SVG
+            # Generate the badge as an SVG, unless the client already holds it
             logger.info(
                 f"Trying to generate badge for user {safe_summoner}#{tag_line} in region {region}..."
             )
-            badge_svg = generate_badge(rank_data, rank_name)
+            rank_data = badge_rank_data(rank_data, queue, lp, winrate)
+            response = await badge_response(
+                rank_data, rank_name, style, if_none_match, accept_encoding, image_format, scale
+            )
             logger.info(
                 f"Badge successfully generated for {safe_summoner}#{tag_line} in region {region}!"
             )
-
-            # Generate the response & return it
-            response = Response(badge_svg, media_type="image/svg+xml")
-            response.headers["Cache-Control"] = "no-cache"
-            return Response(badge_svg, media_type="image/svg+xml", status_code=status.HTTP_200_OK)
+            return response
 
         # If an actual HTTP exception is raised, allow it to raise
         except HTTPException as e:
@@ -105,23 +561,4 @@ async def get_badge(
                 detail=f"An unexpected error occurred while generating the badge: {e}",
             )
     else:  # If the user's configuration is incorrect,
-        logger.warning(
-            f"Invalid user configuration for {safe_summoner}#{tag_line} in region {region}. Reason: {error_message}"
-        )
-
-        # Create mock data to call `generate_badge` with for an error badge
-        rank_data = {
-            "rank": "error",
-            "div": "n/a",
-            "summoner_name": safe_summoner,
-            "tag_line": tag_line,
-            "error_message": error_message  # Pass the specific error message for the badge
-        }
-
-        # Generate the error badge
-        badge_svg = generate_badge(rank_data, True)
-
-        # Generate the response & return it
-        response = Response(badge_svg, media_type="image/svg+xml")
-        response.headers["Cache-Control"] = "no-cache"
-        return Response(badge_svg, media_type="image/svg+xml", status_code=status.HTTP_200_OK)
+        return await invalid_badge_response(safe_summoner, tag_line, region, error_message, style, image_format, scale)
@@ -1,49 +1,60 @@
 # Created by Ryan Polasky, 12/3/24
 # All rights reserved
 
-from PIL import Image, ImageDraw, ImageFont
+from functools import lru_cache
+import gzip
+import hashlib
 import logging
-import base64
-from app.config import constants
+import re
+from xml.sax.saxutils import escape
+from app.config import settings, constants
+from app.services.badge_styles import DEFAULT_STYLE, STYLES, BadgeStyle
+from app.services.icon_pipeline import get_icon_data_uri
+from app.services.text_width import FONT_SIZE, get_width_engine
+from app.utils.cache import ByteLRUCache
+from app.utils.metrics import timed
+
+try:
+    import brotli
+except ImportError:  # Optional, badges are then only precompressed with gzip
+    brotli = None
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
+# Content codings badges are precompressed with, most preferred first
+ENCODINGS = ("br", "gzip") if brotli else ("gzip",)
+
+# Bump whenever the badge layout changes, so that clients holding an old badge re-download it
+RENDER_VERSION = 3
+
+# Finished SVGs, keyed by everything that affects the rendered output. Kept per worker, since rendering one again
+# takes less time than a round trip to the cache backend
+badge_cache = ByteLRUCache(settings.BADGE_CACHE_BYTES, name="badges")
+
 
-def calculate_width(badge_text: str) -> float:
+@lru_cache(maxsize=4096)
+def calculate_width(
+    badge_text: str, font_size: int = FONT_SIZE, letter_spacing: int = 1
+) -> float:
     """
     Dynamically calculates the rectangle width based on the summoner name and tagline length.
     Ensures the text fits comfortably within the rectangle.
     :param badge_text: The text to be displayed on the badge.
+    :param font_size: The font size the text is rendered at.
+    :param letter_spacing: The letter spacing the text is rendered with.
     :return: The width of the rectangle.
     """
-    verdana_path = "app/assets/fonts/Verdana.ttf"
-    noto_path = "app/assets/fonts/NotoSansCJK.otf"
+    engine = get_width_engine(font_size)
 
     padding = 22  # Extra padding for aesthetic spacing
     icon_size = 35  # Extra space for the icon
-    spacing_width = 0  # Init empty var to account for font differences
-
-    try:
-        font = ImageFont.truetype(verdana_path, size=11)  # Match SVG font-size
-
-        # Account for letter spacing by adding extra space for each character (if needed)
-        letter_spacing = (
-            1  # You can adjust this value based on the desired letter spacing
-        )
-        spacing_width = len(badge_text) * letter_spacing
-
-    except IOError:
-        font = ImageFont.truetype(
-            noto_path, size=11
-        )  # Use NotoSansCJK if Verdana fails
 
-    # Create a dummy image and drawing context to calculate text size
-    dummy_image = Image.new("RGB", (1, 1))  # Small image for text sizing
-    draw = ImageDraw.Draw(dummy_image)
+    # Account for letter spacing by adding extra space for each character (Verdana only)
+    spacing_width = len(badge_text) * engine.letter_spacing * letter_spacing
 
-    # Get the text width using the font and calculate the bounding box
-    text_width = draw.textbbox((0, 0), badge_text, font=font)[2]  # Width of the text
+    # Get the text width from the precomputed glyph advances of the font
+    text_width = engine.text_width(badge_text)
 
     # Calculate the total width, adding padding and icon space
     calculated_width = text_width + spacing_width + padding + icon_size
@@ -51,52 +62,196 @@ def calculate_width(badge_text: str) -> float:
     return calculated_width
 
 
-def encode_image_to_base64(image_path: str):
-    with open(image_path, "rb") as image_file:
-        return base64.b64encode(image_file.read()).decode("utf-8")
-
-
-def generate_badge(rank_data: dict, use_rank_name: bool) -> str:
+def badge_key(
+    rank_data: dict, use_rank_name: bool, style: str = DEFAULT_STYLE
+) -> tuple:
     """
-    Generates an SVG badge based on the rank data.
+    Returns everything that affects the rendered badge, which keys the badge cache & the badge's ETag.
+    With `use_rank_name`, every player of the same tier shares a single key, whatever their division.
     :param rank_data: The rank data of the player. Found by using `app.services.riot_api.get_summoner_rank`.
-    :param use_rank_name: Whether to display the rank name instead of username. False by default.
-    :return: Returns the SVG badge in plain text.
+    :param use_rank_name: Whether to display the rank name instead of username.
+    :param style: The badge layout, one of `STYLES`.
+    :return: Example: ('gold', 'Eggo#WFLE', False, 'flat-square')
     """
     rank = rank_data["rank"].lower()
-    div = rank_data["div"].upper()  # Not used as of now
-    summoner_name = rank_data["summoner_name"]
-    tag_line = rank_data["tag_line"]
 
-    if use_rank_name or rank == "error":
+    # Error badges don't depend on the player, so they all share one pre-rendered SVG per style
+    if rank == "error":
+        return "error", style
+
+    if use_rank_name:
         badge_text = rank.upper()
     else:
-        badge_text = f"{summoner_name}#{tag_line}"
+        badge_text = f"{rank_data['summoner_name']}#{rank_data['tag_line']}"
+    if rank_data.get("stats"):
+        badge_text = f"{badge_text} · {rank_data['stats']}"
+    return rank, badge_text, use_rank_name, style
+
+
+def stats_text(rank_data: dict, show_lp: bool, show_winrate: bool) -> str:
+    """
+    Formats the LP & win rate shown after the badge text, from the queue picked by `select_queue`.
+    :return: Example: '75 LP · 56% WR', or an empty string if there's nothing to show.
+    """
+    if rank_data["rank"].lower() in ("unranked", "error"):
+        return ""
 
-    logger.info(f"`generate_badge` started for player {summoner_name}#{tag_line}")
+    stats = []
+    if show_lp:
+        stats.append(f"{rank_data.get('lp', 0)} LP")
+    games = rank_data.get("wins", 0) + rank_data.get("losses", 0)
+    if show_winrate and games:
+        stats.append(f"{round(100 * rank_data['wins'] / games)}% WR")
+    return " · ".join(stats)
 
-    # Determine badge color based on rank, defaulting to light grey for unranked
-    color = constants.colors.get(rank, "#FFFFFF")
+
+def badge_etag(rank_data: dict, use_rank_name: bool, style: str = DEFAULT_STYLE) -> str:
+    """
+    Returns a strong ETag for a badge, derived from its key rather than its bytes, so it's known without rendering.
+    """
+    key = repr(
+        (
+            RENDER_VERSION,
+            settings.ICON_SCALE,
+            badge_key(rank_data, use_rank_name, style),
+        )
+    )
+    return f'"{hashlib.blake2b(key.encode("utf-8"), digest_size=12).hexdigest()}"'
+
+
+def generate_badge(
+    rank_data: dict, use_rank_name: bool, style: str = DEFAULT_STYLE
+) -> bytes:
+    """
+    Generates an SVG badge based on the rank data, reusing a previously rendered badge if possible.
+    :param rank_data: The rank data of the player. Found by using `app.services.riot_api.get_summoner_rank`.
+    :param use_rank_name: Whether to display the rank name instead of username. False by default.
+    :param style: The badge layout, one of `STYLES`.
+    :return: Returns the SVG badge as UTF-8 encoded bytes.
+    """
+    cache_key = badge_key(rank_data, use_rank_name, style)
+    if cache_key[0] == "error":
+        return get_error_badge(style)
+
+    cached_svg = badge_cache.get(cache_key)
+    if cached_svg is not None:
+        return cached_svg
+
+    rank, badge_text, _, _ = cache_key
+    logger.info(
+        f"`generate_badge` started for player {rank_data['summoner_name']}#{rank_data['tag_line']}"
+    )
+    with timed("render"):
+        badge_svg = render_badge(rank, badge_text, style)
+    badge_cache.set(cache_key, badge_svg)
+    return badge_svg
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    """
+    Compresses a badge as hard as possible, since it's only done once per unique badge.
+    :param encoding: One of `ENCODINGS`.
+    """
+    if encoding == "br":
+        return brotli.compress(data, quality=11, mode=brotli.MODE_TEXT)
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+def generate_encoded_badge(
+    rank_data: dict, use_rank_name: bool, encoding: str, style: str = DEFAULT_STYLE
+) -> bytes:
+    """
+    Like `generate_badge`, but returns the badge compressed with a content coding. Each compressed variant is
+    cached next to the uncompressed badge, so a badge is only ever compressed once per coding.
+    :param encoding: One of `ENCODINGS`, or 'identity' for the uncompressed badge.
+    """
+    if encoding == "identity":
+        return generate_badge(rank_data, use_rank_name, style)
+
+    cache_key = (encoding, *badge_key(rank_data, use_rank_name, style))
+    cached = badge_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    badge_svg = generate_badge(rank_data, use_rank_name, style)
+    with timed("compress"):
+        compressed = compress(badge_svg, encoding)
+    badge_cache.set(cache_key, compressed)
+    return compressed
+
+
+@lru_cache(maxsize=len(STYLES))
+def get_error_badge(style: str = DEFAULT_STYLE) -> bytes:
+    """
+    Returns the error badge of a style, rendering it on first use.
+    """
+    return render_badge("error", "ERROR", style)
+
+
+def badge_width(badge_text: str, badge_style: BadgeStyle) -> float:
+    """
+    :param badge_text: The text displayed on the badge, already uppercased if the style asks for it.
+    :param badge_style: The badge layout.
+    :return: The width of the badge, in pixels at 1x.
+    """
+    with timed("width"):
+        if badge_style.fixed_width is not None:
+            return badge_style.fixed_width
+        return calculate_width(
+            badge_text, badge_style.font_size, badge_style.letter_spacing
+        )
+
+
+def render_badge(rank: str, badge_text: str, style: str = DEFAULT_STYLE) -> bytes:
+    """
+    Renders an SVG badge, without going through the badge cache.
+    :param rank: The lowercase rank tier, which picks the icon & color. Example: 'gold'
+    :param badge_text: The text to be displayed on the badge.
+    :param style: The badge layout, one of `STYLES`.
+    :return: Returns the SVG badge as UTF-8 encoded bytes.
+    """
+    badge_style = STYLES[style]
+    if badge_style.uppercase:
+        badge_text = badge_text.upper()
 
     # Calculate proper width for badge
-    proper_width = calculate_width(badge_text)
-
-    # Base64 encode the image (encode into the SVG for sake of GitHub embeds)
-    base64_rank_img = encode_image_to_base64(f"app/assets/{rank}.png")
-
-    # todo - polish this badge layout, maybe add modular styles
-    svg_template = f"""
-    <svg xmlns="http://www.w3.org/2000/svg" width="{proper_width}" height="28">
-        <!-- Rectangle background -->
-        <rect width="{proper_width}" height="28" fill="{color}" />
-        
-        <!-- Icon -->
-        <image href="data:image/png;base64,{base64_rank_img}" x="5" y="0" width="28" height="28" />
-        
-        <!-- Text -->
-        <text x="38" y="15.5" font-family="Verdana" font-size="11" font-weight="bold" fill="white" dominant-baseline="middle" letter-spacing="1">
-            {badge_text}
-        </text>
-    </svg>
-    """
-    return svg_template
+    width = f"{badge_width(badge_text, badge_style):g}"
+
+    return badge_style.template.render(
+        {
+            "width": width,
+            "uid": width.replace(".", "_"),
+            # Determine badge color based on rank, defaulting to white
+            "color": constants.colors.get(rank, "#FFFFFF"),
+            # Base64 encoded image (embedded into the SVG for sake of GitHub embeds), preloaded at startup
+            "icon": get_icon_data_uri(rank),
+            # Riot IDs may contain characters such as '&'
+            "text": escape(badge_text),
+        }
+    )
+
+
+def compose_badge_strip(badges: list[bytes], gap: int = 4) -> bytes:
+    """
+    Lays out several badges side by side in a single SVG, e.g. for a team page.
+    :param badges: The SVG badges, as returned by `generate_badge`.
+    :param gap: Horizontal space between badges.
+    :return: Returns the composed SVG as UTF-8 encoded bytes.
+    """
+    parts = []
+    offset = 0.0
+    height = 0.0
+
+    for badge in badges:
+        width = float(re.search(rb'width="([\d.]+)"', badge).group(1))
+        height = max(height, float(re.search(rb'height="([\d.]+)"', badge).group(1)))
+
+        # Nested <svg> elements are positioned by their x attribute
+        parts.append(
+            badge.replace(b"<svg ", f'<svg x="{offset:g}" '.encode("utf-8"), 1)
+        )
+        offset += width + gap
+
+    total_width = max(offset - gap, 0)
+    header = f'<svg xmlns="http://www.w3.org/2000/svg" width="{total_width:g}" height="{height:g}">'
+    return header.encode("utf-8") + b"".join(parts) + b"</svg>"
@@ -0,0 +1,150 @@
+"""
+Badge layouts, modeled after the shields.io styles. Each layout is written as an SVG template with `{slot}`
+placeholders, compiled once at import into its static fragments, so rendering a badge only joins bytes.
+"""
+
+import re
+from dataclasses import dataclass
+from typing import Literal
+
+StyleName = Literal["flat", "flat-square", "plastic", "for-the-badge", "icon"]
+
+# The original badge layout, kept as the default so that existing embeds don't change
+DEFAULT_STYLE: StyleName = "flat-square"
+
+
+class BadgeTemplate:
+    """
+    An SVG template precompiled into static byte fragments & the slots between them. Slot values are inserted
+    as-is, so callers escape anything user provided.
+    """
+
+    SLOT_PATTERN = re.compile(r"\{(\w+)\}")
+
+    def __init__(self, source: str):
+        # Whitespace between tags is only there for readability
+        source = re.sub(r">\s+<", "><", source.strip())
+        parts = self.SLOT_PATTERN.split(source)
+
+        # `split` alternates static text & slot names, e.g. ['<svg width="', 'width', '">...']
+        self._parts: list[bytes | None] = []
+        self._slots: list[tuple[int, str]] = []
+        for i, part in enumerate(parts):
+            if i % 2:
+                self._slots.append((len(self._parts), part))
+                self._parts.append(None)
+            elif part:
+                self._parts.append(part.encode("utf-8"))
+
+    @property
+    def slots(self) -> set[str]:
+        return {slot for _, slot in self._slots}
+
+    def render(self, values: dict[str, str]) -> bytes:
+        """
+        :param values: The value of every slot.
+        :return: The rendered template, as UTF-8 encoded bytes.
+        """
+        parts = self._parts.copy()
+        for index, slot in self._slots:
+            parts[index] = values[slot].encode("utf-8")
+        return b"".join(parts)
+
+
+@dataclass(frozen=True)
+class BadgeStyle:
+    template: BadgeTemplate
+    uppercase: bool = False
+    fixed_width: float | None = None  # For layouts without any text
+    # Mirrors of the template, for measuring the text & for the PNG/WebP rasterizer
+    corner_radius: float = 0
+    font_size: int = 11
+    letter_spacing: int = 1
+
+
+def _text(font_size: int = 11, letter_spacing: int = 1) -> str:
+    """The text element shared by every layout showing text."""
+    return (
+        f'<text x="38" y="15.5" font-family="Verdana" font-size="{font_size}" font-weight="bold" fill="white" '
+        f'dominant-baseline="middle" letter-spacing="{letter_spacing}">{{text}}</text>'
+    )
+
+
+_ICON = '<image href="{icon}" x="5" y="0" width="28" height="28"/>'
+
+STYLES: dict[str, BadgeStyle] = {
+    "flat-square": BadgeStyle(BadgeTemplate(f"""
+            <svg xmlns="http://www.w3.org/2000/svg" width="{{width}}" height="28">
+                <rect width="{{width}}" height="28" fill="{{color}}"/>
+                {_ICON}
+                {_text()}
+            </svg>
+            """)),
+    # Ids are suffixed with the width, since badges composed into one SVG share a single id namespace
+    "flat": BadgeStyle(
+        BadgeTemplate(f"""
+            <svg xmlns="http://www.w3.org/2000/svg" width="{{width}}" height="28">
+                <linearGradient id="flat-shine" x2="0" y2="100%">
+                    <stop offset="0" stop-color="#bbb" stop-opacity=".1"/>
+                    <stop offset="1" stop-opacity=".1"/>
+                </linearGradient>
+                <clipPath id="flat-{{uid}}">
+                    <rect width="{{width}}" height="28" rx="3" fill="#fff"/>
+                </clipPath>
+                <g clip-path="url(#flat-{{uid}})">
+                    <rect width="{{width}}" height="28" fill="{{color}}"/>
+                    <rect width="{{width}}" height="28" fill="url(#flat-shine)"/>
+                </g>
+                {_ICON}
+                {_text()}
+            </svg>
+            """),
+        corner_radius=3,
+    ),
+    "plastic": BadgeStyle(
+        BadgeTemplate(f"""
+            <svg xmlns="http://www.w3.org/2000/svg" width="{{width}}" height="28">
+                <linearGradient id="plastic-shine" x2="0" y2="100%">
+                    <stop offset="0" stop-color="#fff" stop-opacity=".7"/>
+                    <stop offset=".1" stop-color="#aaa" stop-opacity=".1"/>
+                    <stop offset=".9" stop-opacity=".3"/>
+                    <stop offset="1" stop-opacity=".5"/>
+                </linearGradient>
+                <clipPath id="plastic-{{uid}}">
+                    <rect width="{{width}}" height="28" rx="4" fill="#fff"/>
+                </clipPath>
+                <g clip-path="url(#plastic-{{uid}})">
+                    <rect width="{{width}}" height="28" fill="{{color}}"/>
+                    <rect width="{{width}}" height="28" fill="url(#plastic-shine)"/>
+                </g>
+                {_ICON}
+                {_text()}
+            </svg>
+            """),
+        corner_radius=4,
+    ),
+    "for-the-badge": BadgeStyle(
+        BadgeTemplate(f"""
+            <svg xmlns="http://www.w3.org/2000/svg" width="{{width}}" height="28">
+                <rect width="{{width}}" height="28" fill="{{color}}"/>
+                {_ICON}
+                {_text(font_size=10, letter_spacing=2)}
+            </svg>
+            """),
+        uppercase=True,
+        font_size=10,
+        letter_spacing=2,
+    ),
+    # Just the rank icon, with the text as a tooltip
+    "icon": BadgeStyle(
+        BadgeTemplate(f"""
+            <svg xmlns="http://www.w3.org/2000/svg" width="{{width}}" height="28">
+                <title>{{text}}</title>
+                <rect width="{{width}}" height="28" rx="3" fill="{{color}}"/>
+                {_ICON}
+            </svg>
+            """),
+        fixed_width=38,
+        corner_radius=3,
+    ),
+}
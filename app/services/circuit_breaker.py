@@ -0,0 +1,167 @@
+import logging
+import time
+from collections import deque
+from app.config import settings
+from app.utils.metrics import CIRCUIT_REJECTED, CIRCUIT_STATE, host_label
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}  # As exposed in the metrics
+
+
+class CircuitOpen(Exception):
+    """Raised instead of calling a Riot routing host whose circuit is open."""
+
+    def __init__(self, host: str, retry_after: float):
+        super().__init__(f"Circuit for {host} is open, retry after {retry_after:.1f}s")
+        self.host = host
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker for one Riot routing host. It opens once too many of the last `window` calls
+    failed or were slower than `slow_call_seconds`, rejects calls for `open_seconds`, then lets
+    a single probe through (half-open) to decide whether to close again.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        failure_rate: float,
+        slow_call_seconds: float,
+        window: int,
+        min_calls: int,
+        open_seconds: float,
+    ):
+        """
+        :param host: The routing host base URL. Example: 'https://kr.api.riotgames.com'
+        :param failure_rate: Share of failed or slow calls in the window that opens the circuit, e.g. 0.5.
+        :param slow_call_seconds: Calls slower than this count as failures.
+        :param window: Number of most recent calls the failure rate is computed over.
+        :param min_calls: Calls needed in the window before the circuit may open.
+        :param open_seconds: Seconds calls are rejected for before a probe is let through.
+        """
+        self.host = host
+        self.failure_rate = failure_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.min_calls = min_calls
+        self.open_seconds = open_seconds
+
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self._outcomes: deque[bool] = deque(
+            maxlen=window
+        )  # True for a failed or slow call
+        self._probing = False
+
+        self.rejected = 0
+        self.times_opened = 0
+
+    def before_call(self):
+        """
+        Lets a call through, or raises `CircuitOpen` if the host should be left alone for now.
+        """
+        if self.state == CLOSED:
+            return
+
+        retry_after = self.opened_at + self.open_seconds - time.monotonic()
+        if self.state == OPEN and retry_after <= 0:
+            self._set_state(HALF_OPEN)
+            logger.info(f"Circuit for {self.host} half-open, probing")
+
+        if self.state == HALF_OPEN and not self._probing:
+            self._probing = True
+            return
+
+        self.rejected += 1
+        CIRCUIT_REJECTED.labels(host_label(self.host)).inc()
+        raise CircuitOpen(self.host, max(retry_after, 1.0))
+
+    def release(self):
+        """
+        Gives up a call let through by `before_call` without an outcome, e.g. when the rate limiter rejected it.
+        """
+        self._probing = False
+
+    def record(self, failed: bool, latency: float):
+        """
+        Records the outcome of a call let through by `before_call`.
+        :param failed: Whether the call failed, i.e. a network error or a 5xx.
+        :param latency: Seconds the call took.
+        """
+        failed = failed or latency > self.slow_call_seconds
+
+        if self.state == HALF_OPEN:
+            self._probing = False
+            if failed:
+                self._open()
+            else:
+                self._set_state(CLOSED)
+                self._outcomes.clear()
+                logger.info(f"Circuit for {self.host} closed")
+            return
+
+        self._outcomes.append(failed)
+        if (
+            self.state == CLOSED
+            and len(self._outcomes) >= self.min_calls
+            and sum(self._outcomes) / len(self._outcomes) >= self.failure_rate
+        ):
+            self._open()
+
+    def _set_state(self, state: str):
+        self.state = state
+        CIRCUIT_STATE.labels(host_label(self.host)).set(STATE_VALUES[state])
+
+    def _open(self):
+        self._set_state(OPEN)
+        self.opened_at = time.monotonic()
+        self.times_opened += 1
+        self._outcomes.clear()
+        logger.warning(f"Circuit for {self.host} opened for {self.open_seconds:g}s")
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "rejected": self.rejected,
+            "times_opened": self.times_opened,
+        }
+
+
+class CircuitBreakers:
+    """One `CircuitBreaker` per Riot routing host, created on first use."""
+
+    def __init__(self, **breaker_options):
+        """
+        :param breaker_options: Options passed to every `CircuitBreaker`.
+        """
+        self.breaker_options = breaker_options
+        self._breakers: dict[str, CircuitBreaker] = {}
+
+    def get(self, host: str) -> CircuitBreaker:
+        breaker = self._breakers.get(host)
+        if breaker is None:
+            breaker = self._breakers[host] = CircuitBreaker(
+                host, **self.breaker_options
+            )
+        return breaker
+
+    def clear(self):
+        self._breakers.clear()
+
+    def stats(self) -> dict:
+        return {host: breaker.stats() for host, breaker in self._breakers.items()}
+
+
+circuit_breakers = CircuitBreakers(
+    failure_rate=settings.CIRCUIT_FAILURE_RATE,
+    slow_call_seconds=settings.CIRCUIT_SLOW_CALL_SECONDS,
+    window=settings.CIRCUIT_WINDOW,
+    min_calls=settings.CIRCUIT_MIN_CALLS,
+    open_seconds=settings.CIRCUIT_OPEN_SECONDS,
+)
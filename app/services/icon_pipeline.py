@@ -0,0 +1,181 @@
+import argparse
+import base64
+import io
+import logging
+import os
+from dataclasses import dataclass
+from PIL import Image
+from app.config import settings, constants
+
+logger = logging.getLogger(__name__)
+
+ASSETS_DIR = constants.ASSETS_DIR
+ICONS_DIR = os.path.join(ASSETS_DIR, "icons")
+
+ICON_SIZE = 28  # Matches the <image> width/height drawn in the badge SVG
+ICON_SCALES = (1, 2)  # 1x for regular displays, 2x for HiDPI
+ICON_COLORS = 64  # Palette size, rank icons are mostly flat shades so 64 is plenty
+
+# Tier -> `data:` URI of its optimized icon, filled once by `load_icon_registry`
+_icon_registry: dict[str, str] = {}
+# (tier, scale) -> optimized PNG of its icon at every scale, for the PNG/WebP rasterizer
+_icon_bytes: dict[tuple[str, int], bytes] = {}
+
+
+@dataclass
+class IconReport:
+    tier: str
+    scale: int
+    source_bytes: int
+    optimized_bytes: int
+
+    @property
+    def ratio(self) -> float:
+        return self.optimized_bytes / self.source_bytes if self.source_bytes else 0.0
+
+
+def icon_filename(tier: str, scale: int = 1) -> str:
+    """
+    Returns the file name of an optimized icon, e.g. 'gold.png' or 'gold@2x.png'.
+    :param tier: The rank tier, lowercase. Example: 'gold'
+    :param scale: The pixel density multiplier of the icon.
+    :return: The file name inside `ICONS_DIR`.
+    """
+    return f"{tier}.png" if scale == 1 else f"{tier}@{scale}x.png"
+
+
+def optimize_icon(source_path: str, scale: int = 1) -> bytes:
+    """
+    Downscales a source rank icon to its display size and palette-quantizes it.
+    :param source_path: Path to the full resolution source PNG.
+    :param scale: The pixel density multiplier, 2 produces a 56x56 icon for HiDPI displays.
+    :return: The optimized PNG as bytes.
+    """
+    size = ICON_SIZE * scale
+    with Image.open(source_path) as source:
+        resized = source.convert("RGBA").resize((size, size), Image.Resampling.LANCZOS)
+
+    # FASTOCTREE is the only built-in quantizer that keeps the alpha channel
+    quantized = resized.quantize(colors=ICON_COLORS, method=Image.Quantize.FASTOCTREE)
+
+    buffer = io.BytesIO()
+    quantized.save(buffer, format="PNG", optimize=True)
+    return buffer.getvalue()
+
+
+def build_icons(
+    source_dir: str = ASSETS_DIR,
+    output_dir: str = ICONS_DIR,
+    scales: tuple[int, ...] = ICON_SCALES,
+) -> list[IconReport]:
+    """
+    Builds the optimized icon set for every tier in `Constants.colors`.
+    :param source_dir: Directory holding the full resolution `{tier}.png` files.
+    :param output_dir: Directory the optimized icons are written to.
+    :param scales: The pixel density multipliers to build.
+    :return: A size report per tier & scale.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    reports = []
+
+    for tier in constants.colors:
+        source_path = os.path.join(source_dir, f"{tier}.png")
+        source_bytes = os.path.getsize(source_path)
+
+        for scale in scales:
+            optimized = optimize_icon(source_path, scale)
+            with open(os.path.join(output_dir, icon_filename(tier, scale)), "wb") as f:
+                f.write(optimized)
+
+            reports.append(IconReport(tier, scale, source_bytes, len(optimized)))
+
+    return reports
+
+
+def load_icon(tier: str, scale: int | None = None) -> bytes:
+    """
+    Loads the optimized icon for a tier, building it in memory if the asset stage hasn't run.
+    :param tier: The rank tier, lowercase. Example: 'gold'
+    :param scale: The pixel density multiplier. Defaults to `Settings.ICON_SCALE`.
+    :return: The optimized PNG as bytes.
+    """
+    scale = scale or settings.ICON_SCALE
+    try:
+        with open(os.path.join(ICONS_DIR, icon_filename(tier, scale)), "rb") as f:
+            return f.read()
+    except FileNotFoundError:
+        logger.warning(f"Optimized icon for '{tier}' @{scale}x missing, building it")
+        return optimize_icon(os.path.join(ASSETS_DIR, f"{tier}.png"), scale)
+
+
+def load_icon_registry(scale: int | None = None) -> dict[str, str]:
+    """
+    Loads the icon of every tier in `Constants.colors` at every scale into memory, base64 encoding the ones
+    embedded in SVGs. Called once from the app's lifespan hook so that rendering a badge never touches the disk.
+    :param scale: The pixel density multiplier of the embedded icons. Defaults to `Settings.ICON_SCALE`.
+    :return: The registry, mapping each tier to the `data:` URI of its icon.
+    """
+    scale = scale or settings.ICON_SCALE
+    icons = {
+        (tier, s): load_icon(tier, s)
+        for tier in constants.colors
+        for s in {*ICON_SCALES, scale}
+    }
+    registry = {}
+    for tier in constants.colors:
+        encoded = base64.b64encode(icons[tier, scale]).decode("utf-8")
+        registry[tier] = f"data:image/png;base64,{encoded}"
+
+    # Swapped in whole, so a badge rendered while this runs never sees a half-filled registry
+    global _icon_registry, _icon_bytes
+    _icon_registry, _icon_bytes = registry, icons
+    logger.info(f"Icon registry loaded with {len(registry)} tiers")
+    return registry
+
+
+def get_icon_data_uri(tier: str) -> str:
+    """
+    Looks up the embedded icon for a tier, loading the registry first if the app hasn't yet.
+    :param tier: The rank tier, lowercase. Example: 'gold'
+    :return: The `data:` URI of the tier's icon, or the unranked icon for unknown tiers.
+    """
+    registry = _icon_registry or load_icon_registry()
+    return registry.get(tier) or registry["unranked"]
+
+
+def get_icon_bytes(tier: str, scale: int) -> bytes:
+    """
+    Looks up the optimized PNG of a tier's icon, loading the registry first if the app hasn't yet.
+    :param tier: The rank tier, lowercase. Example: 'gold'
+    :param scale: One of `ICON_SCALES`.
+    :return: The PNG as bytes, or the unranked icon's for unknown tiers.
+    """
+    if not _icon_bytes:
+        load_icon_registry()
+    return _icon_bytes.get((tier, scale)) or _icon_bytes["unranked", scale]
+
+
+def format_report(reports: list[IconReport]) -> str:
+    lines = [f"{'tier':<12} {'scale':>5} {'source':>10} {'optimized':>10} {'ratio':>7}"]
+    for r in reports:
+        lines.append(
+            f"{r.tier:<12} {f'{r.scale}x':>5} {r.source_bytes:>10,} "
+            f"{r.optimized_bytes:>10,} {r.ratio:>7.1%}"
+        )
+
+    total_source = sum(r.source_bytes for r in reports if r.scale == 1)
+    total_optimized = sum(r.optimized_bytes for r in reports if r.scale == 1)
+    lines.append(f"1x total: {total_source:,} B -> {total_optimized:,} B")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build optimized badge rank icons.")
+    parser.add_argument("--source-dir", default=ASSETS_DIR)
+    parser.add_argument("--output-dir", default=ICONS_DIR)
+    parser.add_argument("--scales", type=int, nargs="+", default=list(ICON_SCALES))
+    args = parser.parse_args()
+
+    print(
+        format_report(build_icons(args.source_dir, args.output_dir, tuple(args.scales)))
+    )
@@ -0,0 +1,222 @@
+"""
+PNG & WebP badges, for the places that can't embed an SVG (e.g. Discord embeds, forum signatures). They're drawn
+with Pillow from the same icons & font as the SVG badges, in a bounded pool of threads so that rendering never
+blocks the event loop, & cached by size since a raster is several times larger than its SVG.
+"""
+
+import asyncio
+import io
+import logging
+import math
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import lru_cache
+from typing import Callable, Hashable, Literal
+from PIL import Image, ImageDraw, ImageFont
+from app.config import settings, constants
+from app.services.badge_generator import badge_key, badge_width
+from app.services.badge_styles import DEFAULT_STYLE, STYLES
+from app.services.icon_pipeline import ICON_SCALES, ICON_SIZE, get_icon_bytes
+from app.services.text_width import get_width_engine
+from app.utils.cache import ByteLRUCache, get_cache_backend
+from app.utils.metrics import RASTER_REJECTED, timed
+
+logger = logging.getLogger(__name__)
+
+RasterFormat = Literal["png", "webp"]
+
+BADGE_HEIGHT = 28
+ICON_X = 5
+TEXT_X = 38
+TEXT_Y = 15.5
+
+# Finished rasters, keyed by format & scale on top of the badge key
+raster_cache = ByteLRUCache(
+    settings.RASTER_CACHE_BYTES, name="rasters", backend=get_cache_backend()
+)
+
+
+class RasterPoolFull(Exception):
+    def __init__(self, retry_after: int):
+        super().__init__(f"Raster pool full, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+class RasterPool:
+    """
+    Bounded pool of threads rasterizing badges. Pillow releases the GIL while resampling & encoding, and threads share
+    the icons & font already loaded by this process, where a process pool would have to load them again.
+    At most `max_pending` renders are running or queued at once, past that `submit` fails straight away rather
+    than letting a burst of raster requests build up an unbounded backlog. Identical renders in flight are shared.
+    """
+
+    def __init__(self, workers: int, max_pending: int):
+        """
+        :param workers: Threads rendering at once.
+        :param max_pending: Renders running or queued at most.
+        """
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor: ThreadPoolExecutor | None = None
+        self._inflight: dict[Hashable, Future] = {}
+
+        # Moving average of the seconds taken per render, to tell rejected clients when to come back
+        self.render_seconds = 0.05
+
+        self.rendered = 0
+        self.shared = 0
+        self.rejected = 0
+
+    @property
+    def pending(self) -> int:
+        return len(self._inflight)
+
+    def retry_after(self) -> int:
+        return max(1, math.ceil(self.pending * self.render_seconds / self.workers))
+
+    def _run(self, func: Callable[..., bytes], *args) -> bytes:
+        started = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            self.render_seconds = 0.8 * self.render_seconds + 0.2 * (
+                time.perf_counter() - started
+            )
+
+    async def submit(self, key: Hashable, func: Callable[..., bytes], *args) -> bytes:
+        """
+        Runs `func(*args)` in the pool, or joins the render of `key` already in flight.
+        :raises RasterPoolFull: When `max_pending` renders are already running or queued.
+        """
+        future = self._inflight.get(key)
+        if future is not None:
+            self.shared += 1
+        else:
+            if self.pending >= self.max_pending:
+                self.rejected += 1
+                RASTER_REJECTED.inc()
+                raise RasterPoolFull(self.retry_after())
+
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    self.workers, thread_name_prefix="raster"
+                )
+            future = self._executor.submit(self._run, func, *args)
+            self.rendered += 1
+            # Released when the render finishes, even if every request waiting on it went away
+            self._inflight[key] = future
+            future.add_done_callback(lambda _: self._inflight.pop(key, None))
+
+        return await asyncio.shield(asyncio.wrap_future(future))
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> dict:
+        return {
+            "pending": self.pending,
+            "rendered": self.rendered,
+            "shared": self.shared,
+            "rejected": self.rejected,
+        }
+
+
+raster_pool = RasterPool(settings.RASTER_WORKERS, settings.RASTER_MAX_PENDING)
+
+
+@lru_cache(maxsize=16)
+def get_font(size: int) -> ImageFont.FreeTypeFont:
+    """
+    :return: The badge font of the width engine, at a pixel size.
+    """
+    return get_width_engine().font.font_variant(size=size)
+
+
+@lru_cache(maxsize=64)
+def get_icon_image(tier: str, scale: int) -> Image.Image:
+    """
+    Decodes a tier's icon at a badge scale, from the sharpest preloaded icon that's no larger than needed.
+    """
+    icon_scale = max(s for s in ICON_SCALES if s <= scale)
+    icon = Image.open(io.BytesIO(get_icon_bytes(tier, icon_scale))).convert("RGBA")
+
+    size = ICON_SIZE * scale
+    if icon.size != (size, size):
+        icon = icon.resize((size, size), Image.Resampling.LANCZOS)
+    return icon
+
+
+def render_raster(
+    rank: str, badge_text: str, style: str, image_format: RasterFormat, scale: int
+) -> bytes:
+    """
+    Renders a badge as a PNG or WebP, laid out like its SVG, without going through the raster cache.
+    :param rank: The lowercase rank tier, which picks the icon & color. Example: 'gold'
+    :param badge_text: The text to be displayed on the badge.
+    :param style: The badge layout, one of `STYLES`. Gradients are left out.
+    :param image_format: 'png' or 'webp'.
+    :param scale: The pixel density multiplier, e.g. 2 for HiDPI.
+    :return: The encoded image.
+    """
+    badge_style = STYLES[style]
+    if badge_style.uppercase:
+        badge_text = badge_text.upper()
+
+    width = math.ceil(badge_width(badge_text, badge_style) * scale)
+    height = BADGE_HEIGHT * scale
+    image = Image.new("RGBA", (width, height), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(image)
+    draw.rounded_rectangle(
+        (0, 0, width - 1, height - 1),
+        radius=badge_style.corner_radius * scale,
+        fill=constants.colors.get(rank, "#FFFFFF"),
+    )
+    image.alpha_composite(get_icon_image(rank, scale), (ICON_X * scale, 0))
+
+    if badge_style.fixed_width is None:
+        # Pillow has no letter spacing, so the text is laid out one character at a time
+        font = get_font(badge_style.font_size * scale)
+        x = TEXT_X * scale
+        for char in badge_text:
+            draw.text((x, TEXT_Y * scale), char, font=font, fill="white", anchor="lm")
+            x += font.getlength(char) + badge_style.letter_spacing * scale
+
+    buffer = io.BytesIO()
+    if image_format == "webp":
+        image.save(buffer, format="WEBP", lossless=True, method=4)
+    else:
+        image.save(buffer, format="PNG", compress_level=6)
+    return buffer.getvalue()
+
+
+async def generate_raster_badge(
+    rank_data: dict,
+    use_rank_name: bool,
+    image_format: RasterFormat,
+    scale: int = 1,
+    style: str = DEFAULT_STYLE,
+) -> bytes:
+    """
+    Like `generate_badge`, but returns the badge as a PNG or WebP, rendered in `raster_pool`.
+    :param image_format: 'png' or 'webp'.
+    :param scale: The pixel density multiplier, e.g. 2 for HiDPI.
+    :raises RasterPoolFull: When the badge isn't cached & the pool is saturated.
+    """
+    key = badge_key(rank_data, use_rank_name, style)
+    cache_key = (image_format, scale, *key)
+    cached = await raster_cache.aget(cache_key)
+    if cached is not None:
+        return cached
+
+    if key[0] == "error":
+        rank, badge_text = "error", "ERROR"
+    else:
+        rank, badge_text, _, _ = key
+    with timed("raster"):
+        raster = await raster_pool.submit(
+            cache_key, render_raster, rank, badge_text, style, image_format, scale
+        )
+    await raster_cache.aset(cache_key, raster)
+    return raster
@@ -0,0 +1,244 @@
+import asyncio
+import logging
+import time
+import httpx
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimitExceeded(Exception):
+    """Raised when a Riot request would have to queue for longer than the allowed deadline."""
+
+    def __init__(self, scope: str, retry_after: float):
+        super().__init__(
+            f"Riot rate limit for {scope} exhausted, retry after {retry_after:.1f}s"
+        )
+        self.scope = scope
+        self.retry_after = retry_after
+
+
+def parse_rate_limits(header: str | None) -> list[tuple[int, int]]:
+    """
+    Parses a Riot rate limit header into (count, window seconds) pairs.
+    Example: '20:1,100:120' -> [(20, 1), (100, 120)]
+    """
+    pairs = []
+    for part in (header or "").split(","):
+        try:
+            count, window = part.strip().split(":")
+            pairs.append((int(count), int(window)))
+        except ValueError:
+            continue
+    return pairs
+
+
+class RateWindow:
+    """A single fixed window of a Riot rate limit, e.g. 100 requests per 120 seconds."""
+
+    def __init__(self, limit: int, window: int):
+        self.limit = limit
+        self.window = window
+        self.count = 0
+        self.started_at = 0.0
+
+    def _roll(self, now: float):
+        if now - self.started_at >= self.window:
+            self.started_at = now
+            self.count = 0
+
+    def wait_time(self, now: float) -> float:
+        self._roll(now)
+        if self.count < self.limit:
+            return 0.0
+        return self.started_at + self.window - now
+
+    def consume(self, now: float):
+        self._roll(now)
+        self.count += 1
+
+    def sync(self, count: int, now: float):
+        """Catches up with the count Riot reports, which includes requests made by other processes."""
+        self._roll(now)
+        self.count = max(self.count, count)
+
+
+class RateLimitBucket:
+    """Every window of one rate limit scope (the app on a host, or one method on a host)."""
+
+    def __init__(self, limits: list[tuple[int, int]] | None = None):
+        self.windows: dict[int, RateWindow] = {}
+        self.blocked_until = 0.0
+        self.set_limits(limits or [])
+
+    def set_limits(self, limits: list[tuple[int, int]]):
+        """Replaces the windows of the bucket, keeping the counts of windows that still exist."""
+        if not limits:
+            return
+
+        windows = {}
+        for limit, window in limits:
+            windows[window] = self.windows.get(window) or RateWindow(limit, window)
+            windows[window].limit = limit
+        self.windows = windows
+
+    def wait_time(self, now: float) -> float:
+        waits = [w.wait_time(now) for w in self.windows.values()]
+        return max([self.blocked_until - now, *waits, 0.0])
+
+    def consume(self, now: float):
+        for w in self.windows.values():
+            w.consume(now)
+
+    def update(self, limit_header: str | None, count_header: str | None, now: float):
+        self.set_limits(parse_rate_limits(limit_header))
+        for count, window in parse_rate_limits(count_header):
+            if window in self.windows:
+                self.windows[window].sync(count, now)
+
+    def block(self, seconds: float, now: float):
+        self.blocked_until = max(self.blocked_until, now + seconds)
+
+
+class RiotRateLimiter:
+    """
+    Keeps outgoing Riot requests under the app & method rate limits of each routing host.
+    Limits are learnt from the `X-App-Rate-Limit` & `X-Method-Rate-Limit` headers (and kept in
+    sync with their `-Count` counterparts). Requests wait until budget frees up, and fail fast
+    with `RateLimitExceeded` rather than wait for longer than `max_wait`.
+    """
+
+    def __init__(
+        self, max_wait: float, default_app_limits: str, default_429_backoff: float
+    ):
+        """
+        :param max_wait: Seconds a request may queue for before failing fast.
+        :param default_app_limits: App limits assumed before Riot has reported any, e.g. '20:1,100:120'.
+        :param default_429_backoff: Seconds to back off after a 429 without a `Retry-After` header.
+        """
+        self.max_wait = max_wait
+        self.default_app_limits = parse_rate_limits(default_app_limits)
+        self.default_429_backoff = default_429_backoff
+
+        self._app_buckets: dict[str, RateLimitBucket] = {}
+        self._method_buckets: dict[tuple[str, str], RateLimitBucket] = {}
+
+        self.requests = 0
+        self.queued = 0
+        self.rejected = 0
+        self.throttled_429 = 0
+
+    def _buckets(
+        self, host: str, method: str
+    ) -> tuple[RateLimitBucket, RateLimitBucket]:
+        app_bucket = self._app_buckets.get(host)
+        if app_bucket is None:
+            app_bucket = self._app_buckets[host] = RateLimitBucket(
+                self.default_app_limits
+            )
+
+        method_bucket = self._method_buckets.get((host, method))
+        if method_bucket is None:
+            method_bucket = self._method_buckets[(host, method)] = RateLimitBucket()
+
+        return app_bucket, method_bucket
+
+    async def acquire(self, host: str, method: str):
+        """
+        Waits for a slot in the app & method budget of a host.
+        Checking & consuming the budget never awaits, so it's atomic on the event loop without holding a lock
+        while sleeping, and a method with room in its windows never waits behind another method's.
+        :param host: The routing host base URL. Example: 'https://na1.api.riotgames.com'
+        :param method: The Riot API method. Example: 'league-v4.entries.by-puuid'
+        """
+        self.requests += 1
+        deadline = time.monotonic() + self.max_wait
+        app_bucket, method_bucket = self._buckets(host, method)
+
+        waited = False
+        while True:
+            now = time.monotonic()
+            wait = max(app_bucket.wait_time(now), method_bucket.wait_time(now))
+            if wait <= 0:
+                app_bucket.consume(now)
+                method_bucket.consume(now)
+                return
+
+            if now + wait > deadline:
+                self.rejected += 1
+                raise RateLimitExceeded(f"{method} on {host}", wait)
+
+            if not waited:
+                self.queued += 1
+                waited = True
+            await asyncio.sleep(wait)
+
+    def update(self, host: str, method: str, response: httpx.Response):
+        """
+        Updates the budget of a host from the rate limit headers of one of its responses.
+        """
+        now = time.monotonic()
+        app_bucket, method_bucket = self._buckets(host, method)
+        headers = response.headers
+
+        app_bucket.update(
+            headers.get("X-App-Rate-Limit"), headers.get("X-App-Rate-Limit-Count"), now
+        )
+        method_bucket.update(
+            headers.get("X-Method-Rate-Limit"),
+            headers.get("X-Method-Rate-Limit-Count"),
+            now,
+        )
+
+        if response.status_code == 429:
+            self.throttled_429 += 1
+            retry_after = self.retry_after(response)
+            limit_type = headers.get("X-Rate-Limit-Type", "service")
+            logger.warning(
+                f"Riot 429 ({limit_type}) for {method} on {host}, backing off {retry_after}s"
+            )
+            if limit_type == "application":
+                app_bucket.block(retry_after, now)
+            else:
+                method_bucket.block(retry_after, now)
+
+    def retry_after(self, response: httpx.Response) -> float:
+        """
+        :return: Seconds to back off for after a 429, from its `Retry-After` header.
+        """
+        try:
+            return float(response.headers.get("Retry-After", ""))
+        except ValueError:
+            return self.default_429_backoff
+
+    def sustained_rate(self, host: str) -> float:
+        """
+        :return: Requests per second the app limits of a host allow over the long run, i.e. those of its
+                 tightest window. Uses the default app limits until Riot has reported the real ones.
+        """
+        bucket = self._app_buckets.get(host)
+        windows = (
+            bucket.windows.values()
+            if bucket
+            else [RateWindow(*w) for w in self.default_app_limits]
+        )
+        return min((w.limit / w.window for w in windows), default=0.0)
+
+    def clear(self):
+        self._app_buckets.clear()
+        self._method_buckets.clear()
+
+    def stats(self) -> dict:
+        return {
+            "requests": self.requests,
+            "queued": self.queued,
+            "rejected": self.rejected,
+            "throttled_429": self.throttled_429,
+        }
+
+
+rate_limiter = RiotRateLimiter(
+    max_wait=settings.RIOT_RATE_LIMIT_MAX_WAIT,
+    default_app_limits=settings.RIOT_APP_RATE_LIMIT,
+    default_429_backoff=settings.RIOT_429_BACKOFF,
+)
@@ -0,0 +1,249 @@
+import asyncio
+import heapq
+import logging
+import math
+import time
+from typing import Hashable
+from app.config import settings, constants, InvalidRegionException
+from app.services.circuit_breaker import CLOSED, circuit_breakers
+from app.services.rate_limit import rate_limiter
+from app.services.riot_api import calculate_region, get_summoner_rank, rank_cache
+from app.services.riot_client import RiotClientPool
+from app.utils.metrics import REFRESHES
+from app.utils.puuid_store import get_puuid_store, normalize_riot_id
+
+logger = logging.getLogger(__name__)
+
+# Rebase the scores before exp() gets anywhere near overflowing a float
+MAX_EXPONENT = 500
+
+
+class PopularityTracker:
+    """
+    Exponentially decaying request counter per player. Rather than decaying every counter as time passes,
+    each request is worth `exp(t / tau)`, which keeps recording O(1) & ranks players the same way.
+    """
+
+    def __init__(self, half_life: float, max_keys: int):
+        """
+        :param half_life: Seconds after which a request counts half as much.
+        :param max_keys: Players tracked at most, the least popular are forgotten first.
+        """
+        self.tau = half_life / math.log(2)
+        self.max_keys = max_keys
+        self._epoch = time.monotonic()
+        self._scores: dict[Hashable, float] = {}
+        self._players: dict[Hashable, tuple[str, str, str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._scores)
+
+    def record(self, summoner_name: str, tag_line: str, region: str):
+        """
+        Counts one badge request for a player.
+        """
+        exponent = (time.monotonic() - self._epoch) / self.tau
+        if exponent > MAX_EXPONENT:
+            self._rebase(exponent)
+            exponent = 0.0
+
+        key = (region.upper(), normalize_riot_id(summoner_name, tag_line))
+        self._scores[key] = self._scores.get(key, 0.0) + math.exp(exponent)
+        self._players[key] = (summoner_name, tag_line, region)
+
+        if len(self._scores) > self.max_keys:
+            self._prune()
+
+    def score(self, summoner_name: str, tag_line: str, region: str) -> float:
+        """
+        :return: The decayed number of requests for a player, as of now.
+        """
+        key = (region.upper(), normalize_riot_id(summoner_name, tag_line))
+        exponent = (time.monotonic() - self._epoch) / self.tau
+        return self._scores.get(key, 0.0) / math.exp(exponent)
+
+    def top(self, k: int) -> list[tuple[str, str, str]]:
+        """
+        :return: The (summoner name, tag line, region) of the `k` most popular players, most popular first.
+        """
+        keys = heapq.nlargest(k, self._scores, key=self._scores.__getitem__)
+        return [self._players[key] for key in keys]
+
+    def _rebase(self, exponent: float):
+        scale = math.exp(-exponent)
+        self._scores = {key: score * scale for key, score in self._scores.items()}
+        self._epoch = time.monotonic()
+
+    def _prune(self):
+        # Drop a quarter at once, so pruning stays rare
+        keep = set(
+            heapq.nlargest(
+                self.max_keys * 3 // 4, self._scores, key=self._scores.__getitem__
+            )
+        )
+        self._scores = {
+            key: score for key, score in self._scores.items() if key in keep
+        }
+        self._players = {
+            key: player for key, player in self._players.items() if key in keep
+        }
+
+    def clear(self):
+        self._scores.clear()
+        self._players.clear()
+
+
+class RankRefresher:
+    """
+    Background task refreshing the rank of the most popular players before their cache entry goes stale,
+    so that popular badges never wait on Riot. Each cycle may spend at most `budget_share` of the app rate
+    limit of each platform, and the circuit of a failing platform is left alone.
+    """
+
+    def __init__(
+        self,
+        tracker: PopularityTracker,
+        interval: float,
+        top_k: int,
+        budget_share: float,
+        refresh_ahead: float,
+        concurrency: int = 4,
+    ):
+        """
+        :param tracker: The popularity of each player.
+        :param interval: Seconds between refresh cycles.
+        :param top_k: Number of most popular players kept warm.
+        :param budget_share: Share of each platform's sustained Riot rate limit the refresher may use.
+        :param refresh_ahead: Share of the cache TTL after which an entry is refreshed, e.g. 0.8.
+        :param concurrency: Refreshes in flight at once.
+        """
+        self.tracker = tracker
+        self.interval = interval
+        self.top_k = top_k
+        self.budget_share = budget_share
+        self.refresh_ahead = refresh_ahead
+        self.concurrency = concurrency
+
+        self._task: asyncio.Task | None = None
+
+        self.cycles = 0
+        self.refreshed = 0
+        self.failed = 0
+        self.over_budget = 0
+
+    def _budget(self, host: str) -> int:
+        return int(
+            self.budget_share * rate_limiter.sustained_rate(host) * self.interval
+        )
+
+    async def due(
+        self, top: list[tuple[str, str, str]]
+    ) -> list[tuple[str, str, str, str, int]]:
+        """
+        Picks the players to refresh this cycle, within the budget of each host they cost calls on.
+        :param top: The most popular players, most popular first.
+        :return: The (summoner name, tag line, region, platform host, Riot calls) of each player due a refresh.
+        """
+        store = get_puuid_store()
+        budgets: dict[str, int] = {}
+        due = []
+        for summoner_name, tag_line, region in top:
+            try:
+                host = calculate_region(region, False)
+            except InvalidRegionException:
+                continue
+            if circuit_breakers.get(host).state != CLOSED:
+                continue
+
+            puuid = await store.apeek(summoner_name, tag_line)
+            if puuid is not None:
+                entry = await rank_cache.aget((host, puuid))
+                if (
+                    entry is not None
+                    and entry[1] < self.refresh_ahead * constants.CACHE_TTL
+                ):
+                    continue  # Still fresh for a while
+
+            # Routing host -> calls charged to it. Resolving an unknown PUUID costs an account-v1 call on top of
+            # the league-v4 one, which goes to the regional host & counts against its own rate limits
+            charges = {host: 1}
+            if puuid is None:
+                account_host = calculate_region(region, True)
+                charges[account_host] = charges.get(account_host, 0) + 1
+
+            for charged in charges:
+                budgets.setdefault(charged, self._budget(charged))
+            if any(budgets[charged] < calls for charged, calls in charges.items()):
+                self.over_budget += 1
+                REFRESHES.labels("over_budget").inc()
+                continue
+            for charged, calls in charges.items():
+                budgets[charged] -= calls
+            due.append((summoner_name, tag_line, region, host, sum(charges.values())))
+        return due
+
+    async def refresh_once(self, clients: RiotClientPool | None = None):
+        """
+        Runs one refresh cycle.
+        :param clients: The pooled Riot API clients to use. Defaults to the app-wide pool.
+        """
+        self.cycles += 1
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def refresh(summoner_name: str, tag_line: str, region: str):
+            async with semaphore:
+                rank_data = await get_summoner_rank(
+                    summoner_name, tag_line, region, clients, refresh=True
+                )
+            if rank_data.get("rank") == "error":
+                self.failed += 1
+                REFRESHES.labels("failed").inc()
+            else:
+                self.refreshed += 1
+                REFRESHES.labels("refreshed").inc()
+
+        due = await self.due(self.tracker.top(self.top_k))
+        await asyncio.gather(*(refresh(*player[:3]) for player in due))
+        if due:
+            logger.info(f"Refreshed the rank of {len(due)} popular players")
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.refresh_once()
+            except Exception as e:
+                logger.error(f"Rank refresh failed: {e}", exc_info=True)
+
+    def start(self):
+        if self.top_k and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "tracked": len(self.tracker),
+            "cycles": self.cycles,
+            "refreshed": self.refreshed,
+            "failed": self.failed,
+            "over_budget": self.over_budget,
+        }
+
+
+popularity = PopularityTracker(
+    half_life=settings.POPULARITY_HALF_LIFE,
+    max_keys=settings.POPULARITY_MAX_KEYS,
+)
+
+refresher = RankRefresher(
+    popularity,
+    interval=settings.REFRESH_INTERVAL,
+    top_k=settings.REFRESH_TOP_K,
+    budget_share=settings.REFRESH_BUDGET_SHARE,
+    refresh_ahead=settings.REFRESH_AHEAD,
+)
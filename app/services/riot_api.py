@@ -1,18 +1,162 @@
 # Created by Ryan Polasky, 12/3/24
 # All rights reserved
 
-from typing import Any
+from typing import Any, Awaitable, Callable, Hashable, Literal
+import asyncio
 import httpx
 import logging
+import time
 from app.config import settings, constants, InvalidRegionException
+from app.services.circuit_breaker import CircuitOpen, circuit_breakers
+from app.services.rate_limit import RateLimitExceeded, rate_limiter
+from app.services.riot_client import RiotClientPool, get_client_pool
+from app.utils.cache import AsyncTTLCache, NegativeCache, get_cache_backend
+from app.utils.metrics import RIOT_RESPONSES, host_label, timed
+from app.utils.puuid_store import get_puuid_store, normalize_riot_id
 
 RIOT_ENDPOINTS = constants.RIOT_ENDPOINTS
 
+# League-v4 queue types, by the name used in the `queue` option
+QUEUE_TYPES = {"solo": "RANKED_SOLO_5x5", "flex": "RANKED_FLEX_SR"}
+QueueName = Literal["solo", "flex", "best"]
+
+TIERS = [
+    "IRON",
+    "BRONZE",
+    "SILVER",
+    "GOLD",
+    "PLATINUM",
+    "EMERALD",
+    "DIAMOND",
+    "MASTER",
+    "GRANDMASTER",
+    "CHALLENGER",
+]
+DIVISIONS = ["IV", "III", "II", "I"]
+
+UNRANKED = {"rank": "unranked", "div": "n/a", "lp": 0, "wins": 0, "losses": 0}
+
 logger = logging.getLogger(__name__)
 
+class SingleFlight:
+    """
+    Registry of in-flight upstream lookups. Concurrent callers asking for the same key await one
+    shared task, which is shielded so that a client disconnecting doesn't cancel it for the others.
+    """
+
+    def __init__(self):
+        self._inflight: dict[Hashable, asyncio.Task] = {}
+        self.leaders = 0  # Lookups that actually went upstream
+        self.coalesced = 0  # Lookups that piggybacked on an in-flight one
+
+    def __len__(self) -> int:
+        return len(self._inflight)
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._inflight.get(key)
+        if task is None:
+            self.leaders += 1
+            task = asyncio.create_task(func())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._forget(key, t))
+        else:
+            self.coalesced += 1
+
+        return await asyncio.shield(task)
+
+    def _forget(self, key: Hashable, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+
+    def stats(self) -> dict:
+        return {"leaders": self.leaders, "coalesced": self.coalesced, "in_flight": len(self._inflight)}
+
+
+# Concurrent `get_summoner_rank` calls for the same player share one upstream lookup
+rank_flights = SingleFlight()
+
+# League-v4 entries keyed by (platform base URL, PUUID), served stale while refreshing in the background
+rank_cache = AsyncTTLCache(
+    ttl=constants.CACHE_TTL,
+    max_stale=settings.RANK_CACHE_MAX_STALE,
+    max_entries=settings.RANK_CACHE_MAX_ENTRIES,
+    name="rank",
+    backend=get_cache_backend(),
+)
+
+# Riot IDs account-v1 returned 404 for, keyed like `rank_flights`, and invalid regions, keyed by region alone
+negative_cache = NegativeCache(
+    ttl=settings.NEGATIVE_CACHE_TTL,
+    max_entries=settings.NEGATIVE_CACHE_MAX_ENTRIES,
+    name="negative",
+    backend=get_cache_backend(),
+)
+
+
+async def known_failure(summoner_name: str, tag_line: str, region: str, count: bool = True) -> str | None:
+    """
+    Checks the negative cache before any upstream work.
+    :param summoner_name: The first portion of your name. Example: 'Eggo'
+    :param tag_line: The second portion of your name. Example: 'WFLE'
+    :param region: The region of your account. Example: 'NA1'
+    :param count: Whether a hit counts as saved upstream calls, i.e. whether the caller skips the lookup.
+    :return: The reason the lookup is known to fail, or None if it's worth trying.
+    """
+    lookup = negative_cache.aget if count else negative_cache.apeek
+    region = region.upper()
+    return await lookup((region,)) or await lookup((region, normalize_riot_id(summoner_name, tag_line)))
+
+
+async def known_puuid_failure(puuid: str, region: str) -> str | None:
+    """
+    Like `known_failure`, for the by-PUUID route.
+    :param puuid: The PUUID of the player.
+    :param region: The platform of the account. Example: 'NA1'
+    :return: The reason the lookup is known to fail, or None if it's worth trying.
+    """
+    region = region.upper()
+    return await negative_cache.aget((region,)) or await negative_cache.aget(("by-puuid", region, puuid))
+
+
+async def riot_get(clients: RiotClientPool, base_url: str, method: str, url: str) -> httpx.Response:
+    """
+    Sends a GET request to the Riot API within the rate limit budget of its routing host.
+    A 429 is retried once, after its `Retry-After`, if that fits within the rate limiter's deadline. A second 429
+    raises `RateLimitExceeded`, so that callers fall back like they do when the budget is exhausted.
+    :param clients: The pooled Riot API clients to use.
+    :param base_url: The routing host base URL, as returned by `calculate_region`.
+    :param method: The Riot API method, used for method rate limits. Example: 'league-v4.entries.by-puuid'
+    :param url: The full URL to request.
+    :return: The response. Raises `RateLimitExceeded` if the budget won't free up in time, and `CircuitOpen`
+             if the host is failing, without waiting on it.
+    """
+    client = clients.get(base_url)
+    breaker = circuit_breakers.get(base_url)
+    for _ in range(2):
+        breaker.before_call()
+        try:
+            await rate_limiter.acquire(base_url, method)
+            started = time.monotonic()
+            with timed("riot"):
+                response = await client.get(url)
+        except httpx.RequestError:
+            breaker.record(True, time.monotonic() - started)
+            RIOT_RESPONSES.labels(host_label(base_url), method, "error").inc()
+            raise
+        except BaseException:
+            breaker.release()
+            raise
+
+        breaker.record(response.status_code >= 500, time.monotonic() - started)
+        RIOT_RESPONSES.labels(host_label(base_url), method, str(response.status_code)).inc()
+        rate_limiter.update(base_url, method, response)
+        if response.status_code != 429:
+            return response
+    raise RateLimitExceeded(f"{method} on {base_url}", rate_limiter.retry_after(response))
+
 
 async def get_summoner_puuid(
-        summoner_name: str, tag_line: str, region: str
+        summoner_name: str, tag_line: str, region: str, clients: RiotClientPool | None = None
 ) -> str | None:
     """
     Function used to request the PUUID for a player using their Summoner Name, their tag, and their region.
@@ -20,6 +164,7 @@ async def get_summoner_puuid(
     :param summoner_name: The first portion of your name. Example: 'Eggo'
     :param tag_line: The second portion of your name. Example: 'WFLE'
     :param region: The region of your account. Example: 'NA1'
+    :param clients: The pooled Riot API clients to use. Defaults to the app-wide pool.
     :return: Returns the PUUID of the player.
     """
     logger.info(f"Attempting to retrieve PUUID for {summoner_name}#{tag_line} in region {region}...")
@@ -28,140 +173,402 @@ async def get_summoner_puuid(
         curr_region_base_url = calculate_region(region, True)
     except InvalidRegionException:
         logger.error(f"Invalid region provided for PUUID lookup: {region}")
+        # Rejected locally, so remembering it saves the lookup but no upstream calls
+        await negative_cache.aadd((region.upper(),), "Invalid region.", upstream_calls=0)
         return None
 
     url = (
         f"{curr_region_base_url}/riot/account/v1/accounts/by-riot-id/{summoner_name}/{tag_line}"
     )
     logger.info(f"Riot API PUUID URL: {url}")
-    headers = {"X-Riot-Token": settings.RIOT_API_KEY}
+    clients = clients or get_client_pool()
 
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.get(url, headers=headers)
-            response.raise_for_status()
-
-            puuid = response.json().get("puuid")
-            if puuid:
-                logger.info(f"PUUID found for {summoner_name}#{tag_line}: {puuid}")
-                return puuid
-            else:
-                logger.warning(f"PUUID not found in response for {summoner_name}#{tag_line}. Response: {response.text}")
-                return None
-        except httpx.HTTPStatusError as e:
-            logger.error(
-                f"HTTP error retrieving PUUID for {summoner_name}#{tag_line}: {e.response.status_code} - {e.response.text}")
-            return None
-        except httpx.RequestError as e:
-            logger.error(f"Network error retrieving PUUID for {summoner_name}#{tag_line}: {e}")
-            return None
-        except Exception as e:
-            logger.error(f"An unexpected error occurred while getting PUUID for {summoner_name}#{tag_line}: {e}")
+    try:
+        response = await riot_get(clients, curr_region_base_url, "account-v1.by-riot-id", url)
+        response.raise_for_status()
+
+        puuid = response.json().get("puuid")
+        if puuid:
+            logger.info(f"PUUID found for {summoner_name}#{tag_line}: {puuid}")
+            return puuid
+        else:
+            logger.warning(f"PUUID not found in response for {summoner_name}#{tag_line}. Response: {response.text}")
             return None
+    except httpx.HTTPStatusError as e:
+        logger.error(
+            f"HTTP error retrieving PUUID for {summoner_name}#{tag_line}: {e.response.status_code} - {e.response.text}")
+        if e.response.status_code == 404:
+            await negative_cache.aadd((region.upper(), normalize_riot_id(summoner_name, tag_line)), "Riot ID not found.")
+        return None
+    except httpx.RequestError as e:
+        logger.error(f"Network error retrieving PUUID for {summoner_name}#{tag_line}: {e}")
+        return None
+    except (RateLimitExceeded, CircuitOpen):
+        raise
+    except Exception as e:
+        logger.error(f"An unexpected error occurred while getting PUUID for {summoner_name}#{tag_line}: {e}")
+        return None
+
+
+async def resolve_puuid(
+        summoner_name: str,
+        tag_line: str,
+        region: str,
+        clients: RiotClientPool | None = None,
+        revalidate: bool = False,
+) -> tuple[str | None, bool]:
+    """
+    Resolves the PUUID for a player through the persistent PUUID store, only calling account-v1 when
+    the Riot ID is unknown, expired, or being re-validated.
+    :param summoner_name: The first portion of your name. Example: 'Eggo'
+    :param tag_line: The second portion of your name. Example: 'WFLE'
+    :param region: The region of your account. Example: 'NA1'
+    :param clients: The pooled Riot API clients to use. Defaults to the app-wide pool.
+    :param revalidate: Whether to skip the store & re-resolve the PUUID from account-v1.
+    :return: Returns the PUUID of the player (or None), and whether it came from the store.
+    """
+    store = get_puuid_store()
+    if not revalidate:
+        puuid = await store.aget(summoner_name, tag_line)
+        if puuid:
+            logger.info(f"PUUID for {summoner_name}#{tag_line} found in store")
+            return puuid, True
+
+    puuid = await get_summoner_puuid(summoner_name, tag_line, region, clients)
+    if puuid:
+        await store.aset(summoner_name, tag_line, puuid)
+    elif revalidate:
+        await store.ainvalidate(summoner_name, tag_line)
+    return puuid, False
+
+
+async def get_cached_league_entries(
+        platform_base_url: str, puuid: str, clients: RiotClientPool, refresh: bool = False
+) -> list[dict]:
+    """
+    Returns the league-v4 entries for a PUUID through `rank_cache`, so that most badges never wait on Riot.
+    :param platform_base_url: The platform routing URL, as returned by `calculate_region(region, False)`.
+    :param puuid: The PUUID of the player.
+    :param clients: The pooled Riot API clients to use.
+    :param refresh: Whether to fetch fresh entries even if the cached ones are still fresh.
+    :return: Returns the list of league entries. Raises `httpx.HTTPError` if nothing is cached & Riot fails.
+    """
+    key = (platform_base_url, puuid)
+    fetch = lambda: get_league_entries(platform_base_url, puuid, clients)
+    if refresh:
+        return await rank_cache.refresh(key, fetch)
+    return await rank_cache.get_or_fetch(key, fetch)
+
+
+async def get_league_entries(
+        platform_base_url: str, puuid: str, clients: RiotClientPool
+) -> list[dict]:
+    """
+    Requests every league-v4 entry (one per ranked queue) for a PUUID, bypassing the cache.
+    :param platform_base_url: The platform routing URL, as returned by `calculate_region(region, False)`.
+    :param puuid: The PUUID of the player.
+    :param clients: The pooled Riot API clients to use.
+    :return: Returns the list of league entries. Raises `httpx.HTTPError` on failure.
+    """
+    url = f"{platform_base_url}/lol/league/v4/entries/by-puuid/{puuid}"
+    logger.info(f"Riot API League Entry URL: {url}")
+
+    logger.info("Requesting rank data from League-v4 endpoint...")
+    response = await riot_get(clients, platform_base_url, "league-v4.entries.by-puuid", url)
+    response.raise_for_status()
+
+    logger.info("Rank data retrieved successfully from League-v4 endpoint.")
+    return response.json()
 
 
 async def get_summoner_rank(
-        summoner_name: str, tag_line: str, region: str
+        summoner_name: str,
+        tag_line: str,
+        region: str,
+        clients: RiotClientPool | None = None,
+        refresh: bool = False,
 ) -> Any | None:
     """
     Function used to request the rank data for a player using their Summoner Name, their tag, and their region.
+    Concurrent requests for the same player are coalesced into a single lookup.
     Example: Eggo#WFLE
     :param summoner_name: The first portion of your name. Example: 'Eggo'
     :param tag_line: The second portion of your name. Example: 'WFLE'
     :param region: The region of your account. Example: 'NA1'
+    :param clients: The pooled Riot API clients to use. Defaults to the app-wide pool.
+    :param refresh: Whether to re-fetch the rank even if it's cached & fresh, used by the background refresher.
     :return: Returns the rank data of the player.
     """
+    key = (region.upper(), normalize_riot_id(summoner_name, tag_line))
+    if refresh:  # Badge requests keep being served from the cache rather than waiting on a refresh
+        key = ("refresh", *key)
+    rank_data = await rank_flights.do(
+        key, lambda: _lookup_summoner_rank(summoner_name, tag_line, region, clients, refresh)
+    )
+    # Every coalesced caller gets its own copy of the shared result, with the name as they typed it
+    return {**rank_data, "summoner_name": summoner_name, "tag_line": tag_line}
+
+
+async def _lookup_summoner_rank(
+        summoner_name: str,
+        tag_line: str,
+        region: str,
+        clients: RiotClientPool | None = None,
+        refresh: bool = False,
+) -> dict:
     logger.info(f"Initiating rank data retrieval for {summoner_name}#{tag_line} in region {region}...")
 
-    # First, get the summoner PUUID
-    summoner_puuid = await get_summoner_puuid(summoner_name, tag_line, region)
+    # First, get the summoner PUUID (usually from the PUUID store)
+    clients = clients or get_client_pool()
+    try:
+        with timed("puuid"):
+            summoner_puuid, from_store = await resolve_puuid(summoner_name, tag_line, region, clients)
+    except RateLimitExceeded as e:
+        logger.warning(f"Rate limited while resolving PUUID for {summoner_name}#{tag_line}: {e}")
+        return rate_limited_rank_data(summoner_name, tag_line, e)
+    except CircuitOpen as e:
+        logger.warning(f"Skipped resolving PUUID for {summoner_name}#{tag_line}: {e}")
+        return circuit_open_rank_data(summoner_name, tag_line, e)
     if not summoner_puuid:
         logger.warning(f"Failed to get PUUID for {summoner_name}#{tag_line}. Cannot proceed with rank lookup.")
-        return {
-            "rank": "error",
-            "div": "n/a",
-            "summoner_name": summoner_name,
-            "tag_line": tag_line,
-            "error_message": "PUUID not found or invalid."
-        }
+        reason = await known_failure(summoner_name, tag_line, region, count=False)
+        if reason:
+            return invalid_rank_data(summoner_name, tag_line, reason)
+        return error_rank_data(summoner_name, tag_line, "PUUID not found or invalid.")
 
     # Next, get the actual rank of the user using their PUUID
     try:
         curr_region_base_url = calculate_region(region, False)
     except InvalidRegionException:
         logger.error(f"Invalid region provided for rank lookup: {region}")
-        return {
-            "rank": "error",
-            "div": "n/a",
-            "summoner_name": summoner_name,
-            "tag_line": tag_line,
-            "error_message": "Invalid region for rank lookup."
-        }
-
-    url = f"{curr_region_base_url}/lol/league/v4/entries/by-puuid/{summoner_puuid}"
-    logger.info(f"Riot API League Entry URL: {url}")
-    headers = {"X-Riot-Token": settings.RIOT_API_KEY}
+        return error_rank_data(summoner_name, tag_line, "Invalid region for rank lookup.")
 
-    async with httpx.AsyncClient() as client:
+    try:
         try:
-            logger.info("Requesting rank data from League-v4 endpoint...")
-            response = await client.get(url, headers=headers)
-            response.raise_for_status()
-
-            logger.info("Rank data retrieved successfully from League-v4 endpoint.")
-            data = response.json()
-
-            relevant_details = {
-                "rank": "unranked",
-                "div": "n/a",
-                "summoner_name": summoner_name,
-                "tag_line": tag_line,
-            }
-
-            # Locate the proper queue type (Solo/Duo)
-            for rank_info in data:
-                if rank_info.get("queueType") == "RANKED_SOLO_5x5":
-                    logger.info("Solo/Duo rank found.")
-                    relevant_details["rank"] = rank_info["tier"]
-                    relevant_details["div"] = rank_info["rank"]
-                    logger.info(
-                        f"Player {summoner_name}#{tag_line} is rank {relevant_details['rank']}, division {relevant_details['div']}"
-                    )
-                    break
-
-            if relevant_details["rank"] == "unranked":
-                logger.info(f"Player {summoner_name}#{tag_line} is unranked in Solo/Duo.")
-
-            return relevant_details
-
+            with timed("league"):
+                data = await get_cached_league_entries(curr_region_base_url, summoner_puuid, clients, refresh)
         except httpx.HTTPStatusError as e:
-            logger.error(
-                f"HTTP error retrieving rank data for {summoner_name}#{tag_line}: {e.response.status_code} - {e.response.text}")
-            return {
-                "rank": "error",
-                "div": "n/a",
-                "summoner_name": summoner_name,
-                "tag_line": tag_line,
-                "error_message": f"Riot API HTTP Error: {e.response.status_code}"
-            }
-        except httpx.RequestError as e:
-            logger.error(f"Network error retrieving rank data for {summoner_name}#{tag_line}: {e}")
-            return {
-                "rank": "error",
-                "div": "n/a",
-                "summoner_name": summoner_name,
-                "tag_line": tag_line,
-                "error_message": f"Network Error: {e}"
-            }
-        except Exception as e:
-            logger.error(f"An unexpected error occurred while getting rank data for {summoner_name}#{tag_line}: {e}")
-            return {
-                "rank": "error",
-                "div": "n/a",
-                "summoner_name": summoner_name,
-                "tag_line": tag_line,
-                "error_message": f"Unexpected Error: {e}"
-            }
+            # A stored PUUID that league-v4 rejects gets re-validated against account-v1 once
+            if not from_store or e.response.status_code not in (400, 404):
+                raise
+            logger.warning(f"Stored PUUID for {summoner_name}#{tag_line} rejected, re-validating...")
+            new_puuid, _ = await resolve_puuid(summoner_name, tag_line, region, clients, revalidate=True)
+            if not new_puuid or new_puuid == summoner_puuid:
+                raise
+            data = await get_cached_league_entries(curr_region_base_url, new_puuid, clients, refresh)
+
+        return build_rank_data(data, summoner_name, tag_line)
+
+    except httpx.HTTPStatusError as e:
+        logger.error(
+            f"HTTP error retrieving rank data for {summoner_name}#{tag_line}: {e.response.status_code} - {e.response.text}")
+        return error_rank_data(summoner_name, tag_line, f"Riot API HTTP Error: {e.response.status_code}")
+    except RateLimitExceeded as e:
+        logger.warning(f"Rate limited while retrieving rank data for {summoner_name}#{tag_line}: {e}")
+        return rate_limited_rank_data(summoner_name, tag_line, e)
+    except CircuitOpen as e:
+        logger.warning(f"Skipped retrieving rank data for {summoner_name}#{tag_line}: {e}")
+        return circuit_open_rank_data(summoner_name, tag_line, e)
+    except httpx.RequestError as e:
+        logger.error(f"Network error retrieving rank data for {summoner_name}#{tag_line}: {e}")
+        return error_rank_data(summoner_name, tag_line, f"Network Error: {e}")
+    except Exception as e:
+        logger.error(f"An unexpected error occurred while getting rank data for {summoner_name}#{tag_line}: {e}")
+        return error_rank_data(summoner_name, tag_line, f"Unexpected Error: {e}")
+
+
+async def get_riot_id(
+        puuid: str, region: str, clients: RiotClientPool | None = None
+) -> tuple[str, str] | None:
+    """
+    Finds the display name of a PUUID, from the PUUID store if it's been seen before, otherwise from account-v1.
+    :param puuid: The PUUID of the player.
+    :param region: The region of the account. Example: 'NA1'
+    :param clients: The pooled Riot API clients to use. Defaults to the app-wide pool.
+    :return: Returns the (summoner name, tag line) of the player, or None if it couldn't be found.
+    """
+    store = get_puuid_store()
+    riot_id = await store.aget_riot_id(puuid)
+    if riot_id:
+        return riot_id
+
+    try:
+        curr_region_base_url = calculate_region(region, True)
+        url = f"{curr_region_base_url}/riot/account/v1/accounts/by-puuid/{puuid}"
+        response = await riot_get(clients or get_client_pool(), curr_region_base_url, "account-v1.by-puuid", url)
+        response.raise_for_status()
+        account = response.json()
+    except (InvalidRegionException, RateLimitExceeded, CircuitOpen, httpx.HTTPError, ValueError) as e:
+        logger.error(f"Failed to retrieve the Riot ID of PUUID {puuid}: {e}")
+        return None
+
+    if not account.get("gameName") or not account.get("tagLine"):
+        return None
+
+    await store.aset(account["gameName"], account["tagLine"], puuid)
+    return account["gameName"], account["tagLine"]
+
+
+async def get_rank_by_puuid(
+        puuid: str, region: str, clients: RiotClientPool | None = None
+) -> dict:
+    """
+    Function used to request the rank data for a player directly by PUUID, skipping the Riot ID resolution.
+    The returned rank data has no summoner name or tag line, see `get_riot_id` for those. PUUIDs & platforms that
+    don't exist come back with the `invalid` key, & PUUIDs league-v4 rejected are remembered in `negative_cache`.
+    :param puuid: The PUUID of the player.
+    :param region: The platform of the account. Example: 'NA1'
+    :param clients: The pooled Riot API clients to use. Defaults to the app-wide pool.
+    :return: Returns the rank data of the player.
+    """
+    key = ("by-puuid", region.upper(), puuid)
+    rank_data = await rank_flights.do(key, lambda: _lookup_rank_by_puuid(puuid, region, clients))
+    return dict(rank_data)
+
+
+async def _lookup_rank_by_puuid(puuid: str, region: str, clients: RiotClientPool | None = None) -> dict:
+    try:
+        curr_region_base_url = calculate_region(region, False)
+    except InvalidRegionException:
+        logger.error(f"Invalid region provided for rank lookup: {region}")
+        return invalid_rank_data("", "", "Invalid region for rank lookup.")
+
+    try:
+        with timed("league"):
+            entries = await get_cached_league_entries(curr_region_base_url, puuid, clients or get_client_pool())
+        return build_rank_data(entries, "", "")
+    except RateLimitExceeded as e:
+        logger.warning(f"Rate limited while retrieving rank data for PUUID {puuid}: {e}")
+        return rate_limited_rank_data("", "", e)
+    except CircuitOpen as e:
+        logger.warning(f"Skipped retrieving rank data for PUUID {puuid}: {e}")
+        return circuit_open_rank_data("", "", e)
+    except httpx.HTTPStatusError as e:
+        logger.error(f"HTTP error retrieving rank data for PUUID {puuid}: {e.response.status_code}")
+        if e.response.status_code in (400, 404):
+            # A PUUID league-v4 rejects won't be accepted on the next request either
+            await negative_cache.aadd(("by-puuid", region.upper(), puuid), "PUUID not found.")
+            return invalid_rank_data("", "", "PUUID not found.")
+        return error_rank_data("", "", f"Riot API HTTP Error: {e.response.status_code}")
+    except httpx.RequestError as e:
+        logger.error(f"Network error retrieving rank data for PUUID {puuid}: {e}")
+        return error_rank_data("", "", f"Network Error: {e}")
+    except Exception as e:
+        logger.error(f"An unexpected error occurred while getting rank data for PUUID {puuid}: {e}")
+        return error_rank_data("", "", f"Unexpected Error: {e}")
+
+
+def build_rank_data(entries: list[dict], summoner_name: str, tag_line: str) -> dict:
+    """
+    Builds the rank data of a player from their league-v4 entries. The top level holds the Solo/Duo rank, and
+    `queues` holds every ranked queue of the player, so `select_queue` can switch queues without calling Riot.
+    :param entries: The league entries, as returned by `get_league_entries`.
+    :param summoner_name: The first portion of the player's name. Example: 'Eggo'
+    :param tag_line: The second portion of the player's name. Example: 'WFLE'
+    :return: Returns the rank data of the player. Example: {'rank': 'GOLD', 'div': 'II', 'lp': 75, 'wins': 10,
+    'losses': 8, 'queues': {'solo': {...}, 'flex': {...}}, 'summoner_name': 'Eggo', 'tag_line': 'WFLE'}
+    """
+    queues = {}
+    for rank_info in entries:
+        for queue, queue_type in QUEUE_TYPES.items():
+            if rank_info.get("queueType") == queue_type:
+                queues[queue] = {
+                    "rank": rank_info["tier"],
+                    "div": rank_info["rank"],
+                    "lp": rank_info.get("leaguePoints", 0),
+                    "wins": rank_info.get("wins", 0),
+                    "losses": rank_info.get("losses", 0),
+                }
+
+    relevant_details = {
+        **UNRANKED,
+        **queues.get("solo", {}),
+        "queues": queues,
+        "summoner_name": summoner_name,
+        "tag_line": tag_line,
+    }
+
+    if "solo" in queues:
+        logger.info(
+            f"Player {summoner_name}#{tag_line} is rank {relevant_details['rank']}, division {relevant_details['div']}"
+        )
+    else:
+        logger.info(f"Player {summoner_name}#{tag_line} is unranked in Solo/Duo.")
+
+    return relevant_details
+
+
+def queue_strength(queue_rank: dict) -> tuple[int, int, int]:
+    """
+    Orders queue ranks from lowest to highest, by tier, then division, then LP.
+    """
+    tier = queue_rank["rank"].upper()
+    div = queue_rank["div"].upper()
+    return (
+        TIERS.index(tier) if tier in TIERS else -1,
+        DIVISIONS.index(div) if div in DIVISIONS else -1,
+        queue_rank.get("lp", 0),
+    )
+
+
+def select_queue(rank_data: dict, queue: str) -> dict:
+    """
+    Picks the queue a badge shows, from rank data built by `build_rank_data`. Never calls Riot.
+    :param rank_data: The rank data of the player, holding every queue.
+    :param queue: 'solo', 'flex', or 'best' for the highest ranked of the two.
+    :return: A copy of the rank data, with the rank, division, LP & wins/losses of that queue. Error rank data
+    is returned as-is.
+    """
+    queues = rank_data.get("queues")
+    if queues is None:
+        return rank_data
+
+    if queue == "best":
+        queue = max(queues, key=lambda name: queue_strength(queues[name]), default="solo")
+    return {**rank_data, **UNRANKED, **queues.get(queue, {}), "queue": queue}
+
+
+def error_rank_data(summoner_name: str, tag_line: str, error_message: str) -> dict:
+    """
+    Builds the rank data of a failed lookup, which the router serves as an error badge.
+    """
+    return {
+        "rank": "error",
+        "div": "n/a",
+        "summoner_name": summoner_name,
+        "tag_line": tag_line,
+        "error_message": error_message,
+    }
+
+
+def invalid_rank_data(summoner_name: str, tag_line: str, error_message: str) -> dict:
+    """
+    Builds the error rank data returned for a Riot ID or region that doesn't exist.
+    The `invalid` key tells the router to serve the error badge, as for a malformed Riot ID.
+    """
+    return {**error_rank_data(summoner_name, tag_line, error_message), "invalid": True}
+
+
+def rate_limited_rank_data(summoner_name: str, tag_line: str, error: RateLimitExceeded) -> dict:
+    """
+    Builds the error rank data returned when the Riot rate limit budget is exhausted & nothing is cached.
+    The `retry_after` key tells the router to fail fast with a fallback badge.
+    """
+    return {
+        **error_rank_data(summoner_name, tag_line, "Riot API rate limit reached, try again shortly."),
+        "retry_after": error.retry_after,
+    }
+
+
+def circuit_open_rank_data(summoner_name: str, tag_line: str, error: CircuitOpen) -> dict:
+    """
+    Builds the error rank data returned when the player's Riot host is failing & nothing is cached.
+    Like `rate_limited_rank_data`, the `retry_after` key tells the router to fail fast with a fallback badge.
+    """
+    return {
+        **error_rank_data(summoner_name, tag_line, "Riot API is unavailable for this region, try again shortly."),
+        "retry_after": error.retry_after,
+    }
 
 
 def calculate_region(region: str, by_area: bool) -> str:
@@ -0,0 +1,88 @@
+import importlib.util
+import logging
+import httpx
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class RiotClientPool:
+    """
+    Holds one long-lived `httpx.AsyncClient` per Riot routing host (e.g. 'https://na1.api.riotgames.com'),
+    so that connections to each host are kept alive & reused across badge requests.
+    """
+
+    def __init__(
+        self,
+        limits: httpx.Limits | None = None,
+        timeout: httpx.Timeout | None = None,
+        http2: bool | None = None,
+        transport: httpx.AsyncBaseTransport | None = None,
+    ):
+        """
+        :param limits: Connection limits per host. Defaults to the `RIOT_*` settings.
+        :param timeout: Request timeouts. Defaults to the `RIOT_*` settings.
+        :param http2: Whether to negotiate HTTP/2, which needs the optional `h2` package.
+        :param transport: Transport shared by every client, used by tests to mock the Riot API.
+        """
+        self.limits = limits or httpx.Limits(
+            max_connections=settings.RIOT_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.RIOT_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.RIOT_KEEPALIVE_EXPIRY,
+        )
+        self.timeout = timeout or httpx.Timeout(
+            settings.RIOT_READ_TIMEOUT, connect=settings.RIOT_CONNECT_TIMEOUT
+        )
+
+        http2 = settings.RIOT_HTTP2 if http2 is None else http2
+        if http2 and importlib.util.find_spec("h2") is None:
+            logger.warning(
+                "HTTP/2 requested but the `h2` package isn't installed, using HTTP/1.1"
+            )
+            http2 = False
+        self.http2 = http2
+
+        self.transport = transport
+        self._clients: dict[str, httpx.AsyncClient] = {}
+
+    def get(self, base_url: str) -> httpx.AsyncClient:
+        """
+        Returns the client for a routing host, creating it on first use.
+        :param base_url: The base URL of the host, as returned by `riot_api.calculate_region`.
+        :return: The shared client for that host.
+        """
+        client = self._clients.get(base_url)
+        if client is None:
+            client = httpx.AsyncClient(
+                base_url=base_url,
+                headers={"X-Riot-Token": settings.RIOT_API_KEY or ""},
+                limits=self.limits,
+                timeout=self.timeout,
+                http2=self.http2,
+                transport=self.transport,
+            )
+            self._clients[base_url] = client
+        return client
+
+    async def aclose(self):
+        for client in self._clients.values():
+            await client.aclose()
+        self._clients.clear()
+
+
+_client_pool: RiotClientPool | None = None
+
+
+def get_client_pool() -> RiotClientPool:
+    """
+    Returns the app-wide client pool. Used as a FastAPI dependency, so tests can override it.
+    """
+    global _client_pool
+    if _client_pool is None:
+        _client_pool = RiotClientPool()
+    return _client_pool
+
+
+def set_client_pool(pool: RiotClientPool | None):
+    global _client_pool
+    _client_pool = pool
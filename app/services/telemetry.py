@@ -0,0 +1,178 @@
+import asyncio
+import logging
+from collections import Counter
+import httpx
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+DISCORD_MAX_CONTENT = 2000  # Discord rejects messages longer than this
+
+
+class TelemetryPipeline:
+    """
+    Collects badge calls in a bounded in-memory queue & posts one aggregated summary to the Discord
+    webhook per flush interval, from a background task. Recording never waits on Discord: if the
+    queue is full, the call is dropped (and counted) instead.
+    """
+
+    def __init__(
+        self,
+        webhook_url: str | None,
+        flush_interval: float,
+        queue_size: int,
+        top_players: int = 5,
+        max_retries: int = 3,
+        base_delay: float = 1.0,
+        transport: httpx.AsyncBaseTransport | None = None,
+    ):
+        """
+        :param webhook_url: The Discord webhook to post to. Telemetry is disabled when unset.
+        :param flush_interval: Seconds between summary messages.
+        :param queue_size: Maximum number of calls buffered between flushes.
+        :param top_players: Number of most requested players listed per summary.
+        :param max_retries: Attempts per summary before it's dropped.
+        :param base_delay: Base delay in seconds for exponential backoff between attempts.
+        :param transport: Transport for the webhook client, used by tests to mock Discord.
+        """
+        self.webhook_url = webhook_url
+        self.flush_interval = flush_interval
+        self.top_players = top_players
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.transport = transport
+
+        self._queue: asyncio.Queue[tuple[str, str]] = asyncio.Queue(maxsize=queue_size)
+        self._task: asyncio.Task | None = None
+        self._client: httpx.AsyncClient | None = None
+
+        self.total_calls = 0
+        self.dropped = 0
+        self.flushes = 0
+        self.failed_posts = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.webhook_url)
+
+    def record(self, region: str, player: str):
+        """
+        Records one badge call, without blocking.
+        :param region: The region the badge was requested for. Example: 'NA1'
+        :param player: The Riot ID of the player. Example: 'Eggo#WFLE'
+        """
+        if not self.enabled:
+            return
+        try:
+            self._queue.put_nowait((region.upper(), player))
+        except asyncio.QueueFull:
+            self.dropped += 1
+
+    def _drain(self) -> list[tuple[str, str]]:
+        calls = []
+        while not self._queue.empty():
+            calls.append(self._queue.get_nowait())
+        return calls
+
+    def summarize(self, calls: list[tuple[str, str]]) -> str:
+        self.total_calls += len(calls)
+        regions = Counter(region for region, _ in calls)
+        players = Counter(player for _, player in calls)
+
+        lines = [
+            f"**{len(calls)} badge calls** in the last {self.flush_interval:g}s (total {self.total_calls})",
+            "By region: " + ", ".join(f"{r} {n}" for r, n in regions.most_common()),
+            "Top players: "
+            + ", ".join(f"{p} ({n})" for p, n in players.most_common(self.top_players)),
+        ]
+        if self.dropped:
+            lines.append(f"Dropped (queue full): {self.dropped}")
+        return "\n".join(lines)[:DISCORD_MAX_CONTENT]
+
+    async def flush(self):
+        calls = self._drain()
+        if not calls:
+            return
+        self.flushes += 1
+        await self.post(self.summarize(calls))
+
+    async def post(self, content: str) -> bool:
+        """
+        Posts a message to the Discord webhook, retrying with exponential backoff (or Discord's
+        `retry_after` when rate limited).
+        :param content: Message content to send.
+        :return: Whether the message was delivered.
+        """
+        if not self.enabled:
+            logger.warning("Discord webhook URL not configured, skipping notification")
+            return False
+
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=10, transport=self.transport)
+
+        for attempt in range(self.max_retries):
+            delay = self.base_delay * (2**attempt)
+            try:
+                response = await self._client.post(
+                    self.webhook_url, json={"content": content}
+                )
+                if response.status_code in (200, 204):
+                    return True
+                if response.status_code == 429:
+                    try:
+                        delay = float(response.headers.get("retry-after", delay))
+                    except ValueError:
+                        pass
+                logger.warning(
+                    f"Discord webhook returned {response.status_code} (attempt {attempt + 1}/{self.max_retries})"
+                )
+            except httpx.HTTPError as e:
+                logger.error(
+                    f"Error sending Discord webhook (attempt {attempt + 1}/{self.max_retries}): {e}"
+                )
+
+            if attempt < self.max_retries - 1:
+                await asyncio.sleep(delay)
+
+        self.failed_posts += 1
+        logger.error(
+            f"Failed to send Discord webhook after {self.max_retries} attempts"
+        )
+        return False
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Telemetry flush failed: {e}")
+
+    def start(self):
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.flush()
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def stats(self) -> dict:
+        return {
+            "queued": self._queue.qsize(),
+            "dropped": self.dropped,
+            "flushes": self.flushes,
+            "failed_posts": self.failed_posts,
+        }
+
+
+telemetry = TelemetryPipeline(
+    webhook_url=settings.DISCORD_WEBHOOK,
+    flush_interval=settings.TELEMETRY_FLUSH_INTERVAL,
+    queue_size=settings.TELEMETRY_QUEUE_SIZE,
+)
@@ -0,0 +1,169 @@
+import json
+import logging
+import math
+import os
+from PIL import Image, ImageDraw, ImageFont
+from app.config import constants
+
+logger = logging.getLogger(__name__)
+
+FONTS_DIR = os.path.join(constants.ASSETS_DIR, "fonts")
+VERDANA_PATH = os.path.join(FONTS_DIR, "Verdana.ttf")
+NOTO_PATH = os.path.join(FONTS_DIR, "NotoSansCJK.otf")
+METRICS_PATH = os.path.join(FONTS_DIR, "Verdana.metrics.json")
+
+FONT_SIZE = 11  # Match SVG font-size, the size the metrics table is built at
+
+# Codepoints precomputed into the advance table (Basic Latin, Latin-1, Latin Extended-A/B)
+TABLE_RANGES = ((0x20, 0x7F), (0xA0, 0x250))
+# Codepoints probed for kerning pairs, Verdana has none outside of Latin
+KERNING_RANGES = ((0x20, 0x7F), (0xA0, 0x180))
+
+
+def _codepoints(ranges: tuple[tuple[int, int], ...]) -> list[str]:
+    return [chr(c) for start, end in ranges for c in range(start, end)]
+
+
+class TextWidthEngine:
+    """
+    Measures text the same way as Pillow's `ImageDraw.textbbox`, without calling Pillow per badge.
+    The pen position is the sum of each glyph's advance plus any kerning with the next glyph, and
+    the right edge of the text is the pen position plus the ink extent of the last glyph.
+    """
+
+    def __init__(
+        self,
+        font_path: str = VERDANA_PATH,
+        fallback_path: str = NOTO_PATH,
+        metrics_path: str = METRICS_PATH,
+        font_size: int = FONT_SIZE,
+    ):
+        try:
+            self.font = ImageFont.truetype(font_path, size=font_size)
+            self.letter_spacing = 1  # Matches the letter-spacing of the SVG text
+        except IOError:
+            # Use NotoSansCJK if Verdana fails, which doesn't get the extra letter spacing
+            self.font = ImageFont.truetype(fallback_path, size=font_size)
+            self.letter_spacing = 0
+            font_path, metrics_path = fallback_path, None
+
+        self.font_path = font_path
+        self.font_size = font_size
+        self._draw = ImageDraw.Draw(Image.new("RGB", (1, 1)))
+
+        self.advances: dict[str, float] = {}
+        self.extents: dict[str, int] = {}
+        # Kerning is keyed by the two character pair, e.g. 'T.'
+        self.kerning: dict[str, float] = {}
+
+        if font_size != FONT_SIZE:
+            # Only FONT_SIZE ships with a table, & Verdana's kerning is a fraction of a pixel, so
+            # other sizes measure their advances (a few ms) without probing the pairs
+            self._build_table(kerning=False)
+        elif not (metrics_path and self._load_table(metrics_path)):
+            self._build_table()
+
+    def _table_fingerprint(self) -> dict:
+        return {
+            "font": os.path.basename(self.font_path),
+            "font_bytes": os.path.getsize(self.font_path),
+            "size": self.font_size,
+        }
+
+    def _load_table(self, metrics_path: str) -> bool:
+        try:
+            with open(metrics_path, "r", encoding="utf-8") as f:
+                table = json.load(f)
+        except (OSError, ValueError):
+            logger.warning(f"Font metrics table {metrics_path} missing or unreadable")
+            return False
+
+        if table.get("fingerprint") != self._table_fingerprint():
+            logger.warning(f"Font metrics table {metrics_path} is stale, rebuilding")
+            return False
+
+        self.advances = table["advances"]
+        self.extents = table["extents"]
+        self.kerning = table["kerning"]
+        return True
+
+    def _build_table(self, kerning: bool = True):
+        for char in _codepoints(TABLE_RANGES):
+            self._learn(char)
+        if not kerning:
+            return
+
+        # Probing every pair is slow (~2s), which is why the table ships prebuilt
+        latin = _codepoints(KERNING_RANGES)
+        for left in latin:
+            for right in latin:
+                pair = left + right
+                kern = (
+                    self.font.getlength(pair)
+                    - self.advances[left]
+                    - self.advances[right]
+                )
+                if kern:
+                    self.kerning[pair] = kern
+
+    def _learn(self, char: str):
+        """Falls back to Pillow for a codepoint outside the table, remembering the result."""
+        self.advances[char] = self.font.getlength(char)
+        self.extents[char] = self._draw.textbbox((0, 0), char, font=self.font)[2]
+
+    def save_table(self, metrics_path: str = METRICS_PATH):
+        with open(metrics_path, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "fingerprint": self._table_fingerprint(),
+                    "advances": {
+                        c: self.advances[c] for c in _codepoints(TABLE_RANGES)
+                    },
+                    "extents": {c: self.extents[c] for c in _codepoints(TABLE_RANGES)},
+                    "kerning": self.kerning,
+                },
+                f,
+                sort_keys=True,
+            )
+
+    def text_width(self, text: str) -> int:
+        """
+        Returns the same width as `ImageDraw.textbbox((0, 0), text, font)[2]`.
+        :param text: The text to measure.
+        :return: The width of the text in pixels.
+        """
+        if not text:
+            return 0
+        if "\n" in text:  # Pillow lays out multiline text differently
+            return self._draw.textbbox((0, 0), text, font=self.font)[2]
+
+        for char in text:
+            if char not in self.advances:
+                self._learn(char)
+
+        pen = 0.0
+        for i in range(len(text) - 1):
+            pen += self.advances[text[i]] + self.kerning.get(text[i : i + 2], 0.0)
+
+        return math.ceil(pen + self.extents[text[-1]])
+
+
+_engines: dict[int, TextWidthEngine] = {}
+
+
+def get_width_engine(font_size: int = FONT_SIZE) -> TextWidthEngine:
+    """
+    Returns the shared width engine of a font size, loading the font & its metrics table on first use.
+    """
+    engine = _engines.get(font_size)
+    if engine is None:
+        engine = _engines[font_size] = TextWidthEngine(font_size=font_size)
+    return engine
+
+
+if __name__ == "__main__":
+    engine = TextWidthEngine(metrics_path=None)
+    engine.save_table()
+    print(
+        f"Wrote {len(engine.advances)} advances & {len(engine.kerning)} kerning pairs to {METRICS_PATH}"
+    )
@@ -0,0 +1,41 @@
+import httpx
+import pytest
+from app.main import app
+from app.services.circuit_breaker import circuit_breakers
+from app.services.rate_limit import rate_limiter
+from app.services.riot_api import negative_cache, rank_cache
+from app.services.riot_client import RiotClientPool, get_client_pool
+from app.tests.mock_riot import mock_riot_handler
+from app.utils.puuid_store import PuuidStore, set_puuid_store
+
+
+@pytest.fixture(autouse=True)
+def puuid_store():
+    """Gives every test a throwaway PUUID store instead of the on-disk one."""
+    store = PuuidStore(":memory:", ttl=3600)
+    set_puuid_store(store)
+    yield store
+    set_puuid_store(None)
+    store.close()
+
+
+@pytest.fixture(autouse=True)
+def clear_riot_state():
+    rank_cache.clear()
+    rate_limiter.clear()
+    negative_cache.clear()
+    circuit_breakers.clear()
+    yield
+    rank_cache.clear()
+    rate_limiter.clear()
+    negative_cache.clear()
+    circuit_breakers.clear()
+
+
+@pytest.fixture
+def mock_riot_clients():
+    """Points the app at the mock Riot API."""
+    riot_clients = RiotClientPool(transport=httpx.MockTransport(mock_riot_handler))
+    app.dependency_overrides[get_client_pool] = lambda: riot_clients
+    yield riot_clients
+    app.dependency_overrides.pop(get_client_pool)
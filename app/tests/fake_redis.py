@@ -0,0 +1,98 @@
+"""
+Local stand-in for Redis, speaking just enough of its protocol (RESP) for `RedisBackend`: PING, AUTH, SELECT,
+GET, SET (with NX/PX/EX), DEL & KEYS. It runs in a thread on a random local port.
+"""
+
+import fnmatch
+import socketserver
+import threading
+import time
+
+
+class FakeRedis:
+    def __init__(self):
+        # Key -> (value, expiry or None)
+        self.data: dict[bytes, tuple[bytes, float | None]] = {}
+        self.commands: list[str] = []
+        self._lock = threading.Lock()
+
+        fake = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                while True:
+                    args = fake._read_command(self.rfile)
+                    if args is None:
+                        return
+                    self.wfile.write(fake._execute(args))
+
+        self.server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"redis://127.0.0.1:{self.server.server_address[1]}/0"
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self) -> "FakeRedis":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+    @staticmethod
+    def _read_command(rfile) -> list[bytes] | None:
+        line = rfile.readline()
+        if not line.startswith(b"*"):
+            return None
+        args = []
+        for _ in range(int(line[1:])):
+            length = int(rfile.readline()[1:])
+            args.append(rfile.read(length + 2)[:-2])
+        return args
+
+    def _live(self, key: bytes) -> bytes | None:
+        entry = self.data.get(key)
+        if entry is None or (entry[1] is not None and entry[1] <= time.time()):
+            self.data.pop(key, None)
+            return None
+        return entry[0]
+
+    def _execute(self, args: list[bytes]) -> bytes:
+        command = args[0].upper().decode()
+        with self._lock:
+            self.commands.append(command)
+            if command in ("PING", "AUTH", "SELECT"):
+                return b"+OK\r\n" if command != "PING" else b"+PONG\r\n"
+            if command == "GET":
+                value = self._live(args[1])
+                return (
+                    b"$-1\r\n"
+                    if value is None
+                    else b"$%d\r\n%s\r\n" % (len(value), value)
+                )
+            if command == "SET":
+                options = [arg.upper() for arg in args[3:]]
+                if b"NX" in options and self._live(args[1]) is not None:
+                    return b"$-1\r\n"
+                expiry = None
+                if b"PX" in options:
+                    expiry = time.time() + int(options[options.index(b"PX") + 1]) / 1000
+                elif b"EX" in options:
+                    expiry = time.time() + int(options[options.index(b"EX") + 1])
+                self.data[args[1]] = (args[2], expiry)
+                return b"+OK\r\n"
+            if command == "DEL":
+                deleted = sum(self.data.pop(key, None) is not None for key in args[1:])
+                return b":%d\r\n" % deleted
+            if command == "KEYS":
+                pattern = args[1].decode()
+                keys = [
+                    key
+                    for key in list(self.data)
+                    if self._live(key) is not None
+                    and fnmatch.fnmatchcase(key.decode(), pattern)
+                ]
+                return b"*%d\r\n" % len(keys) + b"".join(
+                    b"$%d\r\n%s\r\n" % (len(key), key) for key in keys
+                )
+            return b"-ERR unknown command '%s'\r\n" % command.encode()
@@ -0,0 +1,27 @@
+"""
+Stand-in for the Riot API, serving account-v1 & league-v4 for a single mock summoner.
+"""
+
+import httpx
+
+# Mock data
+mock_summoner_data = {
+    "summoner_name": "Eggo",
+    "tag_line": "WFLE",
+    # I know this PUUID looks like a secret value that I messed up & put in plain code, but it's
+    # actually plainly accessible to anyone w/ a Riot API key, so it's nothing to worry about obscuring
+    "puuid": "m6VD_tt5-vRTs3zqXyjNbqddf8WuLUZp4rEpYvwj6fTf63L-_oOE2vLLl-imdVhrcNX1HPwgquIKUw",
+}
+
+
+def mock_riot_handler(request: httpx.Request) -> httpx.Response:
+    """Stand-in for the Riot API, serving account-v1 & league-v4 for the mock summoner."""
+    if request.url.path.startswith("/riot/account/v1/accounts/by-riot-id/"):
+        return httpx.Response(200, json={"puuid": mock_summoner_data["puuid"]})
+    if request.url.path.startswith("/riot/account/v1/accounts/by-puuid/"):
+        return httpx.Response(200, json={"gameName": "Eggo", "tagLine": "WFLE"})
+    if request.url.path.startswith("/lol/league/v4/entries/by-puuid/"):
+        return httpx.Response(
+            200, json=[{"queueType": "RANKED_SOLO_5x5", "tier": "GOLD", "rank": "II"}]
+        )
+    return httpx.Response(404)
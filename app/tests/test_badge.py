@@ -1,2 +1,173 @@
 # Created by Ryan Polasky, 12/3/24
 # All rights reserved
+
+import io
+from PIL import Image, ImageDraw, ImageFont
+from app.config import constants
+import xml.etree.ElementTree as ElementTree
+from app.services.badge_generator import (
+    badge_cache,
+    badge_etag,
+    badge_width,
+    calculate_width,
+    compose_badge_strip,
+    generate_badge,
+)
+from app.services.badge_styles import STYLES, BadgeTemplate
+from app.utils.cache import ByteLRUCache
+import os
+from unittest.mock import patch
+from app.services.text_width import VERDANA_PATH, get_width_engine
+from app.services.raster import get_icon_image, render_raster
+from app.services.icon_pipeline import (
+    ASSETS_DIR,
+    ICON_SIZE,
+    load_icon,
+    load_icon_registry,
+    optimize_icon,
+)
+
+mock_rank_data = {
+    "rank": "GOLD",
+    "div": "II",
+    "summoner_name": "Eggo",
+    "tag_line": "WFLE",
+}
+
+
+def test_optimized_icons_are_display_sized():
+    """Test that every tier ships a display-sized icon plus its HiDPI variant."""
+    for tier in constants.colors:
+        for scale in (1, 2):
+            with Image.open(io.BytesIO(load_icon(tier, scale))) as icon:
+                assert icon.size == (ICON_SIZE * scale, ICON_SIZE * scale)
+                assert icon.mode == "P"
+
+
+def test_optimize_icon_matches_shipped_icon():
+    """Test that the committed icons are up-to-date with the asset pipeline."""
+    assert optimize_icon(os.path.join(ASSETS_DIR, "gold.png")) == load_icon("gold", 1)
+
+
+def test_badge_payload_is_small():
+    """Test that the badge embeds the optimized icon, not the full source PNG."""
+    badge_svg = generate_badge(mock_rank_data, False)
+    assert b"Eggo#WFLE" in badge_svg
+    assert len(badge_svg) < 8 * 1024
+
+
+def test_icon_registry_avoids_file_io():
+    """Test that badges are rendered from the preloaded registry, without opening any file."""
+    registry = load_icon_registry()
+    assert set(registry) == set(constants.colors)
+
+    badge_cache.clear()
+    with patch("builtins.open", side_effect=AssertionError("file I/O during render")):
+        badge_svg = generate_badge(mock_rank_data, False)
+
+    assert registry["gold"].encode() in badge_svg
+
+    # Image badges decode their icons from the registry too, at every scale
+    get_icon_image.cache_clear()
+    with patch("builtins.open", side_effect=AssertionError("file I/O during render")):
+        for scale in (1, 2, 3):
+            png = render_raster("gold", "Eggo#WFLE", "flat", "png", scale)
+            assert Image.open(io.BytesIO(png)).height == 28 * scale
+
+
+def test_width_engine_matches_pillow():
+    """Test that the glyph-advance table measures text exactly like Pillow's textbbox."""
+    engine = get_width_engine()
+    font = ImageFont.truetype(VERDANA_PATH, size=11)
+    draw = ImageDraw.Draw(Image.new("RGB", (1, 1)))
+
+    samples = [
+        "Eggo#WFLE",
+        "Tea.T,",
+        "Wörld Ñame#EUW",
+        "페이커#KR1",
+        "日本語#JP1",
+        "A",
+        "",
+    ]
+    for text in samples:
+        assert engine.text_width(text) == draw.textbbox((0, 0), text, font=font)[2]
+
+
+def test_widths_are_measured_at_the_rendered_font_size():
+    """Test that a style's width follows the font size & letter spacing its text is rendered with."""
+    draw = ImageDraw.Draw(Image.new("RGB", (1, 1)))
+    for style in ("flat-square", "for-the-badge"):
+        badge_style = STYLES[style]
+        font = ImageFont.truetype(VERDANA_PATH, size=badge_style.font_size)
+        text = "EGGO#WFLE"
+
+        text_width = draw.textbbox((0, 0), text, font=font)[2]
+        spacing = len(text) * badge_style.letter_spacing
+        assert badge_width(text, badge_style) == text_width + spacing + 22 + 35, style
+
+
+def test_rank_name_badges_share_cache_entry():
+    """Test that two players of the same tier get the same cached badge & ETag with rank_name=true."""
+    badge_cache.clear()
+    other_player = {
+        **mock_rank_data,
+        "div": "I",
+        "summoner_name": "Shua",
+        "tag_line": "EGGGY",
+    }
+
+    with patch(
+        "app.services.badge_generator.calculate_width", wraps=calculate_width
+    ) as width:
+        first = generate_badge(mock_rank_data, True)
+        second = generate_badge(other_player, True)
+
+    assert first is second
+    assert width.call_count == 1
+    assert badge_cache.hits == 1
+    assert badge_etag(mock_rank_data, True) == badge_etag(other_player, True)
+
+
+def test_every_style_renders_well_formed_svg():
+    """Test that each style renders a distinct, well-formed SVG, escaping the Riot ID."""
+    player = {**mock_rank_data, "summoner_name": "Tom & Jerry"}
+    badges = {style: generate_badge(player, False, style) for style in STYLES}
+
+    for style, badge_svg in badges.items():
+        root = ElementTree.fromstring(badge_svg)
+        assert root.get("height") == "28"
+        assert "tom & jerry#wfle" in "".join(root.itertext()).lower(), style
+
+    assert len(set(badges.values())) == len(STYLES)
+    assert ElementTree.fromstring(badges["icon"]).get("width") == "38"
+    assert badge_etag(player, False, "flat") != badge_etag(player, False, "plastic")
+    ElementTree.fromstring(compose_badge_strip(list(badges.values())))
+
+
+def test_badge_template_is_precompiled():
+    """Test that templates are split once into static fragments & slots, and rendered by joining them."""
+    template = BadgeTemplate("""
+        <svg width="{width}">
+            <text>{text}</text>
+        </svg>
+        """)
+    assert template.slots == {"width", "text"}
+    assert (
+        template.render({"width": "42", "text": "Eggo"})
+        == b'<svg width="42"><text>Eggo</text></svg>'
+    )
+
+
+def test_byte_lru_cache_evicts_by_size():
+    """Test that the badge cache is bounded by bytes and evicts the least recently used badge."""
+    cache = ByteLRUCache(max_bytes=10)
+    cache.set("a", b"1234")
+    cache.set("b", b"1234")
+    cache.get("a")
+    cache.set("c", b"1234")
+
+    assert "b" not in cache
+    assert cache.get("a") == b"1234"
+    assert cache.current_bytes == 8
+    assert cache.stats()["evictions"] == 1
@@ -0,0 +1,374 @@
+"""
+Tests of the badge routes, from the request down to a mocked Riot API.
+"""
+
+import httpx
+import io
+import time
+from fastapi.testclient import TestClient
+from PIL import Image
+from unittest.mock import patch
+from app.config import settings
+from app.main import app
+from app.routers.badge import negotiate_encoding
+from app.services.badge_generator import ENCODINGS, compress
+from app.services.circuit_breaker import circuit_breakers
+from app.services.raster import raster_pool, render_raster
+from app.services.rate_limit import RateLimitExceeded, rate_limiter
+from app.services.riot_api import negative_cache, rank_cache, riot_get
+from app.services.riot_client import RiotClientPool, get_client_pool
+from app.tests.mock_riot import mock_riot_handler, mock_summoner_data
+
+client = TestClient(app)
+
+
+def test_badge_uses_pooled_clients(mock_riot_clients):
+    """Test that the badge route reaches Riot through the injected, long-lived client pool."""
+    for _ in range(2):
+        response = client.get("/badge/NA1/Eggo/WFLE?rank_name=true")
+        assert response.status_code == 200
+        assert "GOLD" in response.text
+
+    # One client per routing host, reused across requests
+    assert set(mock_riot_clients._clients) == {
+        "https://americas.api.riotgames.com",
+        "https://na1.api.riotgames.com",
+    }
+
+
+def test_rate_limited_badge_falls_back(mock_riot_clients):
+    """Test that an exhausted budget serves a fallback badge with Retry-After instead of queueing."""
+    with patch.object(
+        rate_limiter,
+        "acquire",
+        side_effect=RateLimitExceeded("https://americas.api.riotgames.com", 30),
+    ):
+        response = client.get("/badge/NA1/Eggo/WFLE")
+
+    assert response.status_code == 200
+    assert response.headers["Retry-After"] == "30"
+    assert "ERROR" in response.text
+
+
+def test_revalidation_with_etag_skips_rendering(mock_riot_clients):
+    """Test that a badge carries an ETag & caching headers, and that revalidating it gets a bodyless 304."""
+    response = client.get("/badge/NA1/Eggo/WFLE")
+    etag = response.headers["ETag"]
+    assert response.status_code == 200
+    assert "max-age=3600" in response.headers["Cache-Control"]
+
+    with patch(
+        "app.routers.badge.generate_encoded_badge", return_value=b"<svg/>"
+    ) as render:
+        revalidated = client.get(
+            "/badge/NA1/Eggo/WFLE", headers={"If-None-Match": f'W/"stale", {etag}'}
+        )
+        changed = client.get(
+            "/badge/NA1/Eggo/WFLE?rank_name=true",
+            headers={"If-None-Match": etag, "Accept-Encoding": "identity"},
+        )
+
+    assert revalidated.status_code == 304
+    assert revalidated.content == b""
+    assert revalidated.headers["ETag"] == etag
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+    render.assert_called_once()
+
+
+def test_badges_are_precompressed_once(mock_riot_clients):
+    """Test that badges are served in the best coding the client accepts, compressing each badge once."""
+    identity = client.get(
+        "/badge/NA1/Eggo/WFLE", headers={"Accept-Encoding": "identity"}
+    )
+    assert "Content-Encoding" not in identity.headers
+    assert identity.headers["Vary"] == "Accept-Encoding"
+
+    with patch("app.services.badge_generator.compress", wraps=compress) as compressor:
+        for _ in range(2):
+            gzipped = client.get(
+                "/badge/NA1/Eggo/WFLE",
+                headers={"Accept-Encoding": "deflate, gzip;q=0.8"},
+            )
+            assert gzipped.headers["Content-Encoding"] == "gzip"
+            assert gzipped.content == identity.content  # Decoded by httpx
+            assert gzipped.headers["ETag"] != identity.headers["ETag"]
+    compressor.assert_called_once()
+
+    assert negotiate_encoding("gzip;q=0.5, br") == (
+        "br" if "br" in ENCODINGS else "gzip"
+    )
+    assert negotiate_encoding("gzip;q=0, *;q=0.1") == (
+        "br" if "br" in ENCODINGS else "identity"
+    )
+    assert negotiate_encoding("compress") == "identity"
+
+
+def test_raster_badges_are_rendered_once(mock_riot_clients):
+    """Test that PNG & WebP badges are sized by `scale`, get their own ETag, and are only rendered once."""
+    with patch("app.services.raster.render_raster", wraps=render_raster) as renderer:
+        for _ in range(2):
+            png = client.get("/badge/NA1/Eggo/WFLE?format=png&scale=2")
+            webp = client.get("/badge/NA1/Eggo/WFLE?format=webp")
+    assert renderer.call_count == 2
+
+    assert png.headers["Content-Type"] == "image/png"
+    assert webp.headers["Content-Type"] == "image/webp"
+    assert Image.open(io.BytesIO(png.content)).height == 56
+    assert Image.open(io.BytesIO(webp.content)).height == 28
+    assert "Content-Encoding" not in png.headers
+    assert png.headers["ETag"] != webp.headers["ETag"]
+
+    revalidated = client.get(
+        "/badge/NA1/Eggo/WFLE?format=png&scale=2",
+        headers={"If-None-Match": png.headers["ETag"]},
+    )
+    assert revalidated.status_code == 304
+    assert client.get("/badge/NA1/Eggo/WFLE?format=png&scale=99").status_code == 422
+
+    # SVGs scale on their own, so asking for a scaled one is an error rather than ignored
+    assert client.get("/badge/NA1/Eggo/WFLE?scale=2").status_code == 422
+    assert client.get(f"/badge/by-puuid/NA1/{'a' * 78}?scale=2").status_code == 422
+
+
+def test_saturated_raster_pool_sheds_load(mock_riot_clients):
+    """Test that a raster badge is turned away with a 503 & Retry-After when the pool is full, and SVGs aren't."""
+    with patch.object(raster_pool, "max_pending", 0):
+        rejected = client.get("/badge/NA1/Eggo/WFLE?format=png&scale=3")
+        svg = client.get("/badge/NA1/Eggo/WFLE")
+
+    assert rejected.status_code == 503
+    assert int(rejected.headers["Retry-After"]) >= 1
+    assert svg.status_code == 200
+    assert client.get("/badge/NA1/Eggo/WFLE?format=png&scale=3").status_code == 200
+
+
+def test_queues_share_one_league_fetch(puuid_store):
+    """Test that every queue option & LP/win rate text is served from a single league-v4 response."""
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request.url.path)
+        if request.url.path.startswith("/lol/league/v4/entries/by-puuid/"):
+            return httpx.Response(
+                200,
+                json=[
+                    {
+                        "queueType": "RANKED_FLEX_SR",
+                        "tier": "PLATINUM",
+                        "rank": "IV",
+                        "leaguePoints": 12,
+                        "wins": 9,
+                        "losses": 3,
+                    },
+                    {
+                        "queueType": "RANKED_SOLO_5x5",
+                        "tier": "GOLD",
+                        "rank": "II",
+                        "leaguePoints": 75,
+                        "wins": 10,
+                        "losses": 10,
+                    },
+                ],
+            )
+        return mock_riot_handler(request)
+
+    riot_clients = RiotClientPool(transport=httpx.MockTransport(handler))
+    app.dependency_overrides[get_client_pool] = lambda: riot_clients
+    try:
+        solo = client.get(
+            "/badge/NA1/Queues/WFLE?rank_name=true&lp=true",
+            headers={"Accept-Encoding": "identity"},
+        )
+        flex = client.get(
+            "/badge/NA1/Queues/WFLE?rank_name=true&queue=flex&winrate=true",
+            headers={"Accept-Encoding": "identity"},
+        )
+        best = client.get(
+            "/badge/NA1/Queues/WFLE?rank_name=true&queue=best",
+            headers={"Accept-Encoding": "identity"},
+        )
+    finally:
+        app.dependency_overrides.pop(get_client_pool)
+
+    assert "GOLD · 75 LP" in solo.text
+    assert "PLATINUM · 75% WR" in flex.text
+    assert "PLATINUM" in best.text
+    assert len(calls) == 2  # One account-v1 & one league-v4 call for all three badges
+
+
+def test_badge_by_puuid_costs_one_upstream_call(mock_riot_clients, puuid_store):
+    """Test that the by-PUUID route goes straight to league-v4, naming the player from the store."""
+    puuid = mock_summoner_data["puuid"]
+    puuid_store.set("Eggo", "WFLE", puuid)
+
+    with patch("app.services.riot_api.riot_get", wraps=riot_get) as upstream, patch(
+        "app.services.riot_api.get_summoner_puuid"
+    ) as account_lookup:
+        rank_response = client.get(f"/badge/by-puuid/NA1/{puuid}?rank_name=true")
+        name_response = client.get(f"/badge/by-puuid/NA1/{puuid}")
+
+    assert "GOLD" in rank_response.text
+    assert "Eggo#WFLE" in name_response.text
+    assert upstream.call_count == 1  # The second badge is served from the rank cache
+    account_lookup.assert_not_called()
+
+
+def test_badge_by_puuid_resolves_unknown_name_lazily(mock_riot_clients, puuid_store):
+    """Test that an unknown PUUID's name costs one account-v1 call on its first badge only, then is stored."""
+    puuid = mock_summoner_data["puuid"]
+    rank_cache.clear()
+
+    with patch("app.services.riot_api.riot_get", wraps=riot_get) as upstream:
+        response = client.get(f"/badge/by-puuid/NA1/{puuid}")
+        assert upstream.call_count == 2  # league-v4, then account-v1 for the name
+        rank_cache.clear()
+        client.get(f"/badge/by-puuid/NA1/{puuid}?queue=flex")
+
+    assert "Eggo#WFLE" in response.text
+    assert puuid_store.get_riot_id(puuid) == ("Eggo", "WFLE")
+    assert upstream.call_count == 3  # Only league-v4 once the name is stored
+
+
+def test_badge_by_puuid_serves_error_badges(mock_riot_clients, puuid_store):
+    """Test that bad platforms & PUUIDs get an error badge, and that rejected PUUIDs don't reach Riot again."""
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(
+            400, json={"status": {"message": "Bad Request - Exception decrypting"}}
+        )
+
+    invalid_platform = client.get(f"/badge/by-puuid/XX1/{mock_summoner_data['puuid']}")
+    assert invalid_platform.status_code == 200
+    assert "ERROR" in invalid_platform.text
+
+    riot_clients = RiotClientPool(transport=httpx.MockTransport(handler))
+    app.dependency_overrides[get_client_pool] = lambda: riot_clients
+    try:
+        with patch("app.services.riot_api.riot_get", wraps=riot_get) as upstream:
+            for _ in range(2):
+                response = client.get(
+                    "/badge/by-puuid/NA1/not-a-real-puuid?rank_name=true"
+                )
+                assert response.status_code == 200
+                assert "ERROR" in response.text
+                assert response.headers["Cache-Control"] == "no-cache"
+    finally:
+        app.dependency_overrides[get_client_pool] = lambda: mock_riot_clients
+
+    assert upstream.call_count == 1
+
+
+def test_batch_deduplicates_upstream_fetches(puuid_store):
+    """Test that a batch looks up each unique player once, whatever the casing or options."""
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request.url.path)
+        return mock_riot_handler(request)
+
+    riot_clients = RiotClientPool(transport=httpx.MockTransport(handler))
+    app.dependency_overrides[get_client_pool] = lambda: riot_clients
+    try:
+        badges = [
+            {"region": "NA1", "summoner": "Eggo", "tag_line": "WFLE"},
+            {"region": "na1", "summoner": "eggo", "tag_line": "wfle"},
+            {
+                "region": "NA1",
+                "summoner": "Eggo",
+                "tag_line": "WFLE",
+                "rank_name": True,
+            },
+            {"region": "NA1", "summoner": "Eggo", "tag_line": "W-FLE"},
+        ]
+        response = client.post("/badge/batch", json={"badges": badges})
+        assert response.status_code == 200
+        svgs = response.json()["badges"]
+        assert len(svgs) == 4
+        assert "GOLD" in svgs["NA1/Eggo/WFLE?rank_name=true"]
+        assert "eggo#wfle" in svgs["na1/eggo/wfle"]
+        assert "Eggo#WFLE" not in svgs["na1/eggo/wfle"]
+        assert "ERROR" in svgs["NA1/Eggo/W-FLE"]
+        # One account-v1 & one league-v4 call for three badges of the same player
+        assert len(calls) == 2
+
+        response = client.post(
+            "/badge/batch", json={"badges": badges[:2], "format": "svg"}
+        )
+        assert response.headers["content-type"].startswith("image/svg+xml")
+        assert response.text.count("<svg") == 3
+        assert len(calls) == 2
+    finally:
+        app.dependency_overrides.pop(get_client_pool)
+
+
+def test_unknown_riot_id_is_negatively_cached():
+    """Test that a Riot ID account-v1 doesn't know only costs one upstream call until its entry expires."""
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request.url.path)
+        if request.url.path.endswith("/by-riot-id/Nobody/0000"):
+            return httpx.Response(404, json={"status": {"status_code": 404}})
+        return mock_riot_handler(request)
+
+    riot_clients = RiotClientPool(transport=httpx.MockTransport(handler))
+    app.dependency_overrides[get_client_pool] = lambda: riot_clients
+    saved_before = negative_cache.stats()["upstream_calls_saved"]
+    try:
+        for _ in range(3):
+            response = client.get("/badge/NA1/Nobody/0000")
+            assert response.status_code == 200
+            assert "ERROR" in response.text
+        assert len(calls) == 1
+        assert negative_cache.stats()["upstream_calls_saved"] - saved_before == 2
+
+        # Other players are unaffected
+        client.get("/badge/NA1/Eggo/WFLE")
+        assert len(calls) == 3
+    finally:
+        app.dependency_overrides.pop(get_client_pool)
+
+
+def test_open_circuit_serves_last_known_good_badge():
+    """Test that a failing platform opens its circuit, after which badges skip it entirely."""
+    calls = []
+    platform_down = False
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request.url.path)
+        if platform_down and request.url.host == "na1.api.riotgames.com":
+            return httpx.Response(503)
+        if (
+            "/accounts/by-riot-id/Player" in request.url.path
+        ):  # A PUUID of their own, nothing cached
+            return httpx.Response(200, json={"puuid": request.url.path.split("/")[-2]})
+        return mock_riot_handler(request)
+
+    riot_clients = RiotClientPool(transport=httpx.MockTransport(handler))
+    app.dependency_overrides[get_client_pool] = lambda: riot_clients
+    try:
+        assert client.get("/badge/NA1/Eggo/WFLE").status_code == 200
+
+        platform_down = True
+        for i in range(settings.CIRCUIT_MIN_CALLS):
+            client.get(f"/badge/NA1/Player{i}/NA1")
+        assert (
+            circuit_breakers.stats()["https://na1.api.riotgames.com"]["state"] == "open"
+        )
+
+        # Nothing cached, so a cheap fallback badge, without touching the platform
+        calls.clear()
+        response = client.get("/badge/NA1/Player99/NA1")
+        assert response.status_code == 200
+        assert "Retry-After" in response.headers
+        assert not any("/lol/league/" in path for path in calls)
+
+        # The last known good rank is still served, even once stale
+        for key, (value, _) in list(rank_cache._entries.items()):
+            rank_cache._entries[key] = (value, time.monotonic() - 2 * rank_cache.ttl)
+        response = client.get("/badge/NA1/Eggo/WFLE?rank_name=true")
+        assert response.status_code == 200
+        assert "GOLD" in response.text
+    finally:
+        app.dependency_overrides.pop(get_client_pool)
@@ -0,0 +1,201 @@
+import asyncio
+import time
+import pytest
+from app.tests.fake_redis import FakeRedis
+from app.utils.cache import (
+    AsyncTTLCache,
+    ByteLRUCache,
+    MemoryBackend,
+    NegativeCache,
+    RedisBackend,
+    SQLiteBackend,
+)
+
+
+def age_entry(cache: AsyncTTLCache, key, seconds: float):
+    value, _ = cache.get(key)
+    cache._entries[key] = (value, time.monotonic() - seconds)
+
+
+def test_stale_entry_served_while_refreshing():
+    """Test that a stale entry is returned immediately & refreshed in the background."""
+
+    async def scenario():
+        cache = AsyncTTLCache(ttl=60, max_stale=600, max_entries=10)
+        cache.set("eggo", "GOLD")
+        age_entry(cache, "eggo", 120)
+
+        refreshed = asyncio.Event()
+
+        async def fetch():
+            refreshed.set()
+            return "PLATINUM"
+
+        assert await cache.get_or_fetch("eggo", fetch) == "GOLD"
+        await asyncio.wait_for(refreshed.wait(), 1)
+        await asyncio.sleep(0)
+        assert await cache.get_or_fetch("eggo", fetch) == "PLATINUM"
+        return cache.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["stale_hits"] == 1
+    assert stats["hits"] == 1
+
+
+def test_last_known_good_served_on_error():
+    """Test that an expired entry is still served when the upstream fetch fails."""
+
+    async def failing_fetch():
+        raise RuntimeError("Riot is down")
+
+    async def scenario():
+        cache = AsyncTTLCache(ttl=60, max_stale=60, max_entries=10)
+        cache.set("eggo", "GOLD")
+        age_entry(cache, "eggo", 3600)
+        value = await cache.get_or_fetch("eggo", failing_fetch)
+
+        with pytest.raises(RuntimeError):
+            await cache.get_or_fetch("faker", failing_fetch)
+        return value, cache.stats()
+
+    value, stats = asyncio.run(scenario())
+    assert value == "GOLD"
+    assert stats["errors_served_stale"] == 1
+
+
+def test_negative_cache_expires_and_is_bounded():
+    """Test that failures are forgotten after their TTL, and that the oldest go first when full."""
+    cache = NegativeCache(ttl=60, max_entries=2)
+    cache.add("nobody#0000", "Riot ID not found.")
+    assert cache.get("nobody#0000") == "Riot ID not found."
+
+    reason, _, calls = cache._entries["nobody#0000"]
+    cache._entries["nobody#0000"] = (reason, time.monotonic() - 1, calls)
+    assert cache.get("nobody#0000") is None
+
+    for key in ("a#1", "b#2", "c#3"):
+        cache.add(key, "Riot ID not found.")
+    assert "a#1" not in cache
+    assert len(cache) == 2
+    assert cache.stats()["upstream_calls_saved"] == 1
+
+
+@pytest.fixture(params=["sqlite", "redis"])
+def shared_backend(request, tmp_path):
+    if request.param == "sqlite":
+        backend = SQLiteBackend(str(tmp_path / "cache.sqlite3"))
+        yield backend
+        backend.close()
+    else:
+        with FakeRedis() as fake_redis:
+            backend = RedisBackend(fake_redis.url)
+            yield backend
+            backend.close()
+
+
+def test_workers_sharing_a_backend_fetch_once(shared_backend):
+    """Test that caches of separate workers sharing a backend make a single upstream fetch between them."""
+    fetches = []
+
+    async def fetch():
+        fetches.append(1)
+        await asyncio.sleep(0.1)
+        return [{"queueType": "RANKED_SOLO_5x5", "tier": "GOLD"}]
+
+    async def scenario():
+        workers = [
+            AsyncTTLCache(
+                ttl=60,
+                max_stale=60,
+                max_entries=10,
+                name="rank",
+                backend=shared_backend,
+            )
+            for _ in range(4)
+        ]
+        return await asyncio.gather(
+            *(worker.get_or_fetch("eggo", fetch) for worker in workers)
+        )
+
+    values = asyncio.run(scenario())
+    assert len(fetches) == 1
+    assert all(value == values[0] for value in values)
+
+    # Rendered rasters & failed lookups are shared too
+    async def share():
+        await ByteLRUCache(1024, name="rasters", backend=shared_backend).aset(
+            ("png", 1), b"PNG"
+        )
+        await NegativeCache(
+            ttl=60, max_entries=10, name="negative", backend=shared_backend
+        ).aadd("nobody#0000", "Riot ID not found.")
+
+        rasters = ByteLRUCache(1024, name="rasters", backend=shared_backend)
+        negative = NegativeCache(
+            ttl=60, max_entries=10, name="negative", backend=shared_backend
+        )
+        return await rasters.aget(("png", 1)), await negative.aget("nobody#0000")
+
+    assert asyncio.run(share()) == (b"PNG", "Riot ID not found.")
+
+
+def test_clear_drops_the_shared_entries(shared_backend):
+    """Test that clearing a cache also clears its entries in the backend, & only its own."""
+    rasters = ByteLRUCache(1024, name="rasters", backend=shared_backend)
+    negative = NegativeCache(
+        ttl=60, max_entries=10, name="negative", backend=shared_backend
+    )
+
+    async def scenario():
+        await rasters.aset(("png", 1), b"PNG")
+        await negative.aadd("nobody#0000", "Riot ID not found.")
+        rasters.clear()
+        return await rasters.aget(("png", 1)), await negative.aget("nobody#0000")
+
+    assert asyncio.run(scenario()) == (None, "Riot ID not found.")
+
+
+def test_backend_calls_leave_the_event_loop_free():
+    """Test that a slow backend is waited on in a worker thread, so other requests keep being served meanwhile."""
+
+    class SlowBackend(MemoryBackend):
+        blocking = True
+
+        def get(self, key: str) -> bytes | None:
+            time.sleep(0.2)
+            return super().get(key)
+
+    cache = AsyncTTLCache(
+        ttl=60, max_stale=60, max_entries=10, name="rank", backend=SlowBackend()
+    )
+    ticks = []
+
+    async def ticker():
+        for _ in range(5):
+            ticks.append(time.monotonic())
+            await asyncio.sleep(0.02)
+
+    async def fetch():
+        return "GOLD"
+
+    async def scenario():
+        return await asyncio.gather(cache.get_or_fetch("eggo", fetch), ticker())
+
+    assert asyncio.run(scenario())[0] == "GOLD"
+    assert ticks[-1] - ticks[0] < 0.2
+
+
+def test_redis_outage_is_a_miss():
+    """Test that an unreachable Redis doesn't fail lookups, which just fall back to fetching."""
+    with FakeRedis() as fake_redis:
+        url = fake_redis.url
+    backend = RedisBackend(url, retry_after=60)
+    cache = AsyncTTLCache(
+        ttl=60, max_stale=60, max_entries=10, name="rank", backend=backend
+    )
+
+    async def fetch():
+        return "GOLD"
+
+    assert asyncio.run(cache.get_or_fetch("eggo", fetch)) == "GOLD"
+    assert backend.get("rank:'eggo'") is None
@@ -0,0 +1,58 @@
+import time
+import pytest
+from app.services.circuit_breaker import (
+    CLOSED,
+    HALF_OPEN,
+    OPEN,
+    CircuitBreaker,
+    CircuitOpen,
+)
+
+
+def make_breaker() -> CircuitBreaker:
+    return CircuitBreaker(
+        "https://kr.api.riotgames.com",
+        failure_rate=0.5,
+        slow_call_seconds=1,
+        window=10,
+        min_calls=4,
+        open_seconds=30,
+    )
+
+
+def test_breaker_opens_on_errors_and_slow_calls():
+    """Test that failed & slow calls both count towards opening the circuit, once enough calls were seen."""
+    breaker = make_breaker()
+    breaker.record(False, 0.1)
+    breaker.record(True, 0.1)
+    breaker.record(False, 5.0)  # Slow
+    assert breaker.state == CLOSED
+
+    breaker.record(False, 0.1)
+    assert breaker.state == OPEN
+    with pytest.raises(CircuitOpen) as e:
+        breaker.before_call()
+    assert 1 <= e.value.retry_after <= 30
+    assert breaker.stats() == {"state": OPEN, "rejected": 1, "times_opened": 1}
+
+
+def test_breaker_probes_once_when_half_open():
+    """Test that only one probe is let through after the cool-down, and that its outcome decides the state."""
+    breaker = make_breaker()
+    for _ in range(4):
+        breaker.record(True, 0.1)
+    breaker.opened_at = time.monotonic() - 31
+
+    breaker.before_call()
+    assert breaker.state == HALF_OPEN
+    with pytest.raises(CircuitOpen):
+        breaker.before_call()
+
+    breaker.record(True, 0.1)  # The probe failed, back to open
+    assert breaker.state == OPEN
+
+    breaker.opened_at = time.monotonic() - 31
+    breaker.before_call()
+    breaker.record(False, 0.1)
+    assert breaker.state == CLOSED
+    breaker.before_call()
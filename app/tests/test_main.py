@@ -0,0 +1,96 @@
+import os
+import subprocess
+import sys
+import time
+import httpx
+from fastapi.testclient import TestClient
+from app.main import app
+from app.services.riot_client import RiotClientPool, get_client_pool
+from app.utils.profiling import ProfilingMiddleware, sign_path
+from app.tests.mock_riot import mock_riot_handler
+
+# Cold start budget for `import app.main`, override on slow CI runners
+IMPORT_TIME_BUDGET = float(os.getenv("IMPORT_TIME_BUDGET", "1.5"))
+
+
+def test_import_time_budget():
+    """Test that importing the app does no slow work (webhooks, sleeps, asset loading)."""
+    measure = "import time; t = time.perf_counter(); import app.main; print(time.perf_counter() - t)"
+    result = subprocess.run(
+        [sys.executable, "-c", measure],
+        capture_output=True,
+        text=True,
+        check=True,
+        cwd=os.path.dirname(os.path.dirname(os.path.dirname(__file__))),
+        env={**os.environ, "DISCORD_WEBHOOK": "https://discord.test/webhook"},
+    )
+    import_time = float(result.stdout.strip().splitlines()[-1])
+    assert import_time < IMPORT_TIME_BUDGET
+
+
+def test_readiness_flips_once_warm():
+    """Test that /ready reports ready once the background warm-up has run."""
+    with TestClient(app) as client:
+        deadline = time.monotonic() + 5
+        while client.get("/ready").status_code != 200:
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
+
+        assert client.get("/ready").json() == {"status": "ready"}
+
+
+def test_metrics_cover_stages_and_upstream_calls():
+    """Test that /metrics exposes the stage histograms & Riot response counters once a badge was served."""
+    riot_clients = RiotClientPool(transport=httpx.MockTransport(mock_riot_handler))
+    app.dependency_overrides[get_client_pool] = lambda: riot_clients
+    try:
+        client = TestClient(app)
+        assert client.get("/badge/NA1/Eggo/WFLE").status_code == 200
+        response = client.get("/metrics")
+    finally:
+        app.dependency_overrides.pop(get_client_pool)
+
+    assert response.headers["content-type"].startswith("text/plain")
+    for stage in ("puuid", "league", "width", "render", "total"):
+        assert f'lol_badges_stage_seconds_count{{stage="{stage}"}}' in response.text
+    assert (
+        'lol_badges_riot_responses_total{host="na1",method="league-v4.entries.by-puuid",status="200"}'
+        in response.text
+    )
+    assert 'lol_badges_badges_total{route="riot_id"}' in response.text
+    assert 'lol_badges_cache_lookups_total{cache="rank",result="miss"}' in response.text
+    assert 'lol_badges_requests_in_flight{route="riot_id"} 0.0' in response.text
+
+
+def test_server_timing_header_lists_stages():
+    """Test that badge responses carry the time spent per stage in a Server-Timing header."""
+    riot_clients = RiotClientPool(transport=httpx.MockTransport(mock_riot_handler))
+    app.dependency_overrides[get_client_pool] = lambda: riot_clients
+    try:
+        # Not rendered by other tests, & uncompressed so that there's no compress stage
+        response = TestClient(app).get(
+            "/badge/NA1/Timing/WFLE", headers={"Accept-Encoding": "identity"}
+        )
+    finally:
+        app.dependency_overrides.pop(get_client_pool)
+
+    stages = [
+        timing.split(";")[0] for timing in response.headers["server-timing"].split(", ")
+    ]
+    assert stages == ["riot", "puuid", "league", "width", "render", "total"]
+
+
+def test_signed_requests_are_profiled(tmp_path):
+    """Test that only requests signed with the profiling secret are profiled when sampling is off."""
+    profiled = TestClient(
+        ProfilingMiddleware(
+            app, sample_rate=0, secret="hunter2", output_dir=str(tmp_path)
+        )
+    )
+
+    profiled.get("/badge/NA1/Eggo/W-FLE?profile=forged")
+    assert list(tmp_path.iterdir()) == []
+
+    signature = sign_path("hunter2", "/badge/NA1/Eggo/W-FLE")
+    assert profiled.get(f"/badge/NA1/Eggo/W-FLE?profile={signature}").status_code == 200
+    assert [p.suffix for p in tmp_path.iterdir()] == [".prof"]
@@ -0,0 +1,100 @@
+import asyncio
+import time
+import httpx
+from unittest.mock import patch
+from app.services.refresher import PopularityTracker, RankRefresher
+from app.services.riot_api import calculate_region, get_summoner_rank, rank_cache
+from app.services.riot_client import RiotClientPool
+from app.tests.mock_riot import mock_riot_handler
+
+
+def test_popularity_decays_and_prunes():
+    """Test that older requests count for less, and that only the most popular players are kept."""
+    tracker = PopularityTracker(half_life=60, max_keys=4)
+    tracker.record("Eggo", "WFLE", "NA1")
+    tracker.record("eggo", "wfle", "na1")  # Same player
+
+    with patch(
+        "app.services.refresher.time.monotonic", return_value=time.monotonic() + 60
+    ):
+        assert abs(tracker.score("Eggo", "WFLE", "NA1") - 1.0) < 0.01
+        for _ in range(2):
+            tracker.record("Faker", "KR1", "KR")
+        for _ in range(3):
+            tracker.record("Player0", "NA1", "NA1")
+            tracker.record("Player1", "NA1", "NA1")
+        assert tracker.top(2) == [("Player0", "NA1", "NA1"), ("Player1", "NA1", "NA1")]
+
+        tracker.record(
+            "Player2", "NA1", "NA1"
+        )  # Over max_keys, the least popular quarter is dropped
+
+    assert len(tracker) == 3
+    assert ("Faker", "KR1", "KR") in tracker.top(3)
+    assert ("Eggo", "WFLE", "NA1") not in tracker.top(3)
+
+
+def test_refresher_keeps_popular_badges_warm():
+    """Test that popular players nearing expiry are refreshed within budget, and fresh ones are left alone."""
+    upstream_calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        upstream_calls.append(request.url.path)
+        return mock_riot_handler(request)
+
+    riot_clients = RiotClientPool(transport=httpx.MockTransport(handler))
+    tracker = PopularityTracker(half_life=3600, max_keys=100)
+    refresher = RankRefresher(
+        tracker, interval=60, top_k=10, budget_share=1, refresh_ahead=0.8
+    )
+
+    async def scenario():
+        await get_summoner_rank("Eggo", "WFLE", "NA1", riot_clients)
+        tracker.record("Eggo", "WFLE", "NA1")
+        upstream_calls.clear()
+
+        await refresher.refresh_once(riot_clients)
+        assert upstream_calls == []  # Just fetched, still fresh
+
+        # Age the cached rank past the refresh-ahead point
+        for key, (value, stored_at) in rank_cache._entries.items():
+            rank_cache._entries[key] = (value, stored_at - 10_000)
+        await refresher.refresh_once(riot_clients)
+        assert len(upstream_calls) == 1 and "/league/v4/" in upstream_calls[0]
+        assert rank_cache.get(next(iter(rank_cache._entries)))[1] < 1
+
+        # Past the budget, unknown players (2 calls each) are skipped
+        refresher.budget_share = 0
+        tracker.record("Faker", "KR1", "KR")
+        await refresher.refresh_once(riot_clients)
+        assert refresher.stats()["over_budget"] == 1
+
+    asyncio.run(scenario())
+    assert refresher.refreshed == 1
+
+
+def test_refresher_charges_each_call_to_its_host(puuid_store):
+    """Test that resolving an unknown PUUID is charged to the regional host, & only league-v4 to the platform."""
+    refresher = RankRefresher(
+        PopularityTracker(half_life=3600, max_keys=100),
+        interval=60,
+        top_k=10,
+        budget_share=1,
+        refresh_ahead=0.8,
+    )
+    platform, regional = calculate_region("NA1", False), calculate_region("NA1", True)
+    budgets = {platform: 2, regional: 1}
+    puuid_store.set("Eggo", "WFLE", "eggo-puuid")
+
+    top = [
+        ("Unknown1", "NA1", "NA1"),
+        ("Unknown2", "NA1", "NA1"),
+        ("Eggo", "WFLE", "NA1"),
+    ]
+    with patch.object(refresher, "_budget", side_effect=budgets.get):
+        due = asyncio.run(refresher.due(top))
+
+    # The second unknown player is over the regional budget, which leaves room on the platform for the known one
+    assert [player[0] for player in due] == ["Unknown1", "Eggo"]
+    assert [player[4] for player in due] == [2, 1]
+    assert refresher.over_budget == 1
@@ -1,22 +1,25 @@
 # Created by Ryan Polasky, 12/3/24
 # All rights reserved
 
+import asyncio
+import httpx
 import pytest
+import time
 from fastapi.testclient import TestClient
 from unittest.mock import patch
 from app.main import app  # Import your FastAPI app
+from app.services.rate_limit import RateLimitExceeded, RiotRateLimiter, rate_limiter
+from app.services.riot_api import (
+    get_league_entries,
+    get_summoner_puuid,
+    get_summoner_rank,
+    rank_flights,
+)
+from app.services.riot_client import RiotClientPool
+from app.tests.mock_riot import mock_riot_handler, mock_summoner_data
 
 client = TestClient(app)
 
-# Mock data
-mock_summoner_data = {
-    "summoner_name": "Eggo",
-    "tag_line": "WFLE",
-    # I know this PUUID looks like a secret value that I messed up & put in plain code, but it's
-    # actually plainly accessible to anyone w/ a Riot API key, so it's nothing to worry about obscuring
-    "puuid": "m6VD_tt5-vRTs3zqXyjNbqddf8WuLUZp4rEpYvwj6fTf63L-_oOE2vLLl-imdVhrcNX1HPwgquIKUw",
-}
-
 
 @pytest.fixture
 def mock_riot_api():
@@ -39,3 +42,190 @@ def test_get_summoner_puuid(mock_riot_api):
 
     # Check that the mocked PUUID or related info is embedded in the badge
     assert "mock-puuid" in badge_svg  # Adjust this based on how you display data
+
+
+def test_puuid_store_skips_account_lookup(mock_riot_clients, puuid_store):
+    """Test that a known Riot ID goes straight to league-v4, whatever its casing or spacing."""
+    calls = []
+    with patch(
+        "app.services.riot_api.get_summoner_puuid", wraps=get_summoner_puuid
+    ) as account_lookup:
+        for name in ("Hide%20on%20bush", "hide on bush", "HIDE ON BUSH"):
+            rank_data = asyncio.run(
+                get_summoner_rank(name, "KR1", "KR", mock_riot_clients)
+            )
+            assert rank_data["rank"] == "GOLD"
+            calls.append(account_lookup.call_count)
+
+    assert calls == [1, 1, 1]
+    assert puuid_store.get("Hide on bush", "kr1") == mock_summoner_data["puuid"]
+
+
+def test_puuid_store_revalidates_rejected_puuid(mock_riot_clients, puuid_store):
+    """Test that a stored PUUID rejected by league-v4 is re-resolved from account-v1."""
+    puuid_store.set("Eggo", "WFLE", "stale-puuid")
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path.endswith("/stale-puuid"):
+            return httpx.Response(400)
+        return mock_riot_handler(request)
+
+    riot_clients = RiotClientPool(transport=httpx.MockTransport(handler))
+    rank_data = asyncio.run(get_summoner_rank("Eggo", "WFLE", "NA1", riot_clients))
+
+    assert rank_data["rank"] == "GOLD"
+    assert puuid_store.get("eggo", "wfle") == mock_summoner_data["puuid"]
+
+
+def test_puuid_store_leaves_the_event_loop_free(mock_riot_clients, puuid_store):
+    """Test that a PUUID store waiting on another worker's write doesn't stall the other requests."""
+    puuid_store.set("Eggo", "WFLE", mock_summoner_data["puuid"])
+    peek = puuid_store.peek
+    ticks = []
+
+    def locked_peek(summoner_name: str, tag_line: str) -> str | None:
+        time.sleep(0.2)
+        return peek(summoner_name, tag_line)
+
+    async def ticker():
+        for _ in range(5):
+            ticks.append(time.monotonic())
+            await asyncio.sleep(0.02)
+
+    async def scenario():
+        return await asyncio.gather(
+            get_summoner_rank("Eggo", "WFLE", "NA1", mock_riot_clients), ticker()
+        )
+
+    with patch.object(puuid_store, "peek", side_effect=locked_peek):
+        rank_data, _ = asyncio.run(scenario())
+
+    assert rank_data["rank"] == "GOLD"
+    assert ticks[-1] - ticks[0] < 0.2
+
+
+def test_concurrent_lookups_are_coalesced():
+    """Test that simultaneous requests for one player share a single upstream lookup."""
+    upstream_calls = []
+
+    async def slow_handler(request: httpx.Request) -> httpx.Response:
+        upstream_calls.append(request.url.path)
+        await asyncio.sleep(0.05)
+        return mock_riot_handler(request)
+
+    async def scenario():
+        riot_clients = RiotClientPool(transport=httpx.MockTransport(slow_handler))
+        lookups = [
+            asyncio.create_task(get_summoner_rank("Eggo", "WFLE", "NA1", riot_clients))
+            for _ in range(10)
+        ]
+        await asyncio.sleep(0.01)
+
+        # A client going away mustn't cancel the shared lookup for everybody else
+        lookups[0].cancel()
+        results = await asyncio.gather(*lookups[1:])
+        await riot_clients.aclose()
+        return results
+
+    coalesced_before = rank_flights.coalesced
+    results = asyncio.run(scenario())
+
+    assert all(rank_data["rank"] == "GOLD" for rank_data in results)
+    assert len(upstream_calls) == 2  # One account-v1 + one league-v4 call
+    assert rank_flights.coalesced - coalesced_before == 9
+
+
+def test_rate_limiter_fails_fast_past_deadline():
+    """Test that the limiter learns Riot's limits from headers & rejects requests it can't fit in time."""
+    limiter = RiotRateLimiter(
+        max_wait=0.2, default_app_limits="100:1", default_429_backoff=1
+    )
+    host, method = "https://na1.api.riotgames.com", "league-v4.entries.by-puuid"
+    limits_response = httpx.Response(
+        200,
+        headers={
+            "X-App-Rate-Limit": "100:1",
+            "X-App-Rate-Limit-Count": "1:1",
+            "X-Method-Rate-Limit": "2:10",
+            "X-Method-Rate-Limit-Count": "2:10",
+        },
+    )
+
+    async def scenario():
+        await limiter.acquire(host, method)
+        limiter.update(host, method, limits_response)
+        with pytest.raises(RateLimitExceeded) as error:
+            await limiter.acquire(host, method)
+        return error.value
+
+    error = asyncio.run(scenario())
+    assert error.retry_after > 9
+    assert limiter.stats()["rejected"] == 1
+
+
+def test_429_retry_after_is_honored():
+    """Test that a 429 blocks the method until Retry-After, then the request is retried."""
+    responses = [
+        httpx.Response(
+            429, headers={"Retry-After": "0.1", "X-Rate-Limit-Type": "method"}
+        ),
+        httpx.Response(200, json=[]),
+    ]
+
+    async def scenario():
+        riot_clients = RiotClientPool(
+            transport=httpx.MockTransport(lambda request: responses.pop(0))
+        )
+        started = time.monotonic()
+        entries = await get_league_entries(
+            "https://na1.api.riotgames.com", "puuid", riot_clients
+        )
+        return entries, time.monotonic() - started
+
+    entries, elapsed = asyncio.run(scenario())
+    assert entries == []
+    assert elapsed >= 0.1
+    assert rate_limiter.throttled_429 >= 1
+
+
+def test_repeated_429_raises_rate_limit_exceeded():
+    """Test that a 429 on the retry too is raised like an exhausted budget, rather than as an HTTP error."""
+    throttled = lambda request: httpx.Response(
+        429, headers={"Retry-After": "0.05", "X-Rate-Limit-Type": "method"}
+    )
+
+    async def scenario():
+        riot_clients = RiotClientPool(transport=httpx.MockTransport(throttled))
+        with pytest.raises(RateLimitExceeded) as error:
+            await get_league_entries(
+                "https://na1.api.riotgames.com", "puuid", riot_clients
+            )
+        return error.value
+
+    assert asyncio.run(scenario()).retry_after == 0.05
+
+
+def test_rate_limiter_waits_per_method():
+    """Test that a method waiting on its own budget doesn't hold up another method of the same host."""
+    limiter = RiotRateLimiter(
+        max_wait=1, default_app_limits="100:1", default_429_backoff=1
+    )
+    host = "https://na1.api.riotgames.com"
+    throttled = httpx.Response(
+        429, headers={"Retry-After": "0.5", "X-Rate-Limit-Type": "method"}
+    )
+
+    async def scenario():
+        limiter.update(host, "league-v4.entries.by-puuid", throttled)
+        waiting = asyncio.create_task(
+            limiter.acquire(host, "league-v4.entries.by-puuid")
+        )
+        await asyncio.sleep(0)
+        started = time.monotonic()
+        await limiter.acquire(host, "account-v1.by-puuid")
+        elapsed = time.monotonic() - started
+        await waiting
+        return elapsed
+
+    assert asyncio.run(scenario()) < 0.1
+    assert limiter.stats()["queued"] == 1
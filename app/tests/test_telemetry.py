@@ -0,0 +1,35 @@
+import asyncio
+import json
+import httpx
+from app.services.telemetry import TelemetryPipeline
+
+
+def test_calls_are_batched_into_one_summary():
+    """Test that calls are aggregated per flush, and dropped rather than queued once full."""
+    posted = []
+    attempts = []
+
+    def discord(request: httpx.Request) -> httpx.Response:
+        attempts.append(request)
+        if len(attempts) == 1:  # Discord hiccups once, the summary is retried
+            return httpx.Response(429, headers={"retry-after": "0"})
+        posted.append(json.loads(request.content)["content"])
+        return httpx.Response(204)
+
+    pipeline = TelemetryPipeline(
+        "https://discord.test/webhook",
+        flush_interval=60,
+        queue_size=3,
+        base_delay=0,
+        transport=httpx.MockTransport(discord),
+    )
+    for player in ("Eggo#WFLE", "Eggo#WFLE", "Shua#EGGGY", "Faker#KR1"):
+        pipeline.record("na1", player)
+
+    asyncio.run(pipeline.stop())
+
+    assert len(posted) == 1
+    assert "**3 badge calls**" in posted[0]
+    assert "NA1 3" in posted[0]
+    assert "Eggo#WFLE (2)" in posted[0]
+    assert pipeline.stats()["dropped"] == 1
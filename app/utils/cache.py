@@ -1,2 +1,832 @@
 # Created by Ryan Polasky, 12/3/24
 # All rights reserved
+
+import asyncio
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Hashable
+from urllib.parse import unquote, urlparse
+from app.config import settings
+from app.utils.metrics import record_cache
+
+logger = logging.getLogger(__name__)
+
+# Seconds a worker may spend fetching a missing entry before the other workers waiting on it fetch it themselves
+LEASE_SECONDS = 3
+LEASE_POLL_INTERVAL = 0.05
+
+
+class CacheBackend:
+    """
+    Key -> bytes store behind the caches below, letting every worker of a node (or every node) share what any
+    of them fetched or rendered. The caches keep their own in-process copy in front of it. Backends never raise,
+    a failing backend is logged & treated as a miss, so a cache outage only costs extra Riot calls.
+
+    The methods block on the disk or the network, so async code calls their `a`-prefixed counterparts, which run
+    them in a worker thread rather than on the event loop.
+    """
+
+    # Whether the methods may block, backends that never do skip the thread hop
+    blocking = True
+
+    def get(self, key: str) -> bytes | None:
+        raise NotImplementedError
+
+    def set(self, key: str, value: bytes, ttl: float):
+        raise NotImplementedError
+
+    def add(self, key: str, value: bytes, ttl: float) -> bool:
+        """
+        Sets a key only if it's absent, used as a lease between workers.
+        :return: Whether the key was set, also True if the backend is unavailable so callers go ahead.
+        """
+        raise NotImplementedError
+
+    def delete(self, key: str):
+        raise NotImplementedError
+
+    def clear(self, prefix: str = ""):
+        """Drops every key starting with `prefix`."""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    async def _offload(self, func: Callable[..., Any], *args) -> Any:
+        if not self.blocking:
+            return func(*args)
+        return await asyncio.to_thread(func, *args)
+
+    async def aget(self, key: str) -> bytes | None:
+        return await self._offload(self.get, key)
+
+    async def aset(self, key: str, value: bytes, ttl: float):
+        await self._offload(self.set, key, value, ttl)
+
+    async def aadd(self, key: str, value: bytes, ttl: float) -> bool:
+        return await self._offload(self.add, key, value, ttl)
+
+    async def adelete(self, key: str):
+        await self._offload(self.delete, key)
+
+
+class MemoryBackend(CacheBackend):
+    """
+    In-process backend, holding at most `max_entries` & dropping the oldest first. Only shared by the caches of
+    one worker, which makes it a stand-in for the others in tests & single worker setups.
+    """
+
+    blocking = False
+
+    def __init__(self, max_entries: int = 100000):
+        self.max_entries = max_entries
+        # Key -> (value, expiry)
+        self._entries: OrderedDict[str, tuple[bytes, float]] = OrderedDict()
+
+    def get(self, key: str) -> bytes | None:
+        entry = self._entries.get(key)
+        if entry is None or entry[1] <= time.time():
+            return None
+        return entry[0]
+
+    def set(self, key: str, value: bytes, ttl: float):
+        self._entries.pop(key, None)
+        self._entries[key] = (value, time.time() + ttl)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def add(self, key: str, value: bytes, ttl: float) -> bool:
+        if self.get(key) is not None:
+            return False
+        self.set(key, value, ttl)
+        return True
+
+    def delete(self, key: str):
+        self._entries.pop(key, None)
+
+    def clear(self, prefix: str = ""):
+        for key in [key for key in self._entries if key.startswith(prefix)]:
+            del self._entries[key]
+
+
+class SQLiteBackend(CacheBackend):
+    """
+    Backend shared by every worker of a node through a SQLite file in WAL mode, which lets them all read
+    concurrently while one writes. Expired rows are purged every `purge_every` writes.
+    """
+
+    def __init__(self, path: str, purge_every: int = 1000):
+        """
+        :param path: Path of the SQLite file, on a local disk shared by the workers.
+        :param purge_every: Writes between purges of the expired rows.
+        """
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+        self.path = path
+        self.purge_every = purge_every
+        self._writes = 0
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            path, check_same_thread=False, isolation_level=None, timeout=1
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS cache (
+                key TEXT PRIMARY KEY,
+                value BLOB NOT NULL,
+                expires_at REAL NOT NULL
+            )
+            """)
+
+    def _execute(self, sql: str, params: tuple = ()) -> sqlite3.Cursor | None:
+        try:
+            with self._lock:
+                return self._conn.execute(sql, params)
+        except sqlite3.Error as e:
+            logger.warning(f"Shared cache query failed: {e}")
+            return None
+
+    def get(self, key: str) -> bytes | None:
+        cursor = self._execute(
+            "SELECT value FROM cache WHERE key = ? AND expires_at > ?",
+            (key, time.time()),
+        )
+        row = cursor.fetchone() if cursor else None
+        return row[0] if row else None
+
+    def set(self, key: str, value: bytes, ttl: float):
+        self._execute(
+            "INSERT OR REPLACE INTO cache VALUES (?, ?, ?)",
+            (key, value, time.time() + ttl),
+        )
+        self._writes += 1
+        if self._writes % self.purge_every == 0:
+            self._execute("DELETE FROM cache WHERE expires_at <= ?", (time.time(),))
+
+    def add(self, key: str, value: bytes, ttl: float) -> bool:
+        now = time.time()
+        # Replaces an expired row, but leaves a live one alone
+        cursor = self._execute(
+            "INSERT INTO cache VALUES (?, ?, ?) ON CONFLICT (key) DO UPDATE "
+            "SET value = excluded.value, expires_at = excluded.expires_at WHERE cache.expires_at <= ?",
+            (key, value, now + ttl, now),
+        )
+        return cursor is None or cursor.rowcount == 1
+
+    def delete(self, key: str):
+        self._execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def clear(self, prefix: str = ""):
+        self._execute(
+            "DELETE FROM cache WHERE substr(key, 1, ?) = ?", (len(prefix), prefix)
+        )
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class RedisError(Exception):
+    pass
+
+
+# Returned by `RedisBackend._command` when the server couldn't be reached, as opposed to a nil reply
+_UNAVAILABLE = object()
+
+
+class RedisBackend(CacheBackend):
+    """
+    Backend shared by every node talking to the same Redis (or any server speaking its protocol, e.g. Valkey or
+    KeyDB), over a single connection. Commands block for up to `timeout`, so the caches send them from a worker
+    thread, and after a failure the server is left alone for `retry_after` seconds.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        prefix: str = "lol-badges:",
+        timeout: float = 0.25,
+        retry_after: float = 5,
+    ):
+        """
+        :param url: Example: 'redis://:password@localhost:6379/0'
+        :param prefix: Prepended to every key, so the server can be shared with other apps.
+        :param timeout: Seconds to wait for the server on each command.
+        :param retry_after: Seconds the server is left alone after a failure.
+        """
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 6379
+        self.password = unquote(parsed.password) if parsed.password else None
+        self.db = int(parsed.path.strip("/") or 0)
+        self.prefix = prefix
+        self.timeout = timeout
+        self.retry_after = retry_after
+
+        self._lock = threading.Lock()
+        self._sock: socket.socket | None = None
+        self._reader = None
+        self._down_until = 0.0
+
+    def _connect(self):
+        self._sock = socket.create_connection(
+            (self.host, self.port), timeout=self.timeout
+        )
+        self._sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._reader = self._sock.makefile("rb")
+        if self.password:
+            self._send("AUTH", self.password)
+        if self.db:
+            self._send("SELECT", str(self.db))
+
+    def _disconnect(self):
+        if self._sock is not None:
+            self._reader.close()
+            self._sock.close()
+        self._sock = self._reader = None
+
+    def _send(self, *args: str | bytes) -> Any:
+        parts = [f"*{len(args)}\r\n".encode()]
+        for arg in args:
+            data = arg if isinstance(arg, bytes) else arg.encode("utf-8")
+            parts.append(b"$%d\r\n%s\r\n" % (len(data), data))
+        self._sock.sendall(b"".join(parts))
+        return self._read_reply()
+
+    def _read_reply(self) -> Any:
+        line = self._reader.readline()
+        if not line.endswith(b"\r\n"):
+            raise ConnectionError("Connection closed by the server")
+        kind, rest = line[:1], line[1:-2]
+        if kind == b"+":
+            return rest.decode()
+        if kind == b"-":
+            raise RedisError(rest.decode())
+        if kind == b":":
+            return int(rest)
+        if kind == b"$":
+            length = int(rest)
+            if length < 0:
+                return None
+            return self._reader.read(length + 2)[:-2]
+        if kind == b"*":
+            length = int(rest)
+            return None if length < 0 else [self._read_reply() for _ in range(length)]
+        raise RedisError(f"Unexpected reply {line!r}")
+
+    def _command(self, *args: str | bytes) -> Any:
+        with self._lock:
+            if time.monotonic() < self._down_until:
+                return _UNAVAILABLE
+            try:
+                if self._sock is None:
+                    self._connect()
+                return self._send(*args)
+            except (OSError, RedisError) as e:
+                logger.warning(f"Shared cache command {args[0]} failed: {e}")
+                self._disconnect()
+                self._down_until = time.monotonic() + self.retry_after
+                return _UNAVAILABLE
+
+    def get(self, key: str) -> bytes | None:
+        reply = self._command("GET", self.prefix + key)
+        return None if reply is _UNAVAILABLE else reply
+
+    def set(self, key: str, value: bytes, ttl: float):
+        self._command(
+            "SET", self.prefix + key, value, "PX", str(max(int(ttl * 1000), 1))
+        )
+
+    def add(self, key: str, value: bytes, ttl: float) -> bool:
+        reply = self._command(
+            "SET", self.prefix + key, value, "NX", "PX", str(max(int(ttl * 1000), 1))
+        )
+        return reply is _UNAVAILABLE or reply == "OK"
+
+    def delete(self, key: str):
+        self._command("DEL", self.prefix + key)
+
+    def clear(self, prefix: str = ""):
+        """Drops every key starting with `prefix`, with `KEYS`, so only meant for tests, benchmarks & operators."""
+        keys = self._command("KEYS", self.prefix + prefix + "*")
+        if keys and keys is not _UNAVAILABLE:
+            self._command("DEL", *keys)
+
+    def close(self):
+        with self._lock:
+            self._disconnect()
+
+
+def make_cache_backend(kind: str) -> CacheBackend | None:
+    """
+    :param kind: 'memory', 'sqlite' or 'redis'.
+    :return: The backend shared by the caches, or None for 'memory', where each cache only keeps its own
+    in-process entries.
+    """
+    if kind == "sqlite":
+        return SQLiteBackend(settings.CACHE_DB_PATH)
+    if kind == "redis":
+        return RedisBackend(settings.REDIS_URL)
+    if kind != "memory":
+        raise ValueError(
+            f"Unknown cache backend '{kind}', expected 'memory', 'sqlite' or 'redis'"
+        )
+    return None
+
+
+_cache_backend: CacheBackend | None = None
+
+
+def get_cache_backend() -> CacheBackend | None:
+    """
+    Returns the app-wide shared cache backend set by `CACHE_BACKEND`, opening it on first use.
+    """
+    global _cache_backend
+    if _cache_backend is None:
+        _cache_backend = make_cache_backend(settings.CACHE_BACKEND)
+    return _cache_backend
+
+
+class ByteLRUCache:
+    """
+    Least-recently-used cache of `bytes` values, bounded by the total size of the values held
+    rather than by the number of entries. With a `backend`, `aget` & `aset` also share values with the other
+    workers, while `get` & `set` only ever see this one's.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int,
+        name: str | None = None,
+        backend: CacheBackend | None = None,
+        backend_ttl: float = 24 * 3600,
+    ):
+        """
+        :param max_bytes: Maximum total size of the values held.
+        :param name: Name of the cache in the metrics, & the namespace of its keys in the backend.
+        :param backend: Shared backend behind the in-process entries.
+        :param backend_ttl: Seconds values are kept in the backend for.
+        """
+        self.max_bytes = max_bytes
+        self.name = name
+        self.backend = backend
+        self.backend_ttl = backend_ttl
+        self.current_bytes = 0
+        self._entries: OrderedDict[Hashable, bytes] = OrderedDict()
+
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    def get(self, key: Hashable) -> bytes | None:
+        value = self._entries.get(key)
+        if value is None:
+            self.misses += 1
+            record_cache(self.name, "miss")
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        record_cache(self.name, "hit")
+        return value
+
+    async def aget(self, key: Hashable) -> bytes | None:
+        """Like `get`, falling back to the backend when this worker doesn't hold the value."""
+        if key not in self._entries and self.backend is not None:
+            value = await self.backend.aget(self._backend_key(key))
+            if value is not None:
+                self.shared_hits += 1
+                record_cache(self.name, "shared_hit")
+                self.set(key, value)
+                return value
+        return self.get(key)
+
+    async def aset(self, key: Hashable, value: bytes):
+        """Like `set`, also sharing the value through the backend."""
+        if self.backend is not None:
+            await self.backend.aset(self._backend_key(key), value, self.backend_ttl)
+        self.set(key, value)
+
+    def _backend_key(self, key: Hashable) -> str:
+        return f"{self.name}:{key!r}"
+
+    def set(self, key: Hashable, value: bytes):
+        size = len(value)
+        if size > self.max_bytes:  # Would evict everything else & still not fit
+            return
+
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self.current_bytes -= len(old)
+
+        self._entries[key] = value
+        self.current_bytes += size
+
+        while self.current_bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.current_bytes -= len(evicted)
+            self.evictions += 1
+
+    def clear(self):
+        """Drops every value, the backend's included, which blocks so it's kept out of the request path."""
+        self._entries.clear()
+        self.current_bytes = 0
+        if self.backend is not None:
+            self.backend.clear(f"{self.name}:")
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "shared_hits": self.shared_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(self._entries),
+            "bytes": self.current_bytes,
+            "max_bytes": self.max_bytes,
+        }
+
+
+class NegativeCache:
+    """
+    Remembers lookups that are known to fail, e.g. a Riot ID that account-v1 doesn't know, for a short TTL so
+    repeats skip the upstream calls. Holds at most `max_entries`, dropping the oldest first. With a `backend`, the
+    `a`-prefixed methods also share failures with the other workers.
+    """
+
+    def __init__(
+        self,
+        ttl: float,
+        max_entries: int,
+        name: str | None = None,
+        backend: CacheBackend | None = None,
+    ):
+        """
+        :param ttl: Seconds a failure is remembered for.
+        :param max_entries: Maximum number of failures held.
+        :param name: Name of the cache in the metrics, & the namespace of its keys in the backend.
+        :param backend: Shared backend behind the in-process entries.
+        """
+        self.ttl = ttl
+        self.name = name
+        self.backend = backend
+        self.max_entries = max_entries
+        # Key -> (reason, expiry, upstream calls a hit saves)
+        self._entries: OrderedDict[Hashable, tuple[str, float, int]] = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+        self.upstream_calls_saved = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.peek(key) is not None
+
+    def peek(self, key: Hashable) -> str | None:
+        """Like `get`, without counting towards the stats."""
+        entry = self._entries.get(key)
+        if entry is None or entry[1] <= time.monotonic():
+            return None
+        return entry[0]
+
+    def get(self, key: Hashable) -> str | None:
+        """
+        :return: The reason the lookup failed, or None if it isn't known to fail.
+        """
+        entry = self._entries.get(key)
+        if entry is None or entry[1] <= time.monotonic():
+            self._entries.pop(key, None)
+            self.misses += 1
+            record_cache(self.name, "miss")
+            return None
+
+        self.hits += 1
+        self.upstream_calls_saved += entry[2]
+        record_cache(self.name, "hit")
+        return entry[0]
+
+    def add(self, key: Hashable, reason: str, upstream_calls: int = 1):
+        """
+        :param key: The failed lookup.
+        :param reason: Why it failed, shown to the user.
+        :param upstream_calls: Upstream calls each later hit avoids.
+        """
+        self._store(key, (reason, time.monotonic() + self.ttl, upstream_calls))
+
+    async def apeek(self, key: Hashable) -> str | None:
+        """Like `peek`, first loading the failure from the backend if this worker doesn't hold it."""
+        await self._load(key)
+        return self.peek(key)
+
+    async def aget(self, key: Hashable) -> str | None:
+        """Like `get`, first loading the failure from the backend if this worker doesn't hold it."""
+        await self._load(key)
+        return self.get(key)
+
+    async def aadd(self, key: Hashable, reason: str, upstream_calls: int = 1):
+        """Like `add`, also sharing the failure through the backend."""
+        if self.backend is not None:
+            await self.backend.aset(
+                f"{self.name}:{key!r}",
+                json.dumps([reason, upstream_calls]).encode(),
+                self.ttl,
+            )
+        self.add(key, reason, upstream_calls)
+
+    def _store(self, key: Hashable, entry: tuple[str, float, int]):
+        self._entries.pop(key, None)
+        self._entries[key] = entry
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def _load(self, key: Hashable):
+        if key in self._entries or self.backend is None:
+            return
+        data = await self.backend.aget(f"{self.name}:{key!r}")
+        if data is None:
+            return
+        reason, upstream_calls = json.loads(data)
+        # The backend doesn't tell how long the entry has left, so it's remembered locally for a full TTL
+        self._store(key, (reason, time.monotonic() + self.ttl, upstream_calls))
+
+    def clear(self):
+        """Drops every failure, the backend's included, which blocks so it's kept out of the request path."""
+        self._entries.clear()
+        if self.backend is not None:
+            self.backend.clear(f"{self.name}:")
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(self._entries),
+            "upstream_calls_saved": self.upstream_calls_saved,
+        }
+
+
+class AsyncTTLCache:
+    """
+    Async cache with stale-while-revalidate semantics:
+    - Younger than `ttl`: served as-is.
+    - Older than `ttl` but within `ttl + max_stale`: served immediately, refreshed in the background.
+    - Older than that: re-fetched, but the last known good value is still served if the fetch fails.
+
+    With a `backend`, values (which must be JSON serializable) are shared with the other workers, and a lease
+    in the backend makes sure only one worker fetches a missing or stale entry while the others wait on it.
+    The backend is only reached through the async methods, `get` & `set` only ever see this worker's entries.
+    """
+
+    def __init__(
+        self,
+        ttl: float,
+        max_stale: float,
+        max_entries: int,
+        name: str | None = None,
+        backend: CacheBackend | None = None,
+    ):
+        """
+        :param ttl: Seconds an entry is considered fresh for (the soft TTL).
+        :param max_stale: Seconds past `ttl` a stale entry may be served while it's refreshed.
+        :param max_entries: Maximum number of entries, least recently used ones are evicted first.
+        :param name: Name of the cache in the metrics, & the namespace of its keys in the backend.
+        :param backend: Shared backend behind the in-process entries.
+        """
+        self.ttl = ttl
+        self.name = name
+        self.backend = backend
+        self.max_stale = max_stale
+        self.max_entries = max_entries
+        self._entries: OrderedDict[Hashable, tuple[Any, float]] = OrderedDict()
+        self._refreshing: dict[Hashable, asyncio.Task] = {}
+
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.peer_fetches = 0
+        self.errors_served_stale = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> tuple[Any, float] | None:
+        """
+        :return: The cached value & its age in seconds, or None. Doesn't count towards the stats.
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, stored_at = entry
+        return value, time.monotonic() - stored_at
+
+    def set(self, key: Hashable, value: Any):
+        self._store(key, value, time.monotonic())
+
+    async def aget(self, key: Hashable) -> tuple[Any, float] | None:
+        """Like `get`, also looking in the backend when this worker's entry is missing or stale."""
+        entry = self._entries.get(key)
+        if self.backend is not None and (
+            entry is None or time.monotonic() - entry[1] >= self.ttl
+        ):
+            # Another worker may have fetched it since
+            await self._load(key)
+        return self.get(key)
+
+    async def aset(self, key: Hashable, value: Any):
+        """Like `set`, also sharing the value through the backend."""
+        if self.backend is not None:
+            await self.backend.aset(
+                self._backend_key(key),
+                json.dumps([value, time.time()]).encode(),
+                self.ttl + self.max_stale,
+            )
+        self.set(key, value)
+
+    def _store(self, key: Hashable, value: Any, stored_at: float):
+        self._entries[key] = (value, stored_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _backend_key(self, key: Hashable) -> str:
+        return f"{self.name}:{key!r}"
+
+    async def _load(self, key: Hashable):
+        data = await self.backend.aget(self._backend_key(key))
+        if data is None:
+            return
+        value, stored_at = json.loads(data)
+        # Ages are shared as wall clock times, & kept locally as monotonic ones
+        stored_at = time.monotonic() - max(time.time() - stored_at, 0.0)
+        entry = self._entries.get(key)
+        if entry is None or stored_at > entry[1]:
+            self._store(key, value, stored_at)
+
+    async def _acquire_lease(self, key: Hashable) -> bool:
+        """
+        :return: Whether this worker should fetch the entry, always True without a backend.
+        """
+        if self.backend is None:
+            return True
+        return await self.backend.aadd(
+            f"lease:{self._backend_key(key)}", b"1", LEASE_SECONDS
+        )
+
+    async def _release_lease(self, key: Hashable):
+        if self.backend is not None:
+            await self.backend.adelete(f"lease:{self._backend_key(key)}")
+
+    async def _wait_for_peer(self, key: Hashable) -> tuple[Any, float] | None:
+        """
+        Waits for the worker holding the lease of a missing entry to fetch it.
+        :return: The entry it fetched, or None if it didn't in time.
+        """
+        deadline = time.monotonic() + LEASE_SECONDS
+        while time.monotonic() < deadline:
+            await asyncio.sleep(LEASE_POLL_INTERVAL)
+            entry = await self.aget(key)
+            if entry is not None:
+                return entry
+        return None
+
+    async def invalidate(self, key: Hashable):
+        self._entries.pop(key, None)
+        if self.backend is not None:
+            await self.backend.adelete(self._backend_key(key))
+
+    async def get_or_fetch(
+        self, key: Hashable, fetch: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        """
+        Returns the cached value for a key, calling `fetch` only when it's missing or too stale.
+        :param key: The cache key.
+        :param fetch: Coroutine factory producing a fresh value, raising on failure.
+        :return: The fresh or cached value. Raises the fetch's exception if nothing is cached.
+        """
+        entry = await self.aget(key)
+        if entry is not None:
+            value, age = entry
+            self._entries.move_to_end(key)
+            if age < self.ttl:
+                self.hits += 1
+                record_cache(self.name, "hit")
+                return value
+            if age < self.ttl + self.max_stale:
+                self.stale_hits += 1
+                record_cache(self.name, "stale")
+                self._schedule_refresh(key, fetch)
+                return value
+
+        leased = await self._acquire_lease(key)
+        if not leased and entry is None:
+            # Another worker is fetching it
+            shared = await self._wait_for_peer(key)
+            if shared is not None:
+                self.peer_fetches += 1
+                record_cache(self.name, "peer_fetch")
+                return shared[0]
+
+        self.misses += 1
+        record_cache(self.name, "miss")
+        try:
+            value = await fetch()
+        except Exception:
+            if entry is None:
+                raise
+            logger.warning(f"Refresh of {key} failed, serving last known good value")
+            self.errors_served_stale += 1
+            record_cache(self.name, "stale_on_error")
+            return entry[0]
+        finally:
+            if leased:
+                await self._release_lease(key)
+
+        await self.aset(key, value)
+        return value
+
+    async def refresh(self, key: Hashable, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Fetches a fresh value ahead of its expiry, keeping the current one if the fetch fails.
+        :return: The fresh value, or the current one. Raises the fetch's exception if nothing is cached.
+        """
+        leased = await self._acquire_lease(key)
+        if not leased:
+            entry = await self.aget(key)
+            if entry is not None:  # Another worker is refreshing it
+                return entry[0]
+
+        try:
+            value = await fetch()
+        except Exception:
+            entry = self.get(key)
+            if entry is None:
+                raise
+            logger.warning(f"Refresh of {key} failed, keeping the current value")
+            return entry[0]
+        finally:
+            if leased:
+                await self._release_lease(key)
+
+        await self.aset(key, value)
+        return value
+
+    def _schedule_refresh(self, key: Hashable, fetch: Callable[[], Awaitable[Any]]):
+        if key in self._refreshing:
+            return
+
+        async def refresh():
+            leased = False
+            try:
+                # Another worker may already be refreshing it
+                leased = await self._acquire_lease(key)
+                if leased:
+                    await self.aset(key, await fetch())
+            except Exception as e:
+                # The stale entry stays in place as the last known good value
+                logger.warning(f"Background refresh of {key} failed: {e}")
+            finally:
+                self._refreshing.pop(key, None)
+                if leased:
+                    await self._release_lease(key)
+
+        self._refreshing[key] = asyncio.create_task(refresh())
+
+    async def aclose(self):
+        for task in list(self._refreshing.values()):
+            task.cancel()
+        await asyncio.gather(*self._refreshing.values(), return_exceptions=True)
+        self._refreshing.clear()
+
+    def clear(self):
+        """Drops every entry & lease, the backend's included, which blocks so it's kept out of the request path."""
+        self._entries.clear()
+        if self.backend is not None:
+            self.backend.clear(f"{self.name}:")
+            self.backend.clear(f"lease:{self.name}:")
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "peer_fetches": self.peer_fetches,
+            "errors_served_stale": self.errors_served_stale,
+            "entries": len(self._entries),
+            "refreshing": len(self._refreshing),
+        }
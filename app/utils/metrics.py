@@ -0,0 +1,205 @@
+"""
+Prometheus metrics, exposed at `/metrics`. Everything is counted when it happens (rather than read from
+in-memory stats when scraped), so that with several uvicorn workers & `PROMETHEUS_MULTIPROC_DIR` set,
+any worker can serve the totals of all of them.
+"""
+
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+MULTIPROCESS = bool(os.getenv("PROMETHEUS_MULTIPROC_DIR"))
+
+# From a cached render (~50us) up to a Riot call hitting its timeout
+STAGE_BUCKETS = (
+    0.0001,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+    5,
+    10,
+)
+
+BADGES = Counter("lol_badges_badges_total", "Badges requested, by route.", ["route"])
+IN_FLIGHT = Gauge(
+    "lol_badges_requests_in_flight",
+    "Badge requests currently being served, by route.",
+    ["route"],
+    multiprocess_mode="livesum",
+)
+STAGE_SECONDS = Histogram(
+    "lol_badges_stage_seconds",
+    "Time spent per stage of serving a badge: puuid, league, riot (each Riot call), width, render, compress, raster & total.",
+    ["stage"],
+    buckets=STAGE_BUCKETS,
+)
+RIOT_RESPONSES = Counter(
+    "lol_badges_riot_responses_total",
+    "Riot API responses, by routing host, method & status ('error' for network errors).",
+    ["host", "method", "status"],
+)
+CACHE_LOOKUPS = Counter(
+    "lol_badges_cache_lookups_total",
+    "Cache lookups, by cache & result. The hit ratio is the rate of 'hit' over the rate of all results.",
+    ["cache", "result"],
+)
+REFRESHES = Counter(
+    "lol_badges_refreshes_total",
+    "Background refreshes of popular players' ranks, by result ('over_budget' when skipped).",
+    ["result"],
+)
+CIRCUIT_STATE = Gauge(
+    "lol_badges_circuit_state",
+    "State of the circuit breaker of each Riot routing host: 0 closed, 1 half-open, 2 open.",
+    ["host"],
+    multiprocess_mode="max",
+)
+RASTER_REJECTED = Counter(
+    "lol_badges_raster_rejected_total",
+    "PNG/WebP badges turned away with a 503 because the raster pool was full.",
+)
+CIRCUIT_REJECTED = Counter(
+    "lol_badges_circuit_rejected_total",
+    "Riot calls skipped because the circuit of their routing host was open.",
+    ["host"],
+)
+
+
+# Stage -> seconds spent in it during the current request, when `Server-Timing` is enabled
+_request_spans: ContextVar[dict[str, float] | None] = ContextVar(
+    "request_spans", default=None
+)
+
+
+def host_label(base_url: str) -> str:
+    """
+    Example: 'https://na1.api.riotgames.com' -> 'na1'
+    """
+    return base_url.split("://", 1)[-1].split(".", 1)[0]
+
+
+@contextmanager
+def timed(stage: str):
+    """
+    Times a stage into its histogram, and into the `Server-Timing` header of the current request.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.labels(stage).observe(elapsed)
+        spans = _request_spans.get()
+        if spans is not None:
+            spans[stage] = spans.get(stage, 0.0) + elapsed
+
+
+def server_timing(spans: dict[str, float], total: float) -> str:
+    """
+    Example: {'league': 0.0123} -> 'league;dur=12.3, total;dur=14.1'
+    """
+    timings = [
+        f"{stage};dur={seconds * 1000:.1f}"
+        for stage, seconds in spans.items()
+        if stage != "total"
+    ]
+    timings.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(timings)
+
+
+def record_cache(cache: str | None, result: str):
+    """
+    :param cache: Name of the cache, nothing is recorded for unnamed (e.g. throwaway) caches.
+    :param result: 'hit', 'miss', or a cache specific result such as 'stale'.
+    """
+    if cache:
+        CACHE_LOOKUPS.labels(cache, result).inc()
+
+
+def render_metrics() -> tuple[bytes, str]:
+    """
+    :return: The metrics in the text exposition format, and its content type.
+    """
+    registry = REGISTRY
+    if MULTIPROCESS:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def mark_process_dead():
+    """Drops the live gauges of this worker, called when it shuts down."""
+    if MULTIPROCESS:
+        multiprocess.mark_process_dead(os.getpid())
+
+
+def route_label(path: str) -> str:
+    if path.startswith("/badge/batch"):
+        return "batch"
+    if path.startswith("/badge/by-puuid/"):
+        return "by_puuid"
+    return "riot_id"
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware timing every badge request & tracking how many are in flight, optionally adding a
+    `Server-Timing` header with the stages of the request. Plain ASGI rather than `BaseHTTPMiddleware`,
+    which would add a task & a memory stream to every request.
+    """
+
+    def __init__(self, app, prefix: str = "/badge/", server_timing: bool = True):
+        self.app = app
+        self.prefix = prefix
+        self.server_timing = server_timing
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.prefix):
+            await self.app(scope, receive, send)
+            return
+
+        if self.server_timing:
+            started = time.perf_counter()
+            spans = {}
+            _request_spans.set(spans)
+            original_send = send
+
+            async def send(message):
+                if message["type"] == "http.response.start":
+                    header = server_timing(spans, time.perf_counter() - started)
+                    message = {
+                        **message,
+                        "headers": [
+                            *message.get("headers", []),
+                            (b"server-timing", header.encode()),
+                        ],
+                    }
+                await original_send(message)
+
+        in_flight = IN_FLIGHT.labels(route_label(scope["path"]))
+        in_flight.inc()
+        try:
+            with timed("total"):
+                await self.app(scope, receive, send)
+        finally:
+            in_flight.dec()
@@ -0,0 +1,114 @@
+import asyncio
+import cProfile
+import hashlib
+import hmac
+import itertools
+import logging
+import os
+import sys
+import time
+from urllib.parse import parse_qs
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def sign_path(secret: str, path: str) -> str:
+    """
+    Signs a badge path, so that only whoever holds `PROFILE_SECRET` can ask for a request to be profiled.
+    :param secret: The profiling secret.
+    :param path: The request path. Example: '/badge/NA1/Eggo/WFLE'
+    :return: The value of the `profile` query parameter for that path.
+    """
+    return hmac.new(
+        secret.encode("utf-8"), path.encode("utf-8"), hashlib.sha256
+    ).hexdigest()[:32]
+
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware running cProfile over 1 in `sample_rate` badge requests, and over any request carrying a
+    valid `?profile=<signature>` (see `sign_path`), dumping each profile to `output_dir`. Only one request is
+    profiled at a time, and since the profiler sees the whole event loop, requests served concurrently show up
+    in it too. Only added to the app when profiling is enabled, so it costs nothing otherwise.
+    """
+
+    def __init__(
+        self,
+        app,
+        sample_rate: int,
+        secret: str | None,
+        output_dir: str,
+        prefix: str = "/badge/",
+    ):
+        self.app = app
+        self.sample_rate = sample_rate
+        self.secret = secret
+        self.output_dir = output_dir
+        self.prefix = prefix
+
+        self._requests = itertools.count(1)
+        self._profiling = False
+        self.profiles = 0
+
+    def _wants_profile(self, scope) -> bool:
+        if self.sample_rate and next(self._requests) % self.sample_rate == 0:
+            return True
+        if not self.secret or b"profile=" not in scope["query_string"]:
+            return False
+
+        signature = parse_qs(scope["query_string"].decode("latin-1")).get(
+            "profile", [""]
+        )[0]
+        return hmac.compare_digest(signature, sign_path(self.secret, scope["path"]))
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or not scope["path"].startswith(self.prefix)
+            or self._profiling
+            or not self._wants_profile(scope)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        profiler = cProfile.Profile()
+        self._profiling = True
+        profiler.enable()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            profiler.disable()
+            self._profiling = False
+
+        self.profiles += 1
+        name = scope["path"].strip("/").replace("/", "_")[:80]
+        path = os.path.join(
+            self.output_dir,
+            f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{self.profiles}-{name}.prof",
+        )
+        await asyncio.to_thread(self._dump, profiler, path)
+
+    def _dump(self, profiler: cProfile.Profile, path: str):
+        try:
+            os.makedirs(self.output_dir, exist_ok=True)
+            profiler.dump_stats(path)
+            logger.info(
+                f"Profile written to {path}, inspect it with `python -m pstats {path}`"
+            )
+        except OSError as e:
+            logger.error(f"Failed to write profile {path}: {e}")
+
+
+def profiling_enabled() -> bool:
+    return bool(settings.PROFILE_SAMPLE_RATE or settings.PROFILE_SECRET)
+
+
+if __name__ == "__main__":
+    # Prints the URL that profiles a given badge, e.g. `python -m app.utils.profiling /badge/NA1/Eggo/WFLE`
+    if not settings.PROFILE_SECRET or len(sys.argv) != 2:
+        sys.exit("Usage: PROFILE_SECRET=... python -m app.utils.profiling <badge path>")
+    badge_path = sys.argv[1]
+    print(
+        f"{settings.API_BASE_URL}{badge_path}?profile={sign_path(settings.PROFILE_SECRET, badge_path)}"
+    )
@@ -0,0 +1,165 @@
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import time
+from app.config import settings
+from app.utils.metrics import record_cache
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_riot_id(summoner_name: str, tag_line: str) -> str:
+    """
+    Normalizes a Riot ID into a store key. Riot IDs are case-insensitive, and the router turns
+    `%20` into spaces, so 'Hide%20on%20bush#KR1' & 'hide on bush#kr1' share a key.
+    :param summoner_name: The first portion of the Riot ID. Example: 'Eggo'
+    :param tag_line: The second portion of the Riot ID. Example: 'WFLE'
+    :return: The normalized key. Example: 'eggo#wfle'
+    """
+    name = summoner_name.replace("%20", " ").strip().casefold()
+    return f"{name}#{tag_line.strip().casefold()}"
+
+
+class PuuidStore:
+    """
+    Persistent Riot ID -> PUUID mapping backed by a local SQLite file. A PUUID never changes for
+    an account, so entries are kept for a long TTL & only re-validated when league-v4 rejects them.
+
+    The file is shared by every worker, so a query may wait on another worker's write. Async code calls the
+    `a`-prefixed methods, which run the queries in a worker thread rather than on the event loop.
+    """
+
+    def __init__(self, path: str, ttl: float):
+        """
+        :param path: Path of the SQLite file, or ':memory:' for a throwaway store.
+        :param ttl: Seconds a resolved PUUID is trusted for.
+        """
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+        self.path = path
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            path, check_same_thread=False, isolation_level=None
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS puuids (
+                riot_id TEXT PRIMARY KEY,
+                puuid TEXT NOT NULL,
+                summoner_name TEXT NOT NULL,
+                tag_line TEXT NOT NULL,
+                resolved_at REAL NOT NULL
+            )
+            """)
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS puuids_by_puuid ON puuids (puuid)"
+        )
+
+    def get(self, summoner_name: str, tag_line: str) -> str | None:
+        """
+        :return: The stored PUUID for a Riot ID, or None if unknown or past its TTL.
+        """
+        puuid = self.peek(summoner_name, tag_line)
+        if puuid is None:
+            self.misses += 1
+            record_cache("puuid_store", "miss")
+            return None
+        self.hits += 1
+        record_cache("puuid_store", "hit")
+        return puuid
+
+    def peek(self, summoner_name: str, tag_line: str) -> str | None:
+        """Like `get`, without counting towards the stats."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT puuid FROM puuids WHERE riot_id = ? AND resolved_at > ?",
+                (normalize_riot_id(summoner_name, tag_line), time.time() - self.ttl),
+            ).fetchone()
+        return row[0] if row else None
+
+    def get_riot_id(self, puuid: str) -> tuple[str, str] | None:
+        """
+        :return: The most recently seen (summoner name, tag line) of a PUUID, or None if unknown.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT summoner_name, tag_line FROM puuids WHERE puuid = ? AND resolved_at > ? "
+                "ORDER BY resolved_at DESC LIMIT 1",
+                (puuid, time.time() - self.ttl),
+            ).fetchone()
+
+        if row is None:
+            self.misses += 1
+            record_cache("puuid_store", "miss")
+            return None
+        self.hits += 1
+        record_cache("puuid_store", "hit")
+        return row[0], row[1]
+
+    def set(self, summoner_name: str, tag_line: str, puuid: str):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO puuids VALUES (?, ?, ?, ?, ?)",
+                (
+                    normalize_riot_id(summoner_name, tag_line),
+                    puuid,
+                    summoner_name,
+                    tag_line,
+                    time.time(),
+                ),
+            )
+
+    def invalidate(self, summoner_name: str, tag_line: str):
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM puuids WHERE riot_id = ?",
+                (normalize_riot_id(summoner_name, tag_line),),
+            )
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    async def aget(self, summoner_name: str, tag_line: str) -> str | None:
+        return await asyncio.to_thread(self.get, summoner_name, tag_line)
+
+    async def apeek(self, summoner_name: str, tag_line: str) -> str | None:
+        return await asyncio.to_thread(self.peek, summoner_name, tag_line)
+
+    async def aget_riot_id(self, puuid: str) -> tuple[str, str] | None:
+        return await asyncio.to_thread(self.get_riot_id, puuid)
+
+    async def aset(self, summoner_name: str, tag_line: str, puuid: str):
+        await asyncio.to_thread(self.set, summoner_name, tag_line, puuid)
+
+    async def ainvalidate(self, summoner_name: str, tag_line: str):
+        await asyncio.to_thread(self.invalidate, summoner_name, tag_line)
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses}
+
+
+_puuid_store: PuuidStore | None = None
+
+
+def get_puuid_store() -> PuuidStore:
+    """
+    Returns the app-wide PUUID store, opening the SQLite file on first use.
+    """
+    global _puuid_store
+    if _puuid_store is None:
+        _puuid_store = PuuidStore(settings.PUUID_DB_PATH, settings.PUUID_TTL)
+    return _puuid_store
+
+
+def set_puuid_store(store: PuuidStore | None):
+    global _puuid_store
+    _puuid_store = store
@@ -0,0 +1,94 @@
+"""
+Compares a team page fetching its badges one by one against a single `POST /badge/batch`, with a
+fake Riot API that adds latency to every call. Within one worker, single-flight & the rank cache already
+make concurrent GETs of the same player share their Riot calls, so the batch saves HTTP requests & latency
+rather than upstream calls. Run with `python -m benchmarks.bench_batch`.
+"""
+
+import asyncio
+import logging
+import time
+import httpx
+from app.main import app
+from app.services.rate_limit import rate_limiter
+from app.services.riot_api import rank_cache
+from app.services.riot_client import RiotClientPool, get_client_pool
+from app.utils.puuid_store import PuuidStore, set_puuid_store
+
+RIOT_LATENCY = 0.05  # Seconds per fake Riot call
+TEAM = [
+    ("NA1", f"Player{i % 5}", "NA1") for i in range(10)
+]  # 5 players, each shown twice
+
+
+class FakeRiot(httpx.AsyncBaseTransport):
+    def __init__(self):
+        self.calls = 0
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        self.calls += 1
+        await asyncio.sleep(RIOT_LATENCY)
+        if "/accounts/by-riot-id/" in request.url.path:
+            return httpx.Response(200, json={"puuid": request.url.path.split("/")[-2]})
+        return httpx.Response(
+            200, json=[{"queueType": "RANKED_SOLO_5x5", "tier": "GOLD", "rank": "II"}]
+        )
+
+
+def reset() -> FakeRiot:
+    fake_riot = FakeRiot()
+    riot_clients = RiotClientPool(transport=fake_riot)
+    app.dependency_overrides[get_client_pool] = lambda: riot_clients
+    set_puuid_store(PuuidStore(":memory:", ttl=3600))
+    rank_cache.clear()
+    rate_limiter.clear()
+    return fake_riot
+
+
+async def individual(client: httpx.AsyncClient):
+    # A browser rendering the page fires the badge requests concurrently
+    await asyncio.gather(
+        *(client.get(f"/badge/{region}/{name}/{tag}") for region, name, tag in TEAM)
+    )
+
+
+async def batch(client: httpx.AsyncClient):
+    badges = [{"region": r, "summoner": n, "tag_line": t} for r, n, t in TEAM]
+    response = await client.post("/badge/batch", json={"badges": badges})
+    response.raise_for_status()
+
+
+async def bench(label: str, func, requests: int) -> int:
+    """
+    :param requests: HTTP requests `func` makes to the app.
+    :return: The Riot calls it took.
+    """
+    fake_riot = reset()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+        start = time.perf_counter()
+        await func(client)
+        elapsed = time.perf_counter() - start
+    print(f"{label:<24} {elapsed * 1000:>8.1f} ms {requests:>13} {fake_riot.calls:>10}")
+    return fake_riot.calls
+
+
+async def main():
+    print(
+        f"{len(TEAM)} badges, {len(set(TEAM))} unique players, {RIOT_LATENCY * 1000:g} ms per Riot call"
+    )
+    print(f"{'':<24} {'latency':>11} {'HTTP requests':>13} {'Riot calls':>10}")
+    individual_calls = await bench("Individual GETs", individual, len(TEAM))
+    batch_calls = await bench("POST /badge/batch", batch, 1)
+    if batch_calls == individual_calls:
+        print(
+            "Same Riot calls, since concurrent GETs of a player already share them, so the batch's gain is "
+            "HTTP requests & latency only"
+        )
+
+
+if __name__ == "__main__":
+    logging.disable(logging.INFO)
+    asyncio.run(main())
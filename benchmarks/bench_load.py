@@ -0,0 +1,264 @@
+"""
+Load test of the badge routes against a local Riot API stand-in (see `benchmarks.fake_riot`).
+Requests follow a Zipf distribution over a population of players from several regions, with a share of
+CJK names & Riot IDs that don't exist, which is roughly what the public instance sees.
+
+Run with `python -m benchmarks.bench_load`, e.g.:
+    python -m benchmarks.bench_load --requests 5000 --concurrency 64 --output results.json
+    python -m benchmarks.bench_load --baseline results.json --threshold 0.15
+
+With `--baseline`, the run fails (exit code 1) if throughput dropped, or p95/p99 latency or upstream calls
+per request grew, by more than `--threshold` compared to the baseline results.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import random
+import statistics
+import sys
+import time
+from collections import Counter
+import httpx
+from app.main import app
+from app.services.badge_generator import badge_cache
+from app.services.circuit_breaker import circuit_breakers
+from app.services.rate_limit import rate_limiter
+from app.services.riot_api import negative_cache, rank_cache
+from app.services.riot_client import RiotClientPool, get_client_pool
+from app.utils.puuid_store import PuuidStore, set_puuid_store
+from benchmarks.fake_riot import FakeRiot
+
+# OC1 isn't routed by this API, so it doubles as an invalid region
+REGIONS = ["NA1", "NA1", "NA1", "EUW1", "EUW1", "KR", "KR", "JP1", "BR1", "OC1"]
+CJK_NAMES = [
+    "페이커",
+    "쵸비",
+    "天下第一",
+    "雪落无声",
+    "ゆきむら",
+    "さくら",
+    "小虎",
+    "김민수",
+]
+
+# Metric -> whether bigger is better, compared in regression mode
+GATED_METRICS = {
+    "throughput_rps": True,
+    "p95_ms": False,
+    "p99_ms": False,
+    "upstream_calls_per_request": False,
+}
+
+
+def build_population(
+    size: int, cjk_share: float, missing_share: float, rng: random.Random
+) -> list[str]:
+    """
+    :return: Badge paths of `size` players, most popular first.
+    """
+    paths = []
+    for i in range(size):
+        region = rng.choice(REGIONS)
+        roll = rng.random()
+        if roll < missing_share:
+            name = f"Missing{i}"
+        elif roll < missing_share + cjk_share:
+            name = f"{rng.choice(CJK_NAMES)}{i % 100}"
+        else:
+            name = f"Player {i}" if i % 3 else f"Player{i}"
+        tag = f"{region[:2]}{i % 1000}"[:5]
+        rank_name = "?rank_name=true" if i % 4 == 0 else ""
+        paths.append(f"/badge/{region}/{name.replace(' ', '%20')}/{tag}{rank_name}")
+    return paths
+
+
+def zipf_workload(
+    population: list[str], requests: int, s: float, rng: random.Random
+) -> list[str]:
+    weights = [1 / (rank**s) for rank in range(1, len(population) + 1)]
+    return rng.choices(population, weights=weights, k=requests)
+
+
+def reset_state():
+    rank_cache.clear()
+    rate_limiter.clear()
+    negative_cache.clear()
+    circuit_breakers.clear()
+    badge_cache.clear()
+    set_puuid_store(PuuidStore(":memory:", ttl=3600))
+
+
+def percentile(sorted_values: list[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(
+        int(round(pct / 100 * (len(sorted_values) - 1))), len(sorted_values) - 1
+    )
+    return sorted_values[index]
+
+
+async def run(args: argparse.Namespace) -> dict:
+    rng = random.Random(args.seed)
+    population = build_population(args.players, args.cjk_share, args.missing_share, rng)
+    workload = zipf_workload(population, args.requests, args.zipf, rng)
+
+    fake_riot = FakeRiot(
+        latency=args.latency,
+        error_rate=args.error_rate,
+        app_rate_limit=args.riot_rate_limit,
+        seed=args.seed,
+    )
+    riot_clients = RiotClientPool(transport=httpx.ASGITransport(app=fake_riot.app))
+    app.dependency_overrides[get_client_pool] = lambda: riot_clients
+    reset_state()
+
+    latencies = []
+    statuses = Counter()
+    queue = iter(workload)
+
+    async def worker(client: httpx.AsyncClient):
+        for path in queue:
+            started = time.perf_counter()
+            response = await client.get(path)
+            latencies.append(time.perf_counter() - started)
+            statuses[response.status_code] += 1
+
+    transport = httpx.ASGITransport(app=app)
+    started = time.perf_counter()
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench", timeout=60
+    ) as client:
+        await asyncio.gather(*(worker(client) for _ in range(args.concurrency)))
+    elapsed = time.perf_counter() - started
+
+    await riot_clients.aclose()
+    await rank_cache.aclose()
+    app.dependency_overrides.pop(get_client_pool, None)
+
+    latencies.sort()
+    upstream_calls = sum(fake_riot.calls.values())
+    return {
+        "config": {
+            k: v
+            for k, v in vars(args).items()
+            if k not in ("output", "baseline", "threshold")
+        },
+        "requests": len(latencies),
+        "seconds": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 2),
+        "statuses": {str(k): v for k, v in sorted(statuses.items())},
+        "upstream_calls": upstream_calls,
+        "upstream_calls_per_request": round(upstream_calls / len(latencies), 4),
+        "upstream": fake_riot.stats(),
+        "negative_cache": negative_cache.stats(),
+        "circuit_breakers": circuit_breakers.stats(),
+        "rate_limiter": rate_limiter.stats(),
+    }
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list[str]:
+    """
+    :return: A description of every gated metric that regressed by more than `threshold`.
+    """
+    regressions = []
+    for metric, bigger_is_better in GATED_METRICS.items():
+        old, new = baseline.get(metric), results.get(metric)
+        if not old or new is None:
+            continue
+        change = (new - old) / old
+        if (bigger_is_better and change < -threshold) or (
+            not bigger_is_better and change > threshold
+        ):
+            regressions.append(
+                f"{metric}: {old} -> {new} ({change:+.1%}, threshold {threshold:.0%})"
+            )
+    return regressions
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument(
+        "--players", type=int, default=500, help="Number of distinct players requested"
+    )
+    parser.add_argument(
+        "--zipf", type=float, default=1.1, help="Zipf exponent of player popularity"
+    )
+    parser.add_argument(
+        "--cjk-share", type=float, default=0.2, help="Share of players with CJK names"
+    )
+    parser.add_argument(
+        "--missing-share",
+        type=float,
+        default=0.05,
+        help="Share of Riot IDs that don't exist",
+    )
+    parser.add_argument(
+        "--latency", type=float, default=0.05, help="Mean Riot API latency in seconds"
+    )
+    parser.add_argument(
+        "--error-rate",
+        type=float,
+        default=0.0,
+        help="Share of Riot API calls failing with 503",
+    )
+    parser.add_argument(
+        "--riot-rate-limit",
+        default="2000:1,120000:120",
+        help="Rate limit of the fake Riot API",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    parser.add_argument(
+        "--baseline", help="Results JSON to compare against, failing on regressions"
+    )
+    parser.add_argument(
+        "--threshold", type=float, default=0.1, help="Allowed relative regression"
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = parse_args(argv)
+    logging.disable(logging.ERROR)
+    results = asyncio.run(run(args))
+
+    print(
+        json.dumps(
+            {k: v for k, v in results.items() if k != "config"},
+            indent=2,
+            ensure_ascii=False,
+        )
+    )
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("config") != results["config"]:
+            print(
+                "Warning: the baseline was run with a different configuration",
+                file=sys.stderr,
+            )
+        regressions = compare(results, baseline, args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        if regressions:
+            return 1
+        print("No regressions against the baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
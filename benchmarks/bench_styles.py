@@ -0,0 +1,70 @@
+"""
+Micro-benchmark of badge rendering per style, with text widths already cached, and of the template step
+alone against formatting the same template as a string on every render.
+Run with `python -m benchmarks.bench_styles`.
+"""
+
+import timeit
+from app.services.badge_generator import badge_width, render_badge
+from app.services.badge_styles import STYLES, BadgeTemplate
+from app.services.icon_pipeline import get_icon_data_uri, load_icon_registry
+
+SAMPLES = [
+    ("gold", "Eggo#WFLE"),
+    ("challenger", "Hide on bush#KR1"),
+    ("iron", "Tëst Ñame#EUW"),
+]
+
+
+def bench(label: str, func, number: int, renders: int = 1) -> float:
+    seconds = timeit.timeit(func, number=number)
+    per_call_us = seconds / (number * renders) * 1e6
+    print(f"{label:<36} {per_call_us:>10.2f} us/render")
+    return per_call_us
+
+
+def format_source(template: BadgeTemplate) -> str:
+    """Turns a compiled template back into a `str.format` string, the way badges used to be rendered."""
+    slots = dict(template._slots)
+    return "".join(
+        part.decode("utf-8") if part is not None else f"{{{slots[index]}}}"
+        for index, part in enumerate(template._parts)
+    )
+
+
+if __name__ == "__main__":
+    load_icon_registry()
+    for _, text in SAMPLES:
+        for badge_style in STYLES.values():
+            badge_width(text.upper() if badge_style.uppercase else text, badge_style)
+
+    print("Full render (width, escaping & template):")
+    for style in STYLES:
+        bench(
+            f"  {style}",
+            lambda: [render_badge(rank, text, style) for rank, text in SAMPLES],
+            10_000,
+            renders=len(SAMPLES),
+        )
+
+    print("\nTemplate only, precompiled vs str.format:")
+    values = {
+        "width": "107",
+        "uid": "107",
+        "color": "#ae8a5a",
+        "icon": get_icon_data_uri("gold"),
+        "text": "Eggo#WFLE",
+    }
+    for style, badge_style in STYLES.items():
+        source = format_source(badge_style.template)
+        compiled = bench(
+            f"  {style} (precompiled)",
+            lambda: badge_style.template.render(values),
+            50_000,
+        )
+        formatted = bench(
+            f"  {style} (str.format)",
+            lambda: source.format(**values).encode("utf-8"),
+            50_000,
+        )
+        print(f"  {'':<34} {formatted / compiled:>9.1f}x faster")
@@ -0,0 +1,34 @@
+"""
+Micro-benchmark of badge text measurement, the original per-call Pillow measurement against
+`TextWidthEngine`. Run with `python -m benchmarks.bench_text_width`.
+"""
+
+import timeit
+from PIL import Image, ImageDraw, ImageFont
+from app.services.badge_generator import calculate_width
+from app.services.text_width import VERDANA_PATH, get_width_engine
+
+SAMPLES = ["Eggo#WFLE", "Hide on bush#KR1", "CHALLENGER", "Tëst Ñame#EUW", "페이커#KR1"]
+
+
+def pillow_width(badge_text: str) -> int:
+    """The measurement `calculate_width` used to do for every badge."""
+    font = ImageFont.truetype(VERDANA_PATH, size=11)
+    draw = ImageDraw.Draw(Image.new("RGB", (1, 1)))
+    return draw.textbbox((0, 0), badge_text, font=font)[2]
+
+
+def bench(label: str, func, number: int):
+    seconds = timeit.timeit(lambda: [func(text) for text in SAMPLES], number=number)
+    per_call_us = seconds / (number * len(SAMPLES)) * 1e6
+    print(f"{label:<32} {per_call_us:>10.2f} us/call")
+
+
+if __name__ == "__main__":
+    engine = get_width_engine()
+    for text in SAMPLES:
+        assert engine.text_width(text) == pillow_width(text), text
+
+    bench("Pillow (per-call font load)", pillow_width, 200)
+    bench("TextWidthEngine.text_width", engine.text_width, 20_000)
+    bench("calculate_width (LRU hit)", calculate_width, 100_000)
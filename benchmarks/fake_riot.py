@@ -0,0 +1,173 @@
+"""
+Local stand-in for the Riot API, serving account-v1 & league-v4 with configurable latency, errors & rate
+limiting. It's an ASGI app, plugged into `RiotClientPool` through `httpx.ASGITransport`, so the benchmarks
+exercise the real clients, rate limiter & circuit breakers without any network or API key.
+"""
+
+import asyncio
+import hashlib
+import random
+import time
+from collections import Counter
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from app.services.rate_limit import parse_rate_limits
+
+TIERS = [
+    "IRON",
+    "BRONZE",
+    "SILVER",
+    "GOLD",
+    "PLATINUM",
+    "EMERALD",
+    "DIAMOND",
+    "MASTER",
+    "GRANDMASTER",
+    "CHALLENGER",
+]
+DIVISIONS = ["IV", "III", "II", "I"]
+
+
+def fake_puuid(game_name: str, tag_line: str) -> str:
+    """Deterministic 78 character PUUID for a Riot ID, so repeat runs see the same players."""
+    digest = hashlib.sha256(
+        f"{game_name.casefold()}#{tag_line.casefold()}".encode("utf-8")
+    ).hexdigest()
+    return (digest + digest)[:78]
+
+
+class FakeRiot:
+    """
+    :param latency: Mean seconds added to every response.
+    :param jitter: Spread of the latency, as a share of it (uniformly distributed).
+    :param error_rate: Share of requests answered with a 503.
+    :param app_rate_limit: Rate limit enforced & advertised per host, e.g. '500:1,30000:600'. Empty to disable.
+    :param unranked_rate: Share of players with no Solo/Duo entry.
+    :param seed: Seed of the random latency & errors.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.05,
+        jitter: float = 0.5,
+        error_rate: float = 0.0,
+        app_rate_limit: str = "2000:1,120000:120",
+        unranked_rate: float = 0.2,
+        seed: int = 0,
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.app_rate_limit = app_rate_limit
+        self.limits = parse_rate_limits(app_rate_limit)
+        self.unranked_rate = unranked_rate
+        self.random = random.Random(seed)
+
+        # (host, window) -> (window start, count)
+        self._windows: dict[tuple[str, int], tuple[float, int]] = {}
+        self.calls: Counter[str] = Counter()
+        self.statuses: Counter[int] = Counter()
+        self._names: dict[str, tuple[str, str]] = (
+            {}
+        )  # PUUID -> Riot ID, for account-v1 by-puuid
+
+        self.app = FastAPI()
+        self.app.get("/riot/account/v1/accounts/by-riot-id/{game_name}/{tag_line}")(
+            self.account_by_riot_id
+        )
+        self.app.get("/riot/account/v1/accounts/by-puuid/{puuid}")(
+            self.account_by_puuid
+        )
+        self.app.get("/lol/league/v4/entries/by-puuid/{puuid}")(self.league_entries)
+
+    def _rate_limit(self, host: str) -> tuple[dict, float | None]:
+        """Counts a request against each window of the host, returning the headers & a Retry-After if over."""
+        now = time.monotonic()
+        counts = []
+        retry_after = None
+        for limit, window in self.limits:
+            started, count = self._windows.get((host, window), (now, 0))
+            if now - started >= window:
+                started, count = now, 0
+            count += 1
+            self._windows[(host, window)] = (started, count)
+            counts.append(f"{count}:{window}")
+            if count > limit:
+                retry_after = max(retry_after or 0, started + window - now)
+
+        if not self.limits:
+            return {}, None
+        headers = {
+            "X-App-Rate-Limit": self.app_rate_limit,
+            "X-App-Rate-Limit-Count": ",".join(counts),
+        }
+        return headers, retry_after
+
+    async def _respond(self, request: Request, endpoint: str, body) -> JSONResponse:
+        self.calls[endpoint] += 1
+        delay = self.latency * (1 + self.jitter * (self.random.random() * 2 - 1))
+        await asyncio.sleep(max(delay, 0))
+
+        headers, retry_after = self._rate_limit(request.url.hostname)
+        if retry_after is not None:
+            status, body = 429, {
+                "status": {"message": "Rate limit exceeded", "status_code": 429}
+            }
+            headers.update(
+                {
+                    "Retry-After": str(max(int(retry_after), 1)),
+                    "X-Rate-Limit-Type": "application",
+                }
+            )
+        elif self.random.random() < self.error_rate:
+            status, body = 503, {
+                "status": {"message": "Service unavailable", "status_code": 503}
+            }
+        elif body is None:
+            status, body = 404, {
+                "status": {"message": "Data not found", "status_code": 404}
+            }
+        else:
+            status = 200
+
+        self.statuses[status] += 1
+        return JSONResponse(body, status_code=status, headers=headers)
+
+    async def account_by_riot_id(self, request: Request, game_name: str, tag_line: str):
+        body = None
+        if not game_name.startswith(
+            "Missing"
+        ):  # Lets workloads include Riot IDs that don't exist
+            puuid = fake_puuid(game_name, tag_line)
+            self._names[puuid] = (game_name, tag_line)
+            body = {"puuid": puuid, "gameName": game_name, "tagLine": tag_line}
+        return await self._respond(request, "account-v1.by-riot-id", body)
+
+    async def account_by_puuid(self, request: Request, puuid: str):
+        name = self._names.get(puuid)
+        body = (
+            {"puuid": puuid, "gameName": name[0], "tagLine": name[1]} if name else None
+        )
+        return await self._respond(request, "account-v1.by-puuid", body)
+
+    async def league_entries(self, request: Request, puuid: str):
+        seed = int(puuid[:8], 16)
+        entries = []
+        if (seed % 1000) / 1000 >= self.unranked_rate:
+            entries.append(
+                {
+                    "queueType": "RANKED_SOLO_5x5",
+                    "tier": TIERS[seed % len(TIERS)],
+                    "rank": DIVISIONS[(seed // len(TIERS)) % len(DIVISIONS)],
+                    "leaguePoints": seed % 100,
+                    "wins": seed % 300,
+                    "losses": (seed // 7) % 300,
+                }
+            )
+        return await self._respond(request, "league-v4.entries.by-puuid", entries)
+
+    def stats(self) -> dict:
+        return {
+            "calls": dict(self.calls),
+            "statuses": {str(k): v for k, v in self.statuses.items()},
+        }